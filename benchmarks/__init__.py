@@ -0,0 +1,9 @@
+"""
+Benchmarks for the history, plotting, export, network info and speed test
+service hot paths of macOS_application_speedtest_for_python.
+
+Run from the project root:
+
+    python -m benchmarks --save baseline.json
+    python -m benchmarks --compare baseline.json
+"""
@@ -0,0 +1,375 @@
+"""
+Benchmark cases, runner and baseline comparison.
+
+Each case is timed (best of --repeat runs) and then run once more under
+tracemalloc to record its peak allocation (NumPy buffers included).
+Results are written as JSON. With --compare, cases that got slower or
+allocate more than the baseline by more than --threshold are reported as
+regressions and the exit code is 1.
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import logging
+import argparse
+import platform
+import tempfile
+import tracemalloc
+from datetime import datetime
+
+from speedtest_app.history_cache import ColumnarHistoryCache, load_history_columns
+from speedtest_app.history_store import (
+    TIMESTAMP_FORMAT,
+    BinaryHistoryStore,
+    JsonlHistoryStore,
+    convert_history
+)
+from speedtest_app.speedtest_result import SpeedTestResult
+
+logger = logging.getLogger("SpeedTest")
+
+SIZES = (1_000, 100_000, 1_000_000)
+DEFAULT_REPEAT = 3
+DEFAULT_THRESHOLD = 0.25
+
+# Differences below these are noise, whatever the ratio
+MIN_SECONDS = 0.01
+MIN_PEAK_BYTES = 1 << 20
+
+SAVE_CALLS = 20
+NETWORK_INFO_CALLS = 10
+PLOT_POINTS = 1000
+START_EPOCH = 1_600_000_000
+
+EXIT_OK = 0
+EXIT_REGRESSION = 1
+
+
+def write_history(path, size):
+    """Writes size synthetic runs, one minute apart, as a JSON lines history."""
+    rng = random.Random(size)
+    with open(path, "w", encoding="utf-8") as file:
+        for i in range(size):
+            record = {
+                "timestamp": time.strftime(TIMESTAMP_FORMAT, time.localtime(START_EPOCH + i * 60)),
+                "download_speed": round(rng.uniform(50, 500), 2),
+                "upload_speed": round(rng.uniform(10, 100), 2),
+                "ping": round(rng.uniform(5, 80), 1),
+            }
+            file.write(json.dumps(record) + "\n")
+
+
+class HistoryFixture:
+    """A synthetic history of a given size and its columnar cache."""
+
+    def __init__(self, workdir, size):
+        self.path = os.path.join(workdir, f"history_{size}.jsonl")
+        write_history(self.path, size)
+        self.store = JsonlHistoryStore(self.path)
+        # The app's own cache location, removed again by drop_cache
+        self.cache = ColumnarHistoryCache.for_store(self.store)
+
+    def drop_cache(self):
+        shutil.rmtree(self.cache.directory, ignore_errors=True)
+
+
+def bench_save_test_results(fixture, workdir):
+    from speedtest_app.test_history import save_test_results
+    load_history_columns(fixture.store)
+    result = SpeedTestResult(download=100.0, upload=20.0, ping=15.0)
+
+    def run():
+        for _ in range(SAVE_CALLS):
+            save_test_results(result, file_path=fixture.path)
+    return run
+
+
+def bench_history_cold_load(fixture, workdir):
+    def run():
+        fixture.drop_cache()
+        load_history_columns(fixture.store)
+    return run
+
+
+def bench_binary_history_load(fixture, workdir):
+    """Column load and random run reads of the same history in the binary format."""
+    path = os.path.join(workdir, f"{os.path.basename(fixture.path)}.bin")
+    convert_history(fixture.path, path)
+    store = BinaryHistoryStore(path)
+    indices = random.Random(0).sample(range(store.count()), min(PLOT_POINTS, store.count()))
+
+    def run():
+        load_history_columns(store)
+        return [store[index] for index in indices]
+    return run
+
+
+def bench_view_history_load(fixture, workdir):
+    from speedtest_app.gui.history_table import HistoryTable
+    from speedtest_app.history_pager import HistoryPager
+    load_history_columns(fixture.store)
+
+    def run():
+        pager = HistoryPager(fixture.store)
+        pager.refresh()
+        pager.set_query(sort_by="download_speed", descending=True)
+        pager.rows(0, HistoryTable.PAGE_SIZE)
+    return run
+
+
+def bench_plot_history_load(fixture, workdir):
+    from speedtest_app.plot_decimation import decimate
+    load_history_columns(fixture.store)
+
+    def run():
+        columns = load_history_columns(fixture.store)
+        x = columns["timestamp"]
+        decimate(x, columns["download_speed"], PLOT_POINTS, "lttb")
+        decimate(x, columns["upload_speed"], PLOT_POINTS, "lttb")
+        decimate(x, columns["ping"], PLOT_POINTS, "minmax")
+    return run
+
+
+def bench_history_analytics(fixture, workdir):
+    from speedtest_app.history_analytics import analyze_history
+    load_history_columns(fixture.store)
+
+    def run():
+        analyze_history(load_history_columns(fixture.store))
+    return run
+
+
+def bench_export_csv(fixture, workdir):
+    from speedtest_app.history_export import export_history
+    output = os.path.join(workdir, "export.csv")
+
+    def run():
+        export_history(fixture.store, output)
+    return run
+
+
+def bench_get_network_info(workdir):
+    from speedtest_app.network_adapter_information import get_network_info
+
+    def run():
+        for _ in range(NETWORK_INFO_CALLS):
+            get_network_info()
+    return run
+
+
+def bench_network_info_cached(workdir):
+    """Reads through NetworkInfoService, including the watcher's unchanged refreshes."""
+    from speedtest_app.network_adapter_information import NetworkInfoService
+    service = NetworkInfoService()
+    service.network_info()
+
+    def run():
+        for _ in range(NETWORK_INFO_CALLS):
+            service.refresh()
+            service.active_adapter()
+    return run
+
+
+def bench_speedtest_service(workdir):
+    """A full run against an unshaped local stand-in server (engine overhead)."""
+    from speedtest_app.local_server import LocalSpeedtestServer
+    from speedtest_app.server_cache import ServerCache
+    from speedtest_app.speedtest_service import SpeedTestService
+    server = LocalSpeedtestServer(test_length=1).start()
+    service = SpeedTestService(
+        {"speedtest_server_url": server.base_url},
+        server_cache=ServerCache(os.path.join(workdir, "server_cache.json"))
+    )
+
+    def run():
+        result = service.run_speedtest().result()
+        if "error" in result:
+            raise RuntimeError(result["error"])
+    run.cleanup = server.stop
+    return run
+
+
+# Cases run once per history size; save_test_results grows the history, so it runs last
+SIZED_CASES = {
+    "history_cold_load": bench_history_cold_load,
+    "binary_history_load": bench_binary_history_load,
+    "view_history_load": bench_view_history_load,
+    "plot_history_load": bench_plot_history_load,
+    "history_analytics": bench_history_analytics,
+    "export_csv": bench_export_csv,
+    "save_test_results": bench_save_test_results,
+}
+# Cases that do not depend on the history size
+UNSIZED_CASES = {
+    "get_network_info": bench_get_network_info,
+    "network_info_cached": bench_network_info_cached,
+    "speedtest_service": bench_speedtest_service,
+}
+
+
+def measure(run, repeat):
+    """
+    Returns the best wall time of repeat runs and the peak traced allocation.
+
+    The peak is measured in a separate run because tracing slows code down.
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"seconds": best, "peak_bytes": peak}
+
+
+def _run_case(name, factory, args, repeat):
+    try:
+        run = factory(*args)
+    except Exception as e:
+        logger.error(f"Benchmark {name} could not be set up: {e}")
+        return {"error": str(e)}
+    try:
+        return measure(run, repeat)
+    except Exception as e:
+        logger.error(f"Benchmark {name} failed: {e}")
+        return {"error": str(e)}
+    finally:
+        cleanup = getattr(run, "cleanup", None)
+        if cleanup is not None:
+            cleanup()
+
+
+def run_benchmarks(sizes=SIZES, cases=None, repeat=DEFAULT_REPEAT, report=None):
+    """
+    Runs the selected cases and returns the results document.
+
+    Args:
+        sizes: History sizes for the sized cases
+        cases: Case names to run (None: all)
+        repeat: Timed runs per case; the best one counts
+        report: Called as report(key, result) after each case
+    """
+    selected = set(cases) if cases else set(SIZED_CASES) | set(UNSIZED_CASES)
+    unknown = selected - set(SIZED_CASES) - set(UNSIZED_CASES)
+    if unknown:
+        raise ValueError(f"Unknown benchmark cases: {', '.join(sorted(unknown))}")
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="speedtest-bench-") as workdir:
+        for size in sizes:
+            if not selected & set(SIZED_CASES):
+                break
+            fixture = HistoryFixture(workdir, size)
+            try:
+                for name, factory in SIZED_CASES.items():
+                    if name not in selected:
+                        continue
+                    key = f"{name}[{size}]"
+                    results[key] = _run_case(key, factory, (fixture, workdir), repeat)
+                    if report:
+                        report(key, results[key])
+            finally:
+                fixture.drop_cache()
+
+        for name, factory in UNSIZED_CASES.items():
+            if name in selected:
+                results[name] = _run_case(name, factory, (workdir,), repeat)
+                if report:
+                    report(name, results[name])
+
+    return {
+        "created": datetime.now().strftime(TIMESTAMP_FORMAT),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": repeat,
+        "results": results,
+    }
+
+
+def compare_results(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """
+    Compares two results documents.
+
+    Returns:
+        list: (key, metric, baseline value, current value) for every
+        regression larger than threshold and above the noise floor
+    """
+    regressions = []
+    floors = {"seconds": MIN_SECONDS, "peak_bytes": MIN_PEAK_BYTES}
+    for key, result in current["results"].items():
+        base = baseline["results"].get(key)
+        if not base or "error" in base or "error" in result:
+            continue
+        for metric, floor in floors.items():
+            old, new = base[metric], result[metric]
+            if new - old > floor and new > old * (1 + threshold):
+                regressions.append((key, metric, old, new))
+    return regressions
+
+
+def _format(metric, value):
+    if metric == "seconds":
+        return f"{value * 1000:.1f} ms"
+    return f"{value / (1 << 20):.1f} MiB"
+
+
+def _print_result(key, result):
+    if "error" in result:
+        print(f"{key:32} ERROR {result['error']}")
+    else:
+        print(f"{key:32} {_format('seconds', result['seconds']):>12} "
+              f"{_format('peak_bytes', result['peak_bytes']):>12}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks",
+        description="Benchmark history, plotting, export, network info and service hot paths."
+    )
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(SIZES),
+                        help="history sizes (default: 1000 100000 1000000)")
+    parser.add_argument("--cases", nargs="+", default=None,
+                        choices=sorted(list(SIZED_CASES) + list(UNSIZED_CASES)),
+                        help="cases to run (default: all)")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT,
+                        help=f"timed runs per case (default: {DEFAULT_REPEAT})")
+    parser.add_argument("--save", metavar="PATH", help="write the results as a baseline")
+    parser.add_argument("--compare", metavar="PATH", help="compare against a baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help=f"allowed slowdown or growth, as a fraction "
+                             f"(default: {DEFAULT_THRESHOLD})")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.WARNING, stream=sys.stderr,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    current = run_benchmarks(args.sizes, args.cases, args.repeat, report=_print_result)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as file:
+            json.dump(current, file, indent=2)
+        print(f"Results written to {args.save}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as file:
+            baseline = json.load(file)
+        regressions = compare_results(baseline, current, args.threshold)
+        for key, metric, old, new in regressions:
+            print(f"REGRESSION {key} {metric}: {_format(metric, old)} -> {_format(metric, new)}")
+        if regressions:
+            return EXIT_REGRESSION
+        print("No regressions")
+    return EXIT_OK
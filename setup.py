@@ -20,11 +20,12 @@ setup(
         "License :: OSI Approved :: MIT License",
         "Operating System :: MacOS",
     ],
-    packages=find_packages(),
-    python_requires=">=3.6",
+    packages=find_packages(exclude=("benchmarks",)),
+    python_requires=">=3.8",
     install_requires=[
         "speedtest-cli>=2.1.3",
         "matplotlib>=3.5.0",
+        "numpy>=1.21.0",
         "psutil>=5.9.0",
         "pyinstaller>=5.6.0",
         'ttkbootstrap>=1.10.1',
@@ -32,6 +33,7 @@ setup(
     entry_points={
         "console_scripts": [
             "alex-speedtest=speedtest_app.alexs_speedtest:main",
+            "alex-speedtest-cli=speedtest_app.cli:main",
         ],
     },
     include_package_data=True,
@@ -2,18 +2,51 @@
 macOS_application_speedtest_for_python package.
 
 A macOS application to test internet connection speed.
+
+The public functions are loaded on first access, so importing the package
+does not pull in matplotlib, ttkbootstrap or psutil until they are needed.
 """
+import importlib
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    # For type checkers and linters only; at runtime __getattr__ loads these
+    from .network_adapter_information import get_active_adapter_info, get_network_info
+    from .speedtest_result import SpeedTestResult
+    from .test_history import plot_history, save_test_results, view_history
 
 __version__ = '3.0.0'
 __author__ = 'Aleksandr'
 
-from .network_adapter_information import get_network_info, get_active_adapter_info
-from .test_history import save_test_results, view_history, plot_history
+# Public name -> submodule that defines it
+_LAZY_ATTRIBUTES = {
+    'get_network_info': 'network_adapter_information',
+    'get_active_adapter_info': 'network_adapter_information',
+    'save_test_results': 'test_history',
+    'view_history': 'test_history',
+    'plot_history': 'test_history',
+    'SpeedTestResult': 'speedtest_result',
+}
 
 __all__ = [
     'get_network_info',
     'get_active_adapter_info',
     'save_test_results',
     'view_history',
-    'plot_history'
-]
\ No newline at end of file
+    'plot_history',
+    'SpeedTestResult'
+]
+
+
+def __getattr__(name):
+    module_name = _LAZY_ATTRIBUTES.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module_name}", __name__), name)
+    # Cache it so later lookups skip __getattr__
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_LAZY_ATTRIBUTES))
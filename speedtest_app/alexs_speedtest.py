@@ -1,18 +1,23 @@
 import os
-import threading
+import queue
 import logging
-import tkinter as tk
-from tkinter import ttk, messagebox
-import speedtest as st
+from tkinter import messagebox
 from datetime import datetime
-from speedtest_app import network_adapter_information
-from speedtest_app.test_history import save_test_results
+from speedtest_app.app_logging import (
+    DEFAULT_BACKUP_COUNT,
+    DEFAULT_MAX_BYTES,
+    DEFAULT_ROTATION_INTERVAL,
+    configure_logging,
+    stop_logging
+)
 from speedtest_app.gui import (
     ResultsFrame,
     SettingsWindow,
     create_menu,
     show_about_dialog
 )
+from speedtest_app.gui.bandwidth_panel import BandwidthPanel
+from speedtest_app.gui.progress_panel import TestProgressPanel
 from speedtest_app.utils import (
     get_app_version,
     format_speed,
@@ -20,13 +25,35 @@ from speedtest_app.utils import (
     save_settings
 )
 import ttkbootstrap as tb
-from speedtest_app.speedtest_service import SpeedTestService
+from ttkbootstrap.scrolled import ScrolledFrame
+from speedtest_app.progress_events import SpeedTestFinished, drain_events
+from speedtest_app.metrics_exporter import start_metrics_exporter
+from speedtest_app.scheduler import SpeedTestScheduler
+from speedtest_app.speedtest_service import SpeedTestBusy, SpeedTestService
 from speedtest_app.network_adapter_information import NetworkInfoService
 
+logger = logging.getLogger("SpeedTest")
+
+# How often the Tk loop drains test progress events (ms)
+EVENT_DRAIN_INTERVAL = 50
+# How often it picks up network adapter changes from the watcher (ms)
+NETWORK_CHANGE_INTERVAL = 1000
+
+WINDOW_WIDTH = 400
+# Tall enough for every panel at once; on shorter screens the content scrolls
+WINDOW_HEIGHT = 1020
+MIN_WINDOW_HEIGHT = 600
+# Room left for the menu bar and the Dock
+SCREEN_MARGIN = 120
+
 
 def setup_logging():
     """
     Configures the logging system for the application.
+
+    Log calls only queue the record; a background thread writes the rotated,
+    compressed log file (see speedtest_app.app_logging). With
+    "log_format": "json" in the settings the file holds one JSON object per line.
     """
     log_dir = os.path.join(
         os.path.expanduser("~"),
@@ -34,15 +61,18 @@ def setup_logging():
         "SpeedTest_Logs"
     )
     os.makedirs(log_dir, exist_ok=True)
-    log_file = os.path.join(log_dir, "speedtest_log.log")
-
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler(log_file),
-            logging.StreamHandler()
-        ]
+    settings = load_settings()
+    json_format = settings.get("log_format") == "json"
+    log_file = os.path.join(log_dir, "speedtest_log.jsonl" if json_format else "speedtest_log.log")
+
+    configure_logging(
+        log_file,
+        level=settings.get("log_level", "INFO"),
+        json_format=json_format,
+        max_bytes=settings.get("log_max_bytes", DEFAULT_MAX_BYTES),
+        interval=settings.get("log_rotation_interval", DEFAULT_ROTATION_INTERVAL),
+        backup_count=settings.get("log_backup_count", DEFAULT_BACKUP_COUNT),
+        compress=settings.get("log_compress", True)
     )
     return logging.getLogger("SpeedTest")
 
@@ -51,41 +81,67 @@ class SpeedTestApp:
     def __init__(self, root):
         self.root = root
         self.root.title(f"Internet Speed Test v{get_app_version()}")
-        self.root.geometry("400x600")
-        self.root.minsize(400, 600)
+        height = max(MIN_WINDOW_HEIGHT,
+                     min(WINDOW_HEIGHT, self.root.winfo_screenheight() - SCREEN_MARGIN))
+        self.root.geometry(f"{WINDOW_WIDTH}x{height}")
+        self.root.minsize(WINDOW_WIDTH, MIN_WINDOW_HEIGHT)
         self.settings = load_settings()
         create_menu(
             self.root,
             lambda: self.show_settings(),
-            lambda: show_about_dialog(self.root)
+            lambda: show_about_dialog(self.root),
+            lambda: self.export_history()
         )
         # Сначала сервисы!
-        self.speedtest_service = SpeedTestService()
-        self.test_future = None
         self.network_info_service = NetworkInfoService()
+        self.speedtest_service = SpeedTestService(self.settings,
+                                                  network_info=self.network_info_service)
+        self.test_future = None
+        self.test_events = queue.Queue()
         self.network_info_future = None
+        # Adapter changes found by the watcher, shown on the Tk thread
+        self.network_changes = queue.Queue()
+        self.network_info_service.add_listener(self.network_changes)
+        self.scheduler = SpeedTestScheduler(self.speedtest_service, self.settings)
+        self.metrics_exporter = None
+        if self.settings.get("metrics_enabled"):
+            from speedtest_app.test_history import get_history_store
+            self.metrics_exporter = start_metrics_exporter(
+                self.speedtest_service, self.settings, get_history_store()
+            )
         self.setup_gui()
+        self.apply_scheduler_settings()
         logger.info("Application initialized")
 
     def setup_gui(self):
         """Настраивает интерфейс приложения."""
-        self.network_info_frame = tb.Frame(self.root)
+        # Panels live in a scrolled frame, so they stay reachable on short screens
+        self.content = ScrolledFrame(self.root, autohide=True)
+        self.content.pack(fill="both", expand=True)
+
+        self.network_info_frame = tb.Frame(self.content)
+        self.adapter_frame = tb.Frame(self.network_info_frame)
+        self.adapter_frame.pack()
+        # Live throughput of the active adapter
+        self.bandwidth_panel = BandwidthPanel(
+            self.network_info_frame,
+            self.settings.get("bandwidth_monitor_interval", 1.0),
+            self.settings.get("bandwidth_monitor_window", 60)
+        )
+        self.bandwidth_panel.pack(pady=(6, 0))
         if self.settings.get("show_network_info", True):
             self.network_info_frame.pack(fill="x", padx=20, pady=10)
             self.update_network_info()
+            self.network_info_service.start()
+            self.bandwidth_panel.start()
+        self.root.after(NETWORK_CHANGE_INTERVAL, self._poll_network_changes)
 
-        self.results_frame = ResultsFrame(self.root)
+        self.results_frame = ResultsFrame(self.content)
 
-        self.progress_frame = tb.Frame(self.root)
-        self.progress_label = tb.Label(self.progress_frame, text="", font=("Segoe UI", 12))
-        self.progress_bar = tb.Progressbar(
-            self.progress_frame,
-            length=300,
-            mode='determinate'
-        )
+        self.progress_panel = TestProgressPanel(self.content)
 
         # Основная рамка для кнопок
-        self.button_frame = tb.Frame(self.root)
+        self.button_frame = tb.Frame(self.content)
         self.button_frame.pack(pady=20)
 
         # Кнопка запуска теста
@@ -97,6 +153,15 @@ class SpeedTestApp:
         )
         self.start_button.pack(pady=(0, 8))
 
+        # Кнопка отмены теста (видна только во время теста)
+        self.cancel_button = tb.Button(
+            self.button_frame,
+            text="Cancel Test",
+            command=self.cancel_speedtest,
+            bootstyle="danger",
+            width=22
+        )
+
         # Кнопка повтора теста (изначально скрыта)
         self.repeat_button = tb.Button(
             self.button_frame,
@@ -124,29 +189,45 @@ class SpeedTestApp:
 
     def update_network_info(self):
         """Асинхронно обновляет информацию о сетевом адаптере с индикатором загрузки."""
-        for widget in self.network_info_frame.winfo_children():
+        self.network_info_future = self.network_info_service.get_active_adapter_async()
+        if self.network_info_future.done():
+            # Served from the cache: no loading indicator needed
+            self._show_adapter(self.network_info_future.result())
+            return
+        for widget in self.adapter_frame.winfo_children():
             widget.destroy()
-        loading_label = tb.Label(self.network_info_frame, text="Loading network info...", font=("Segoe UI", 11))
+        loading_label = tb.Label(self.adapter_frame, text="Loading network info...", font=("Segoe UI", 11))
         loading_label.pack()
-        self.network_info_future = self.network_info_service.get_active_adapter_async()
         self.root.after(100, self._check_network_info_result, loading_label)
 
     def _check_network_info_result(self, loading_label):
         if self.network_info_future and self.network_info_future.done():
-            adapter_info = self.network_info_future.result()
             loading_label.destroy()
-            if adapter_info:
-                info_text = (
-                    f"Adapter: {adapter_info['Adapter']}\n"
-                    f"IP: {adapter_info['IP Address']}\n"
-                    f"MAC: {adapter_info['MAC Address']}"
-                )
-                tb.Label(self.network_info_frame, text=info_text, justify="left", font=("Segoe UI", 11)).pack()
-            else:
-                tb.Label(self.network_info_frame, text="No active network adapter found", font=("Segoe UI", 11)).pack()
+            self._show_adapter(self.network_info_future.result())
         else:
             self.root.after(100, self._check_network_info_result, loading_label)
 
+    def _show_adapter(self, adapter_info):
+        for widget in self.adapter_frame.winfo_children():
+            widget.destroy()
+        self.bandwidth_panel.set_interface(adapter_info["Adapter"] if adapter_info else None)
+        if adapter_info:
+            info_text = (
+                f"Adapter: {adapter_info['Adapter']}\n"
+                f"IP: {adapter_info['IP Address']}\n"
+                f"MAC: {adapter_info['MAC Address']}"
+            )
+            tb.Label(self.adapter_frame, text=info_text, justify="left", font=("Segoe UI", 11)).pack()
+        else:
+            tb.Label(self.adapter_frame, text="No active network adapter found", font=("Segoe UI", 11)).pack()
+
+    def _poll_network_changes(self):
+        """Показывает изменения сетевых адаптеров, найденные фоновым наблюдателем."""
+        changes = drain_events(self.network_changes)
+        if changes and self.settings.get("show_network_info", True):
+            self._show_adapter(changes[-1].active_adapter)
+        self.root.after(NETWORK_CHANGE_INTERVAL, self._poll_network_changes)
+
     def show_settings(self):
         """Показывает окно настроек."""
         SettingsWindow(self.root, self.settings, self.save_settings)
@@ -154,70 +235,112 @@ class SpeedTestApp:
     def save_settings(self, new_settings):
         """Сохраняет настройки."""
         self.settings = new_settings
+        self.speedtest_service.settings = self.settings
         save_settings(self.settings)
+        self.apply_scheduler_settings()
 
-        if self.settings.get("show_network_info"):
+        if self.settings.get("show_network_info", True):
             self.network_info_frame.pack(fill="x", padx=20, pady=10)
             self.update_network_info()
+            self.network_info_service.start()
+            self.bandwidth_panel.start()
         else:
             self.network_info_frame.pack_forget()
+            self.network_info_service.stop()
+            self.bandwidth_panel.stop()
+
+    def apply_scheduler_settings(self):
+        """Запускает или останавливает периодические тесты согласно настройкам."""
+        from speedtest_app.test_history import get_history_store
+        self.scheduler.settings = self.settings
+        # The backend may have changed; scheduled results always go to history
+        self.scheduler.store = get_history_store()
+        if self.settings.get("scheduler_enabled"):
+            self.scheduler.start()
+        else:
+            # Only signals the thread; joining would freeze the window
+            self.scheduler.stop(wait=False)
 
     def start_speedtest(self):
-        """Запускает тест скорости (асинхронно через SpeedTestService) с анимацией прогресс-бара."""
+        """Запускает тест скорости (асинхронно через SpeedTestService) с живым прогрессом."""
         if self.test_future and not self.test_future.done():
             return
+        # A fresh queue so events of an abandoned run cannot leak into this one
+        test_events = queue.Queue()
+        try:
+            self.test_future = self.speedtest_service.run_speedtest(test_events)
+        except SpeedTestBusy:
+            self._show_toast("A scheduled test is running", "warning")
+            return
+        self.test_events = test_events
         self.results_frame.clear()
-        self.progress_frame.pack(pady=10)
-        self.progress_label.pack()
-        self.progress_bar.pack()
-        self.progress_bar["value"] = 0
-        self.progress_bar.config(mode="indeterminate")
-        self.progress_bar.start(10)
+        self.progress_panel.pack(pady=10)
+        self.progress_panel.reset("Finding best server...")
         self.start_button.config(state="disabled")
         self.repeat_button.pack_forget()
-        self.progress_label.config(text="Finding best server...")
-        self.test_future = self.speedtest_service.run_speedtest()
-        self.root.after(100, self._check_speedtest_result)
+        self.cancel_button.config(state="normal")
+        self.cancel_button.pack(pady=(0, 8), after=self.start_button)
+        self.root.after(EVENT_DRAIN_INTERVAL, self._drain_test_events)
+
+    def cancel_speedtest(self):
+        """Отменяет текущий тест скорости."""
+        self.speedtest_service.cancel()
+        self.cancel_button.config(state="disabled")
+        self.progress_panel.label.config(text="Cancelling...")
 
     def repeat_speedtest(self):
         """Повторяет тест скорости."""
         self.start_speedtest()
 
-    def _check_speedtest_result(self):
-        if self.test_future and self.test_future.done():
-            self.progress_bar.stop()
-            self.progress_bar.config(mode="determinate")
-            result = self.test_future.result()
-            if "error" in result:
-                self._show_error(result["error"])
-                self._cleanup()
+    def _drain_test_events(self):
+        """Отрисовывает накопившиеся события теста пачкой."""
+        for event in drain_events(self.test_events):
+            if isinstance(event, SpeedTestFinished):
+                self._finish_speedtest(event.result)
+                return
+            self.progress_panel.handle(event)
+        self.root.after(EVENT_DRAIN_INTERVAL, self._drain_test_events)
+
+    def _finish_speedtest(self, result):
+        if result.get("cancelled"):
+            self.progress_panel.finish("Test cancelled")
+            self._show_toast("Speed test cancelled", "warning")
+            self._cleanup()
+        elif "error" in result:
+            self.progress_panel.finish("Test failed")
+            self._show_error(result["error"])
+            self._cleanup()
+        else:
+            self._update_results(result)
+            if result.get("partial"):
+                phases = ", ".join(result["timed_out"])
+                self.progress_panel.finish(f"Test completed, {phases} timed out")
+                self._show_toast("Timed out, result not saved", "warning")
             else:
-                download = result["download"]
-                upload = result["upload"]
-                ping = result["ping"]
-                self.progress_bar["value"] = 100
-                self.progress_label.config(text="Test completed!")
-                self._update_results(download, upload, ping)
+                self.progress_panel.finish("Test completed!")
                 self._show_toast("Speed test completed!", "success")
-                self._cleanup()
-        else:
-            self.root.after(100, self._check_speedtest_result)
+            self._cleanup()
 
-    def _update_results(self, download, upload, ping):
-        """Обновляет интерфейс с результатами теста."""
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    def _update_results(self, result):
+        """Обновляет интерфейс с результатами теста (SpeedTestResult)."""
+        timestamp = datetime.fromtimestamp(result.timestamp).strftime("%Y-%m-%d %H:%M:%S")
         self.results_frame.update_results(
-            format_speed(download),
-            format_speed(upload),
-            f"{ping:.1f}",
-            timestamp
+            format_speed(result.download),
+            format_speed(result.upload),
+            f"{result.ping:.1f}",
+            timestamp,
+            result
         )
 
         # Показываем кнопку повтора после завершения теста
         self.repeat_button.pack(pady=(5, 0))
 
-        if self.settings.get("auto_save_results", True):
-            save_test_results(download, upload, ping)
+        if result.get("partial"):
+            # A phase cut off by its timeout would skew the history's statistics
+            logger.info("Partial test result not saved to history")
+        elif self.settings.get("auto_save_results", True):
+            from speedtest_app.test_history import save_test_results
+            save_test_results(result)
             logger.info("Test results saved to Downloads directory")
 
     def _show_error(self, error_message):
@@ -226,7 +349,8 @@ class SpeedTestApp:
 
     def _cleanup(self):
         """Очищает интерфейс после теста."""
-        self.progress_frame.pack_forget()
+        self.progress_panel.pack_forget()
+        self.cancel_button.pack_forget()
         self.start_button.config(state="normal")
 
     def show_history(self):
@@ -241,6 +365,16 @@ class SpeedTestApp:
         history_path = get_history_file_path()
         plot_history(self.root, history_path)
 
+    def export_history(self):
+        """Открывает окно экспорта всей истории тестов."""
+        from speedtest_app.test_history import get_history_store
+        from speedtest_app.gui.export_dialog import ExportDialog
+        store = get_history_store()
+        if not store.exists():
+            messagebox.showinfo("History", "No history available.")
+            return
+        ExportDialog(self.root, store)
+
     def _show_toast(self, message, style="info"):
         toast = tb.Toplevel(self.root)
         toast.overrideredirect(True)
@@ -257,6 +391,7 @@ class SpeedTestApp:
 
 def main():
     """Основная точка входа в приложение."""
+    setup_logging()
     root = tb.Window(themename="darkly")
     app = SpeedTestApp(root)
 
@@ -265,8 +400,14 @@ def main():
     except Exception as e:
         logger.critical(f"Unhandled exception in main loop: {e}", exc_info=True)
         messagebox.showerror("Critical Error", f"An unhandled error occurred: {e}")
+    finally:
+        app.scheduler.stop()
+        app.network_info_service.stop()
+        if app.metrics_exporter is not None:
+            app.metrics_exporter.stop()
+        # Writes out records still queued for the log file
+        stop_logging()
 
 
 if __name__ == "__main__":
-    logger = setup_logging()
     main()
@@ -0,0 +1,210 @@
+"""
+Non-blocking logging for macOS_application_speedtest_for_python.
+
+configure_logging puts a QueueHandler on the root logger, so a logging call
+on the Tk thread or a worker thread only formats the message and puts the
+record on an in-memory queue. A QueueListener thread writes the records to
+the console and to a log file that is rotated by size and age, with
+rotated files gzip-compressed. The file can be plain text or one JSON
+object per line for log ingestion.
+"""
+import os
+import gzip
+import json
+import time
+import queue
+import atexit
+import shutil
+import logging
+import logging.handlers
+from datetime import datetime
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+DEFAULT_MAX_BYTES = 5 * 1024 * 1024
+DEFAULT_ROTATION_INTERVAL = 24 * 60 * 60
+DEFAULT_BACKUP_COUNT = 7
+
+# Attributes every LogRecord has; anything else was passed with extra=
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+_queue_handler = None
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats each record as a single-line JSON object."""
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created).astimezone().isoformat(
+                timespec="milliseconds"
+            ),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "thread": record.threadName,
+            "module": record.module,
+            "function": record.funcName,
+            "line": record.lineno,
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        if record.stack_info:
+            entry["stack"] = self.formatStack(record.stack_info)
+        entry.update(
+            (key, value) for key, value in vars(record).items()
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_")
+        )
+        return json.dumps(entry, default=str)
+
+
+class RotatingCompressedFileHandler(logging.handlers.BaseRotatingHandler):
+    """
+    File handler rotating by size and by age, gzip-compressing rotated files.
+
+    The live file is rolled over to name.1(.gz) once it would exceed
+    max_bytes or interval seconds have passed since the last rollover;
+    older files shift up and only backup_count of them are kept.
+
+    Args:
+        max_bytes: Size limit of the live file (0: no limit)
+        interval: Seconds between rollovers (0: never by age)
+        clock: Injectable time source
+    """
+
+    def __init__(self, filename, max_bytes=DEFAULT_MAX_BYTES, interval=DEFAULT_ROTATION_INTERVAL,
+                 backup_count=DEFAULT_BACKUP_COUNT, compress=True, encoding="utf-8",
+                 clock=time.time):
+        super().__init__(filename, "a", encoding=encoding, delay=True)
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self.backup_count = backup_count
+        self.compress = compress
+        self._clock = clock
+        # An existing log file ages from when it was last written
+        started = os.path.getmtime(self.baseFilename) if os.path.exists(self.baseFilename) \
+            else clock()
+        self.rollover_at = started + interval
+
+    def _backup_name(self, index):
+        name = f"{self.baseFilename}.{index}"
+        return name + ".gz" if self.compress else name
+
+    def shouldRollover(self, record):
+        if self.stream is None:
+            self.stream = self._open()
+        self.stream.seek(0, os.SEEK_END)
+        size = self.stream.tell()
+        if self.interval and self._clock() >= self.rollover_at:
+            if size:
+                return True
+            # Nothing to rotate yet; the new period starts now
+            self.rollover_at = self._clock() + self.interval
+        if self.max_bytes and size:
+            # Formats the record a second time to measure it, as RotatingFileHandler
+            # does; this runs on the listener thread, not on the logging caller
+            message = f"{self.format(record)}\n"
+            return size + len(message.encode(self.encoding or "utf-8")) > self.max_bytes
+        return False
+
+    def doRollover(self):
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+        if self.backup_count > 0:
+            for index in range(self.backup_count - 1, 0, -1):
+                source = self._backup_name(index)
+                if os.path.exists(source):
+                    os.replace(source, self._backup_name(index + 1))
+            if self.compress:
+                with open(self.baseFilename, "rb") as source, \
+                        gzip.open(self._backup_name(1), "wb") as target:
+                    shutil.copyfileobj(source, target)
+                os.remove(self.baseFilename)
+            else:
+                os.replace(self.baseFilename, self._backup_name(1))
+        else:
+            os.remove(self.baseFilename)
+        self.rollover_at = self._clock() + self.interval
+
+
+class _NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Hands records to the listener thread unformatted.
+
+    QueueHandler.prepare formats the whole record, which would run the file
+    formatter on the calling thread and lose the exception for JSON output.
+    Only the message and traceback are rendered here; the listener's
+    handlers format the rest.
+    """
+
+    def prepare(self, record):
+        message = record.getMessage()
+        exc_text = record.exc_text
+        if record.exc_info and not exc_text:
+            exc_text = logging.Formatter().formatException(record.exc_info)
+        record = logging.makeLogRecord(vars(record))
+        record.msg, record.args = message, None
+        record.exc_info, record.exc_text = None, exc_text
+        return record
+
+
+def configure_logging(log_file, level=logging.INFO, json_format=False, max_bytes=DEFAULT_MAX_BYTES,
+                      interval=DEFAULT_ROTATION_INTERVAL, backup_count=DEFAULT_BACKUP_COUNT,
+                      compress=True, console=True):
+    """
+    Routes all logging through a queue to a rotating log file (and stderr).
+
+    Replaces the handlers an earlier call installed. stop_logging, also run
+    at exit, writes out what is still queued.
+
+    Args:
+        log_file: Path of the live log file
+        level: Root logger level, as a number or a name like "INFO"
+        json_format: Write one JSON object per line instead of text lines
+        max_bytes, interval, backup_count, compress: See RotatingCompressedFileHandler
+        console: Also write text lines to stderr
+
+    Returns:
+        logging.handlers.QueueListener: The started listener
+    """
+    global _queue_handler, _listener
+    stop_logging()
+
+    file_handler = RotatingCompressedFileHandler(log_file, max_bytes, interval,
+                                                 backup_count, compress)
+    file_handler.setFormatter(JsonFormatter() if json_format else logging.Formatter(TEXT_FORMAT))
+    handlers = [file_handler]
+    if console:
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+        handlers.append(console_handler)
+
+    # SimpleQueue is unbounded, so logging never waits for the writer
+    records = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(records, *handlers, respect_handler_level=True)
+    _queue_handler = _NonBlockingQueueHandler(records)
+    root = logging.getLogger()
+    root.addHandler(_queue_handler)
+    root.setLevel(level.upper() if isinstance(level, str) else level)
+    _listener.start()
+    return _listener
+
+
+def stop_logging():
+    """Detaches the queue handler and flushes and closes the log handlers."""
+    global _queue_handler, _listener
+    if _queue_handler is not None:
+        logging.getLogger().removeHandler(_queue_handler)
+        _queue_handler = None
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+atexit.register(stop_logging)
@@ -0,0 +1,248 @@
+"""
+Headless command line entry point for macOS_application_speedtest_for_python.
+
+Runs speed tests through SpeedTestService without tkinter, ttkbootstrap or
+matplotlib, prints one JSON or CSV line per test on stdout and appends the
+results to the history store. Meant for cron jobs, systemd timers and other
+unattended probes.
+"""
+import os
+import sys
+import csv
+import json
+import time
+import logging
+import argparse
+from speedtest_app.history_store import (
+    LATENCY_FIELDS,
+    NIC_FIELDS,
+    convert_history,
+    get_history_store
+)
+from speedtest_app.metrics_exporter import start_metrics_exporter
+from speedtest_app.scheduler import SpeedTestScheduler
+from speedtest_app.speedtest_service import SpeedTestService
+from speedtest_app.utils import get_app_version, load_settings
+
+logger = logging.getLogger("SpeedTest")
+
+# Exit codes
+EXIT_OK = 0
+EXIT_TEST_FAILED = 1
+EXIT_USAGE = 2
+EXIT_HISTORY_FAILED = 3
+
+CSV_FIELDS = ("timestamp", "download", "upload", "ping", "error")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="alex-speedtest-cli",
+        description="Run internet speed tests without a GUI."
+    )
+    parser.add_argument("--format", choices=("json", "csv"), default="json",
+                        help="output format, one line per test (default: json)")
+    parser.add_argument("--count", type=int, default=1,
+                        help="number of tests to run (default: 1)")
+    parser.add_argument("--interval", type=float, default=0.0,
+                        help="seconds to wait between tests (default: 0; with --schedule "
+                             "the scheduler_interval setting)")
+    parser.add_argument("--schedule", action="store_true",
+                        help="keep running tests periodically until interrupted, with "
+                             "jitter, failure backoff and saturation checks")
+    parser.add_argument("--metrics-port", type=int, metavar="PORT",
+                        help="serve Prometheus metrics on localhost:PORT/metrics while running")
+    parser.add_argument("--history", metavar="PATH", default=None,
+                        help="history file to append to (default: the app's history)")
+    parser.add_argument("--convert-history", nargs=2, metavar=("SOURCE", "TARGET"),
+                        help="convert a history file to the format given by TARGET's extension "
+                             "(.jsonl, .db, .bin, or .json for the legacy format) and exit")
+    parser.add_argument("--no-save", action="store_true",
+                        help="do not write results to the history")
+    parser.add_argument("--no-header", action="store_true",
+                        help="omit the CSV header line")
+    parser.add_argument("--server-url", metavar="URL", default=None,
+                        help="test against this server instead of speedtest.net, "
+                             "e.g. a local stand-in server")
+    parser.add_argument("-v", "--verbose", action="store_true",
+                        help="log progress to stderr")
+    parser.add_argument("--version", action="version", version=f"%(prog)s {get_app_version()}")
+    return parser
+
+
+class ResultWriter:
+    """Writes results to a stream as JSON lines or CSV rows."""
+
+    def __init__(self, stream, output_format, header=True):
+        self.stream = stream
+        self.output_format = output_format
+        self._csv = None
+        if output_format == "csv":
+            self._csv = csv.DictWriter(stream, fieldnames=CSV_FIELDS, lineterminator="\n")
+            if header:
+                self._csv.writeheader()
+
+    def write(self, result):
+        if self._csv is not None:
+            self._csv.writerow({field: result.get(field, "") for field in CSV_FIELDS})
+        else:
+            self.stream.write(json.dumps(result) + "\n")
+        # Flush per line so a consumer reading a pipe sees results immediately
+        self.stream.flush()
+
+
+def _open_store(args):
+    if args.no_save:
+        return None
+    store = get_history_store(args.history)
+    # Headless probes often have no ~/Downloads yet
+    os.makedirs(os.path.dirname(os.path.abspath(store.path)), exist_ok=True)
+    return store
+
+
+def result_output(result):
+    """
+    Returns the history record and the output row for a service result.
+
+    Returns:
+        tuple: (record, output dict)
+    """
+    # Timestamped when the run finished, as in the GUI's history
+    record = result.history_record()
+    output = {
+        "timestamp": record["timestamp"],
+        "download": result.get("download"),
+        "upload": result.get("upload"),
+        "ping": result.get("ping"),
+    }
+    # JSON lines carry the latency distribution and interface counters too;
+    # the CSV columns stay fixed
+    output.update(
+        (field, record[field]) for field in LATENCY_FIELDS + NIC_FIELDS if field in record
+    )
+    if "error" in result:
+        output["error"] = result["error"]
+    if result.get("partial"):
+        output["timed_out"] = list(result["timed_out"])
+    return record, output
+
+
+def run_tests(args, service, writer):
+    """
+    Runs args.count tests and writes each result.
+
+    Returns:
+        int: Exit code
+    """
+    exit_code = EXIT_OK
+    store = _open_store(args)
+
+    for i in range(args.count):
+        if i and args.interval > 0:
+            time.sleep(args.interval)
+
+        result = service.run_speedtest().result()
+        record, output = result_output(result)
+
+        if "error" in result:
+            writer.write(output)
+            exit_code = max(exit_code, EXIT_TEST_FAILED)
+            continue
+
+        writer.write(output)
+        if result.get("partial"):
+            # A phase cut off by its timeout would skew the history's statistics
+            logger.warning(f"Partial result not saved to history: {result['timed_out']} timed out")
+        elif store is not None:
+            # Loads NumPy for the columnar cache, so only once there is something to save
+            from speedtest_app.history_cache import append_to_history
+            try:
+                append_to_history(store, record)
+            except Exception as e:
+                logger.error(f"Error saving test results: {e}", exc_info=True)
+                exit_code = max(exit_code, EXIT_HISTORY_FAILED)
+
+    return exit_code
+
+
+def run_conversion(source_path, target_path):
+    """
+    Converts a history file for --convert-history.
+
+    Returns:
+        int: Exit code
+    """
+    try:
+        count = convert_history(source_path, target_path)
+    except (OSError, ValueError) as e:
+        print(f"error: could not convert history: {e}", file=sys.stderr)
+        return EXIT_HISTORY_FAILED
+    print(f"Converted {count} history records to {target_path}")
+    return EXIT_OK
+
+
+def run_schedule(args, service, writer, settings):
+    """
+    Runs tests through SpeedTestScheduler until interrupted.
+
+    Returns:
+        int: Exit code
+    """
+    if args.interval > 0:
+        settings["scheduler_interval"] = args.interval
+    scheduler = SpeedTestScheduler(
+        service,
+        settings,
+        store=_open_store(args),
+        on_result=lambda result: writer.write(result_output(result)[1])
+    )
+    scheduler.run_forever()
+    return EXIT_OK
+
+
+def main(argv=None):
+    """Console entry point; returns the process exit code."""
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.count < 1 or args.interval < 0:
+        parser.print_usage(sys.stderr)
+        print("error: --count must be at least 1 and --interval not negative", file=sys.stderr)
+        return EXIT_USAGE
+
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        stream=sys.stderr
+    )
+
+    if args.convert_history:
+        return run_conversion(*args.convert_history)
+
+    settings = load_settings()
+    if args.server_url:
+        settings["speedtest_server_url"] = args.server_url
+    service = SpeedTestService(settings)
+    writer = ResultWriter(sys.stdout, args.format, header=not args.no_header)
+    exporter = None
+    if args.metrics_port is not None:
+        exporter = start_metrics_exporter(
+            service, settings, get_history_store(args.history), args.metrics_port
+        )
+        if exporter is None:
+            return EXIT_USAGE
+    try:
+        if args.schedule:
+            return run_schedule(args, service, writer, settings)
+        return run_tests(args, service, writer)
+    except KeyboardInterrupt:
+        service.cancel()
+        # Interrupting a schedule is the normal way to end it
+        return EXIT_OK if args.schedule else EXIT_TEST_FAILED
+    finally:
+        service.executor.shutdown(wait=False)
+        if exporter is not None:
+            exporter.stop()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -45,6 +45,16 @@ class ResultsFrame(tb.Frame):
         self.ping_value = tb.Label(self.ping_row, text="-- ms", font=font_value, width=15, anchor="e")
         self.ping_value.pack(side="left", padx=5)
 
+        # Latency distribution
+        self.latency_range_value = self._add_row("Min / median:", "-- ms")
+        self.latency_tail_value = self._add_row("p95 / p99:", "-- ms")
+        self.jitter_value = self._add_row("Jitter:", "-- ms")
+        self.loss_value = self._add_row("Packet loss:", "-- %")
+        # Median latency increase while downloading / uploading (bufferbloat)
+        self.loaded_value = self._add_row("Under load:", "-- ms")
+        # Download / upload throughput the network interfaces counted
+        self.nic_value = self._add_row("Interface:", "-- Mbps")
+
         # Timestamp
         self.timestamp_row = tb.Frame(self)
         self.timestamp_row.pack(fill="x", pady=6)
@@ -55,37 +65,86 @@ class ResultsFrame(tb.Frame):
 
         self.pack_forget()
 
-    def update_results(self, download, upload, ping, timestamp):
-        """Updates the result values."""
+    def _add_row(self, text, placeholder):
+        row = tb.Frame(self)
+        row.pack(fill="x", pady=6)
+        label = tb.Label(row, text=text, font=("Segoe UI", 12), width=15, anchor="w")
+        label.pack(side="left", padx=5)
+        value = tb.Label(row, text=placeholder, font=("Segoe UI", 12, "bold"), width=15, anchor="e")
+        value.pack(side="left", padx=5)
+        return value
+
+    def update_results(self, download, upload, ping, timestamp, latency=None):
+        """
+        Updates the result values; latency is a mapping with the latency_* fields
+        and the interface counter fields, such as a SpeedTestResult.
+        """
         self.download_value.config(text=f"{download} Mbps")
         self.upload_value.config(text=f"{upload} Mbps")
         self.ping_value.config(text=f"{ping} ms")
         self.timestamp_value.config(text=timestamp)
+        self._update_latency(latency or {})
+        self._update_nic(latency or {})
         self.pack(fill="both", expand=True, pady=10)
 
+    def _update_latency(self, latency):
+        if latency.get("latency_median") is None:
+            self._clear_latency()
+        else:
+            self.latency_range_value.config(
+                text=f"{latency['latency_min']:.1f} / {latency['latency_median']:.1f} ms"
+            )
+            self.latency_tail_value.config(
+                text=f"{latency['latency_p95']:.1f} / {latency['latency_p99']:.1f} ms"
+            )
+            self.jitter_value.config(text=f"{latency['jitter']:.1f} ms")
+            self.loss_value.config(text=f"{latency['packet_loss']:.1f} %")
+        deltas = [latency.get(f"{direction}_latency_delta") for direction in ("download", "upload")]
+        if any(delta is not None for delta in deltas):
+            text = " / ".join("--" if delta is None else f"{delta:+.1f}" for delta in deltas)
+            self.loaded_value.config(text=f"{text} ms")
+        else:
+            self.loaded_value.config(text="-- ms")
+
+    def _update_nic(self, result):
+        rates = [result.get(f"{direction}_nic_mbps") for direction in ("download", "upload")]
+        text = " / ".join("--" if rate is None else f"{rate:.1f}" for rate in rates)
+        self.nic_value.config(text=f"{text} Mbps")
+
+    def _clear_latency(self):
+        self.latency_range_value.config(text="-- ms")
+        self.latency_tail_value.config(text="-- ms")
+        self.jitter_value.config(text="-- ms")
+        self.loss_value.config(text="-- %")
+        self.loaded_value.config(text="-- ms")
+
     def clear(self):
         """Clears the result values."""
         self.download_value.config(text="-- Mbps")
         self.upload_value.config(text="-- Mbps")
         self.ping_value.config(text="-- ms")
         self.timestamp_value.config(text="--")
+        self._clear_latency()
+        self.nic_value.config(text="-- Mbps")
 
 
 class SettingsWindow:
     """Window for application settings (modern, dark, airy)."""
 
+    HISTORY_BACKENDS = {"jsonl": "JSON lines", "sqlite": "SQLite", "binary": "Binary"}
+
     def __init__(self, parent, settings, save_callback):
         self.parent = parent
         self.settings = settings
         self.save_callback = save_callback
         self.window = tb.Toplevel(parent)
         self.window.title("Settings")
-        self.window.geometry("400x300")
+        self.window.geometry("400x540")
         self.window.resizable(False, False)
         self.window.transient(parent)
         self.window.grab_set()
         x = parent.winfo_x() + (parent.winfo_width() // 2) - (400 // 2)
-        y = parent.winfo_y() + (parent.winfo_height() // 2) - (300 // 2)
+        y = parent.winfo_y() + (parent.winfo_height() // 2) - (540 // 2)
         self.window.geometry(f"+{x}+{y}")
         self.frame = tb.Frame(self.window, padding=30)
         self.frame.pack(fill="both", expand=True)
@@ -110,6 +169,56 @@ class SettingsWindow:
             variable=self.dark_mode_var
         )
         self.dark_mode_check.pack(anchor="w", pady=10)
+        self.auto_scale_var = tk.BooleanVar(value=settings.get("engine_auto_scale", False))
+        self.auto_scale_check = tb.Checkbutton(
+            self.frame,
+            text="Auto-scale parallel streams (fast links)",
+            variable=self.auto_scale_var
+        )
+        self.auto_scale_check.pack(anchor="w", pady=10)
+        self.loaded_latency_var = tk.BooleanVar(value=settings.get("latency_under_load", False))
+        self.loaded_latency_check = tb.Checkbutton(
+            self.frame,
+            text="Measure latency under load (bufferbloat)",
+            variable=self.loaded_latency_var
+        )
+        self.loaded_latency_check.pack(anchor="w", pady=10)
+        self.backend_row = tb.Frame(self.frame)
+        self.backend_row.pack(fill="x", pady=10)
+        tb.Label(self.backend_row, text="History storage:").pack(side="left")
+        self.backend_var = tk.StringVar(
+            value=self.HISTORY_BACKENDS.get(settings.get("history_backend", "jsonl"), "JSON lines")
+        )
+        self.backend_combo = tb.Combobox(
+            self.backend_row,
+            textvariable=self.backend_var,
+            values=list(self.HISTORY_BACKENDS.values()),
+            state="readonly",
+            width=12
+        )
+        self.backend_combo.pack(side="right")
+        self.scheduler_var = tk.BooleanVar(value=settings.get("scheduler_enabled", False))
+        self.scheduler_check = tb.Checkbutton(
+            self.frame,
+            text="Run tests automatically",
+            variable=self.scheduler_var
+        )
+        self.scheduler_check.pack(anchor="w", pady=10)
+        self.interval_row = tb.Frame(self.frame)
+        self.interval_row.pack(fill="x", pady=10)
+        tb.Label(self.interval_row, text="Test every (minutes):").pack(side="left")
+        self.interval_var = tk.StringVar(
+            value=str(round(settings.get("scheduler_interval", 3600) / 60))
+        )
+        self.interval_spin = tb.Spinbox(
+            self.interval_row,
+            textvariable=self.interval_var,
+            from_=5,
+            to=24 * 60,
+            increment=5,
+            width=8
+        )
+        self.interval_spin.pack(side="right")
         self.button_frame = tb.Frame(self.window)
         self.button_frame.pack(fill="x", padx=30, pady=20)
         self.save_button = tb.Button(
@@ -130,6 +239,17 @@ class SettingsWindow:
         self.settings["auto_save_results"] = self.auto_save_var.get()
         self.settings["show_network_info"] = self.show_network_var.get()
         self.settings["dark_mode"] = self.dark_mode_var.get()
+        self.settings["engine_auto_scale"] = self.auto_scale_var.get()
+        self.settings["latency_under_load"] = self.loaded_latency_var.get()
+        self.settings["history_backend"] = next(
+            (key for key, label in self.HISTORY_BACKENDS.items() if label == self.backend_var.get()),
+            "jsonl"
+        )
+        self.settings["scheduler_enabled"] = self.scheduler_var.get()
+        try:
+            self.settings["scheduler_interval"] = max(1, int(self.interval_var.get())) * 60
+        except ValueError:
+            pass  # Keep the previous interval
 
         if self.save_callback:
             self.save_callback(self.settings)
@@ -137,7 +257,7 @@ class SettingsWindow:
         self.window.destroy()
 
 
-def create_menu(root, settings_callback, about_callback):
+def create_menu(root, settings_callback, about_callback, export_callback=None):
     """Creates the application menu bar."""
     menubar = Menu(root)
 
@@ -150,8 +270,10 @@ def create_menu(root, settings_callback, about_callback):
 
     # Tools menu
     tools_menu = Menu(menubar, tearoff=0)
-    tools_menu.add_command(label="Export All History", command=lambda: messagebox.showinfo(
-        "Feature Coming Soon", "This feature will be available in the next update."
+    tools_menu.add_command(label="Export All History", command=export_callback or (
+        lambda: messagebox.showinfo(
+            "Feature Coming Soon", "This feature will be available in the next update."
+        )
     ))
     tools_menu.add_command(label="Clear History", command=lambda: messagebox.showinfo(
         "Feature Coming Soon", "This feature will be available in the next update."
@@ -211,4 +333,4 @@ def show_about_dialog(parent):
 
     # Close button
     close_button = tb.Button(about_window, text="Close", command=about_window.destroy)
-    close_button.pack(pady=20)
\ No newline at end of file
+    close_button.pack(pady=20)
@@ -0,0 +1,108 @@
+"""
+Live bandwidth panel for macOS_application_speedtest_for_python.
+"""
+import tkinter as tk
+import ttkbootstrap as tb
+from speedtest_app.gui.progress_panel import gauge_limit
+from speedtest_app.nic_sampler import DEFAULT_MONITOR_WINDOW, BandwidthMonitor
+
+RECEIVED = 0
+SENT = 1
+
+
+def sparkline_coords(ages, values, span, width, height, limit):
+    """
+    Maps a rolling series to flat canvas coordinates, newest point at the right.
+
+    Args:
+        ages: Seconds before the newest sample of each value
+        values: The values, same length as ages
+        span: Seconds the full width represents
+        limit: Value drawn at the top edge
+
+    Returns:
+        list: x0, y0, x1, y1, ... as canvas.coords expects
+    """
+    import numpy as np
+
+    xs = width * (1 - np.asarray(ages) / span)
+    ys = (height - 1) * (1 - np.minimum(np.asarray(values) / limit, 1.0)) + 1
+    return np.column_stack((xs, ys)).ravel().tolist()
+
+
+class BandwidthPanel(tb.Frame):
+    """
+    Rolling download and upload sparkline of the active network adapter.
+
+    The canvas items are created once; every refresh samples the counters
+    and moves the existing lines with canvas.coords.
+    """
+
+    def __init__(self, parent, interval=1.0, window=DEFAULT_MONITOR_WINDOW,
+                 width=340, height=56):
+        super().__init__(parent)
+        self.interval_ms = int(interval * 1000)
+        self.span = interval * window
+        self.monitor = BandwidthMonitor(window=window)
+        self.width, self.height = width, height
+        self.limit = None
+        self._after_id = None
+
+        colors = tb.Style().colors
+        self.rates_label = tb.Label(self, text="↓ -- Mbps   ↑ -- Mbps", font=("Segoe UI", 11))
+        self.rates_label.pack()
+        self.canvas = tk.Canvas(self, width=width, height=height, highlightthickness=1,
+                                highlightbackground=colors.border, background=colors.inputbg)
+        self.canvas.pack(pady=(2, 0))
+        self.lines = {
+            RECEIVED: self.canvas.create_line(0, height, 0, height, fill=colors.success, width=2),
+            SENT: self.canvas.create_line(0, height, 0, height, fill=colors.info, width=2),
+        }
+        self.scale_text = self.canvas.create_text(4, 2, anchor="nw", fill=colors.secondary,
+                                                  font=("Segoe UI", 8), text="")
+
+    def set_interface(self, name):
+        """Monitors another adapter (None: none), starting an empty series."""
+        interfaces = [name] if name else []
+        if interfaces != self.monitor.interfaces:
+            self.monitor.reset(interfaces)
+            self.monitor.sample()
+            self._redraw()
+
+    def start(self):
+        if self._after_id is None:
+            self._after_id = self.after(self.interval_ms, self._tick)
+
+    def stop(self):
+        if self._after_id is not None:
+            self.after_cancel(self._after_id)
+            self._after_id = None
+
+    def _tick(self):
+        self.monitor.sample()
+        self._redraw()
+        self._after_id = self.after(self.interval_ms, self._tick)
+
+    def _redraw(self):
+        ages, rates = self.monitor.rates()
+        if not len(ages) or not self.monitor.interfaces:
+            for line in self.lines.values():
+                self.canvas.coords(line, 0, self.height, 0, self.height)
+            self.rates_label.config(text="↓ -- Mbps   ↑ -- Mbps")
+            return
+        rates = rates[:, 0, :]
+        limit = gauge_limit(float(rates.max()), minimum=1)
+        if limit != self.limit:
+            self.limit = limit
+            self.canvas.itemconfigure(self.scale_text, text=f"{limit} Mbps")
+        if len(ages) == 1:
+            # A line needs two points
+            import numpy as np
+
+            ages, rates = np.append(ages, ages), np.vstack((rates, rates))
+        for direction, line in self.lines.items():
+            self.canvas.coords(line, *sparkline_coords(
+                ages, rates[:, direction], self.span, self.width, self.height, limit
+            ))
+        received, sent = rates[-1]
+        self.rates_label.config(text=f"↓ {received:.2f} Mbps   ↑ {sent:.2f} Mbps")
@@ -0,0 +1,142 @@
+"""
+History export dialog for macOS_application_speedtest_for_python.
+"""
+import logging
+import tkinter as tk
+from tkinter import filedialog, messagebox
+import ttkbootstrap as tb
+from speedtest_app.history_export import ExportCancelled, HistoryExportJob
+from speedtest_app.history_pager import format_epoch, parse_filter_time
+
+logger = logging.getLogger("SpeedTest")
+
+
+class ExportDialog:
+    """Window that exports the history to CSV in the background with progress."""
+
+    def __init__(self, parent, store, start=None, end=None, max_download=None,
+                 sort_by=None, descending=False):
+        self.parent = parent
+        self.store = store
+        self.max_download = max_download
+        self.sort_by = sort_by
+        self.descending = descending
+        self.job = None
+        self.window = tb.Toplevel(parent)
+        self.window.title("Export History")
+        self.window.geometry("420x260")
+        self.window.resizable(False, False)
+        self.window.transient(parent)
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+
+        frame = tb.Frame(self.window, padding=20)
+        frame.pack(fill="both", expand=True)
+
+        range_row = tb.Frame(frame)
+        range_row.pack(fill="x", pady=5)
+        tb.Label(range_row, text="From:").pack(side="left")
+        self.start_entry = tb.Entry(range_row, width=19)
+        self.start_entry.pack(side="left", padx=(2, 10))
+        tb.Label(range_row, text="To:").pack(side="left")
+        self.end_entry = tb.Entry(range_row, width=19)
+        self.end_entry.pack(side="left", padx=2)
+        # Full timestamps, so the export covers exactly the window's range
+        if start is not None:
+            self.start_entry.insert(0, format_epoch(start))
+        if end is not None:
+            self.end_entry.insert(0, format_epoch(end))
+
+        self.gzip_var = tk.BooleanVar(value=False)
+        tb.Checkbutton(frame, text="Compress with gzip", variable=self.gzip_var).pack(
+            anchor="w", pady=10
+        )
+
+        self.progress_bar = tb.Progressbar(frame, length=360, mode="determinate")
+        self.progress_bar.pack(pady=5)
+        hint = "Dates as YYYY-MM-DD [HH:MM:SS]; leave empty for all runs"
+        if max_download is not None:
+            hint = f"Runs below {max_download:g} Mbps. {hint}"
+        self.status_label = tb.Label(frame, text=hint, wraplength=380)
+        self.status_label.pack(anchor="w")
+
+        button_frame = tb.Frame(self.window)
+        button_frame.pack(fill="x", padx=20, pady=10)
+        self.export_button = tb.Button(button_frame, text="Export...", command=self.start_export)
+        self.export_button.pack(side="left", padx=5)
+        self.close_button = tb.Button(button_frame, text="Close", command=self.close)
+        self.close_button.pack(side="right", padx=5)
+
+    def start_export(self):
+        """Asks for a destination and starts the export job."""
+        try:
+            start = parse_filter_time(self.start_entry.get())
+            end = parse_filter_time(self.end_entry.get(), end_of_day=True)
+        except ValueError:
+            messagebox.showerror("Export", "Use dates as YYYY-MM-DD or YYYY-MM-DD HH:MM:SS.",
+                                 parent=self.window)
+            return
+
+        compress = self.gzip_var.get()
+        file_path = filedialog.asksaveasfilename(
+            parent=self.window,
+            defaultextension=".csv.gz" if compress else ".csv",
+            filetypes=[("CSV files", "*.csv"), ("Gzipped CSV files", "*.csv.gz"),
+                       ("All files", "*.*")],
+            title="Export History to CSV"
+        )
+        if not file_path:
+            return
+
+        self.job = HistoryExportJob(
+            self.store,
+            file_path,
+            compress=compress,
+            start=None if start is None else format_epoch(start),
+            end=None if end is None else format_epoch(end),
+            max_download=self.max_download,
+            sort_by=self.sort_by,
+            descending=self.descending
+        )
+        self.job.submit()
+        self.export_button.config(state="disabled")
+        self.close_button.config(text="Cancel")
+        self.progress_bar["value"] = 0
+        self.window.after(100, self._check_export)
+
+    def _check_export(self):
+        if not self.window.winfo_exists():
+            return
+        job = self.job
+        if not job.future.done():
+            fraction = job.fraction_done()
+            if fraction is not None and job.start is None and job.end is None:
+                self.progress_bar["value"] = fraction * 100
+            self.status_label.config(text=f"Exported {job.rows_written} runs...")
+            self.window.after(100, self._check_export)
+            return
+
+        self.export_button.config(state="normal")
+        self.close_button.config(text="Close")
+        try:
+            rows = job.future.result()
+        except ExportCancelled:
+            self.status_label.config(text="Export cancelled")
+            return
+        except Exception as e:
+            logger.error(f"History export failed: {e}", exc_info=True)
+            messagebox.showerror("Export Error", f"Could not export history: {e}",
+                                 parent=self.window)
+            self.status_label.config(text="Export failed")
+            return
+        finally:
+            self.job = None
+        self.progress_bar["value"] = 100
+        self.status_label.config(text=f"Exported {rows} runs")
+        messagebox.showinfo("Export", f"History exported to {job.file_path}", parent=self.window)
+
+    def close(self):
+        """Cancels a running export, or closes the window."""
+        if self.job is not None:
+            self.job.cancel()
+            return
+        self.window.destroy()
@@ -0,0 +1,126 @@
+"""
+Lazily paged history table for macOS_application_speedtest_for_python.
+"""
+import logging
+import ttkbootstrap as tb
+from tkinter import messagebox
+from speedtest_app.history_pager import HistoryPager, parse_filter_time
+
+logger = logging.getLogger("SpeedTest")
+
+
+class HistoryTable(tb.Frame):
+    """
+    Treeview that only holds the rows the user has scrolled to.
+
+    Rows are fetched from a HistoryPager one page at a time; the next page is
+    loaded when the view is scrolled close to the bottom. Clicking a heading
+    sorts and the filter bar filters, both on the storage side.
+    """
+
+    PAGE_SIZE = 200
+    # Load the next page when the last visible row is past this fraction
+    PREFETCH_AT = 0.9
+
+    COLUMNS = (
+        ("index", "#", 60),
+        ("timestamp", "Timestamp", 170),
+        ("download_speed", "Download (Mbps)", 130),
+        ("upload_speed", "Upload (Mbps)", 130),
+        ("ping", "Ping (ms)", 90),
+    )
+
+    def __init__(self, master, store, **kwargs):
+        super().__init__(master, **kwargs)
+        self.pager = HistoryPager(store)
+        self.loaded = 0
+        self._page_pending = False
+
+        self._build_filter_bar()
+
+        table_frame = tb.Frame(self)
+        table_frame.pack(fill="both", expand=True)
+        self.tree = tb.Treeview(
+            table_frame,
+            columns=[key for key, _, _ in self.COLUMNS],
+            show="headings",
+            bootstyle="dark"
+        )
+        for key, heading, width in self.COLUMNS:
+            self.tree.heading(key, text=heading, command=lambda k=key: self.sort(k))
+            self.tree.column(key, width=width, anchor="center")
+        self.scrollbar = tb.Scrollbar(table_frame, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=self._on_scroll)
+        self.tree.pack(side="left", fill="both", expand=True)
+        self.scrollbar.pack(side="right", fill="y")
+
+        self.status_label = tb.Label(self, text="", font=("Segoe UI", 10))
+        self.status_label.pack(anchor="w", pady=(5, 0))
+
+        self.reload()
+
+    def _build_filter_bar(self):
+        bar = tb.Frame(self)
+        bar.pack(fill="x", pady=(0, 10))
+        tb.Label(bar, text="From:").pack(side="left")
+        self.start_entry = tb.Entry(bar, width=11)
+        self.start_entry.pack(side="left", padx=(2, 8))
+        tb.Label(bar, text="To:").pack(side="left")
+        self.end_entry = tb.Entry(bar, width=11)
+        self.end_entry.pack(side="left", padx=(2, 8))
+        tb.Label(bar, text="Download <").pack(side="left")
+        self.max_download_entry = tb.Entry(bar, width=7)
+        self.max_download_entry.pack(side="left", padx=(2, 8))
+        tb.Button(bar, text="Filter", command=self.apply_filter).pack(side="left")
+
+    def apply_filter(self):
+        """Applies the filter bar (dates as YYYY-MM-DD) to the pager."""
+        try:
+            start = parse_filter_time(self.start_entry.get())
+            end = parse_filter_time(self.end_entry.get(), end_of_day=True)
+            max_download = self.max_download_entry.get().strip()
+            max_download = float(max_download) if max_download else None
+        except ValueError:
+            messagebox.showerror("Filter", "Use dates as YYYY-MM-DD and a number for speed.")
+            return
+        self.pager.set_query(start=start, end=end, max_download=max_download)
+        self.reload()
+
+    def sort(self, key):
+        """Sorts by a column; clicking the same column again reverses the order."""
+        descending = not self.pager.descending if self.pager.sort_by == key else False
+        self.pager.set_query(
+            sort_by=key,
+            descending=descending,
+            start=self.pager.start,
+            end=self.pager.end,
+            max_download=self.pager.max_download
+        )
+        self.reload()
+
+    def reload(self):
+        """Drops all loaded rows and loads the first page of the current query."""
+        self.tree.delete(*self.tree.get_children())
+        self.loaded = 0
+        self._load_next_page()
+        self.tree.yview_moveto(0)
+
+    def _load_next_page(self):
+        self._page_pending = False
+        rows = self.pager.rows(self.loaded, self.PAGE_SIZE)
+        for row in rows:
+            number, timestamp, download, upload, ping = row
+            self.tree.insert(
+                "", "end",
+                values=(number, timestamp, f"{download:.2f}", f"{upload:.2f}", f"{ping:.1f}")
+            )
+        self.loaded += len(rows)
+        self.status_label.config(text=f"Showing {self.loaded} of {len(self.pager)} runs")
+
+    def _on_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        if (float(last) >= self.PREFETCH_AT and not self._page_pending
+                and self.loaded < len(self.pager)):
+            # Defer so the Treeview finishes its own scroll update first
+            self._page_pending = True
+            self.after_idle(self._load_next_page)
@@ -0,0 +1,75 @@
+"""
+Live test progress panel for macOS_application_speedtest_for_python.
+"""
+import ttkbootstrap as tb
+from speedtest_app.progress_events import (
+    PHASE_DOWNLOAD,
+    PHASE_UPLOAD,
+    PhaseChanged,
+    TransferProgress
+)
+
+# Share of the overall progress bar taken by each measuring phase
+PHASE_SPANS = {PHASE_DOWNLOAD: (0, 50), PHASE_UPLOAD: (50, 100)}
+
+
+def gauge_limit(mbps, minimum=100):
+    """Returns the next 1-2-5 step at or above mbps, used as the gauge's full scale."""
+    limit = minimum
+    steps = (1, 2, 5)
+    while limit < mbps:
+        magnitude = 10 ** (len(str(int(limit))) - 1)
+        lead = limit // magnitude
+        next_lead = next((s for s in steps if s > lead), None)
+        limit = next_lead * magnitude if next_lead else 10 * magnitude
+    return limit
+
+
+class TestProgressPanel(tb.Frame):
+    """Phase label, determinate progress bar and a live throughput gauge."""
+
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.label = tb.Label(self, text="", font=("Segoe UI", 12))
+        self.label.pack()
+        self.gauge = tb.Meter(
+            self,
+            metersize=150,
+            amounttotal=gauge_limit(0),
+            amountused=0,
+            subtext="Mbps",
+            interactive=False
+        )
+        self.gauge.pack(pady=5)
+        self.bar = tb.Progressbar(self, length=300, mode="determinate")
+        self.bar.pack()
+
+    def reset(self, message):
+        self.label.config(text=message)
+        self.bar.stop()
+        self.bar.config(mode="indeterminate")
+        self.bar.start(10)
+        self.gauge.configure(amountused=0, amounttotal=gauge_limit(0))
+
+    def handle(self, event):
+        """Renders one PhaseChanged or TransferProgress event."""
+        if isinstance(event, PhaseChanged):
+            self.label.config(text=event.message)
+            if event.phase in PHASE_SPANS:
+                self.bar.stop()
+                self.bar.config(mode="determinate")
+                self.bar["value"] = PHASE_SPANS[event.phase][0]
+                self.gauge.configure(amountused=0, subtext=f"{event.phase.title()} Mbps")
+        elif isinstance(event, TransferProgress) and event.phase in PHASE_SPANS:
+            low, high = PHASE_SPANS[event.phase]
+            self.bar["value"] = low + (high - low) * event.fraction
+            mbps = event.throughput / 1_000_000
+            if mbps > self.gauge.amounttotalvar.get():
+                self.gauge.configure(amounttotal=gauge_limit(mbps))
+            self.gauge.configure(amountused=int(round(mbps)))
+
+    def finish(self, message):
+        self.bar.stop()
+        self.bar.config(mode="determinate")
+        self.bar["value"] = 100
+        self.label.config(text=message)
@@ -0,0 +1,392 @@
+"""
+Rolling statistics and anomaly detection over the test history.
+
+Everything works on the NumPy columns of the history cache (see
+speedtest_app.history_cache) in vectorized passes:
+
+- rolling mean and standard deviation over a trailing time window from
+  cumulative sums, O(n) and exact for every run;
+- rolling median and percentiles over the same windows, computed by
+  partitioning a chunk of windows at once; long histories evaluate the
+  percentile windows at up to max_evaluations evenly spaced runs and hold
+  each value until the next one, which bounds the cost at any history size;
+- time-based EWMA baselines (a half-life in seconds, so irregular test
+  intervals are weighted correctly) from a closed-form solution of the
+  recurrence, O(n);
+- anomaly flags from the EWMA z-score or from the rolling median and MAD
+  (median absolute deviation) of the runs before each run; beyond
+  max_evaluations runs the MAD method scores each run against the exact
+  mean and standard deviation of its window instead.
+"""
+import math
+import logging
+import numpy as np
+
+logger = logging.getLogger("SpeedTest")
+
+METRICS = ("download_speed", "upload_speed", "ping")
+
+METHOD_ZSCORE = "zscore"
+METHOD_MAD = "mad"
+
+DEFAULT_WINDOW = 7 * 24 * 60 * 60
+DEFAULT_HALFLIFE = 24 * 60 * 60
+DEFAULT_THRESHOLD = 3.5
+DEFAULT_PERCENTILES = (10, 50, 90)
+# Median windows are capped at the newest runs, which bounds their cost;
+# 200 runs still cover a week of hourly scheduled tests
+DEFAULT_MAX_WINDOW_RUNS = 200
+# Up to this many runs the median windows are evaluated at every run
+DEFAULT_MAX_EVALUATIONS = 10_000
+# Runs needed before a baseline is trusted
+MIN_PERIODS = 5
+
+# Scale the MAD (or, where it is 0, the mean absolute deviation) to the
+# standard deviation of normally distributed data
+MAD_SCALE = 1.4826
+MEAN_DEVIATION_SCALE = 1.2533
+# Elements sorted per chunk of rolling windows
+CHUNK_ELEMENTS = 1 << 20
+# The EWMA closed form is restarted before its decay factor underflows
+# (exp(-709) is the smallest double; a segment decays by at most twice this)
+MAX_LOG_DECAY = 300.0
+
+
+def _monotonic_times(timestamps):
+    times = np.nan_to_num(np.asarray(timestamps, dtype=np.float64))
+    # A clock set back must not break the binary searches
+    return np.maximum.accumulate(times) if len(times) else times
+
+
+def window_bounds(timestamps, window, max_runs=None, include_current=True):
+    """
+    Returns the [start, end) run indices of the trailing window of each run.
+
+    Args:
+        window: Window length in seconds
+        max_runs: Keep at most this many of the newest runs of each window
+        include_current: Whether a run belongs to its own window; baselines
+            for anomaly detection leave it out
+    """
+    times = _monotonic_times(timestamps)
+    ends = np.arange(1, len(times) + 1) if include_current else np.arange(len(times))
+    starts = np.minimum(np.searchsorted(times, times - window, side="right"), ends)
+    if max_runs:
+        starts = np.maximum(starts, ends - max_runs)
+    return starts, ends
+
+
+def _window_sums(values, starts, ends, power=1):
+    """Sums of the finite values (raised to power) and their counts over [start, end)."""
+    finite = np.isfinite(values)
+    sums = np.concatenate(([0.0], np.cumsum(np.where(finite, values, 0.0) ** power)))
+    counted = np.concatenate(([0], np.cumsum(finite)))
+    return sums[ends] - sums[starts], counted[ends] - counted[starts]
+
+
+def rolling_mean(timestamps, values, window):
+    """
+    Mean of the finite values in each run's trailing time window.
+
+    Returns:
+        tuple: (means, counts); the mean is NaN for windows without values
+    """
+    values = np.asarray(values, dtype=np.float64)
+    starts, ends = window_bounds(timestamps, window)
+    totals, counts = _window_sums(values, starts, ends)
+    means = np.divide(totals, counts, out=np.full(len(values), np.nan), where=counts > 0)
+    return means, counts
+
+
+def rolling_std(timestamps, values, window, max_runs=None, include_current=True):
+    """
+    Mean and standard deviation of the finite values in each run's trailing
+    time window, exact for every run from cumulative sums in O(n).
+
+    Returns:
+        tuple: (means, standard deviations, counts); NaN for empty windows
+    """
+    values = np.asarray(values, dtype=np.float64)
+    starts, ends = window_bounds(timestamps, window, max_runs, include_current)
+    finite = values[np.isfinite(values)]
+    # Sums of squares around a typical value keep the variance from cancelling out
+    shift = float(np.median(finite)) if len(finite) else 0.0
+    totals, counts = _window_sums(values - shift, starts, ends)
+    squares, _ = _window_sums(values - shift, starts, ends, power=2)
+    empty = np.full(len(values), np.nan)
+    means = np.divide(totals, counts, out=empty.copy(), where=counts > 0)
+    mean_squares = np.divide(squares, counts, out=empty.copy(), where=counts > 0)
+    deviations = np.sqrt(np.clip(mean_squares - means * means, 0.0, None))
+    return means + shift, deviations, counts
+
+
+def _evaluated_rows(count, max_evaluations):
+    """Runs whose windows are evaluated: all, or evenly spaced ones plus the newest."""
+    if not max_evaluations or count <= max_evaluations:
+        return np.arange(count)
+    step = math.ceil(count / max_evaluations)
+    return np.unique(np.append(np.arange(0, count, step), count - 1))
+
+
+def _hold(rows, evaluated, count):
+    """Expands values evaluated at rows to every run, holding each until the next row."""
+    if len(rows) == count:
+        return evaluated
+    return evaluated[np.searchsorted(rows, np.arange(count), side="right") - 1]
+
+
+def _windows(values, starts, ends):
+    """Yields (offset, matrix) chunks, one row per window, NaN-padded on the left."""
+    width = int((ends - starts).max()) if len(ends) else 0
+    width = max(width, 1)
+    rows = max(1, CHUNK_ELEMENTS // width)
+    columns = np.arange(-width, 0)
+    for offset in range(0, len(ends), rows):
+        chunk_starts, chunk_ends = starts[offset:offset + rows], ends[offset:offset + rows]
+        index = chunk_ends[:, None] + columns
+        matrix = values[np.clip(index, 0, None)]
+        matrix[index < chunk_starts[:, None]] = np.nan
+        yield offset, matrix
+
+
+def _row_percentiles(matrix, percentiles):
+    """Linear-interpolated percentiles of each row, ignoring NaN."""
+    fractions = np.asarray(percentiles, dtype=np.float64) / 100.0
+    counts = np.sum(~np.isnan(matrix), axis=1)
+    result = np.full((len(matrix), len(fractions)), np.nan)
+    full = counts == matrix.shape[1]
+    if full.any():
+        # Full windows share their ranks, so a partial partition finds them
+        position = (matrix.shape[1] - 1) * fractions
+        below, above = np.floor(position).astype(np.int64), np.ceil(position).astype(np.int64)
+        ranks = np.unique(np.concatenate((below, above)))
+        ordered = np.partition(matrix[full], ranks, axis=1)
+        low, high = ordered[:, below], ordered[:, above]
+        result[full] = low + (high - low) * (position - below)
+    partial = ~full & (counts > 0)
+    if partial.any():
+        ordered = np.sort(matrix[partial], axis=1)     # NaN sorts last
+        position = (counts[partial] - 1)[:, None] * fractions
+        below = np.floor(position).astype(np.int64)
+        above = np.ceil(position).astype(np.int64)
+        low = np.take_along_axis(ordered, below, axis=1)
+        high = np.take_along_axis(ordered, above, axis=1)
+        result[partial] = low + (high - low) * (position - below)
+    return result
+
+
+def rolling_percentiles(timestamps, values, window, percentiles=DEFAULT_PERCENTILES,
+                        max_runs=DEFAULT_MAX_WINDOW_RUNS, include_current=True,
+                        max_evaluations=DEFAULT_MAX_EVALUATIONS):
+    """
+    Percentiles of each run's trailing time window, ignoring NaN.
+
+    Returns:
+        numpy.ndarray: Shape (runs, len(percentiles)); NaN for empty windows
+    """
+    values = np.asarray(values, dtype=np.float64)
+    starts, ends = window_bounds(timestamps, window, max_runs, include_current)
+    rows = _evaluated_rows(len(values), max_evaluations)
+    result = np.full((len(rows), len(percentiles)), np.nan)
+    for offset, matrix in _windows(values, starts[rows], ends[rows]):
+        result[offset:offset + len(matrix)] = _row_percentiles(matrix, percentiles)
+    return _hold(rows, result, len(values))
+
+
+def rolling_mad(timestamps, values, window, max_runs=DEFAULT_MAX_WINDOW_RUNS,
+                include_current=True, max_evaluations=DEFAULT_MAX_EVALUATIONS):
+    """
+    Median, median absolute deviation and mean absolute deviation (from
+    the median) of each run's trailing time window.
+
+    Returns:
+        tuple: (medians, MADs, mean deviations, counts of values in the windows)
+    """
+    values = np.asarray(values, dtype=np.float64)
+    starts, ends = window_bounds(timestamps, window, max_runs, include_current)
+    rows = _evaluated_rows(len(values), max_evaluations)
+    medians = np.full(len(rows), np.nan)
+    deviations = np.full(len(rows), np.nan)
+    mean_deviations = np.full(len(rows), np.nan)
+    for offset, matrix in _windows(values, starts[rows], ends[rows]):
+        median = _row_percentiles(matrix, (50,))
+        absolute = np.abs(matrix - median)
+        chunk = slice(offset, offset + len(matrix))
+        medians[chunk] = median[:, 0]
+        deviations[chunk] = _row_percentiles(absolute, (50,))[:, 0]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean_deviations[chunk] = (np.nansum(absolute, axis=1)
+                                      / np.sum(~np.isnan(absolute), axis=1))
+    counts = np.concatenate(([0], np.cumsum(np.isfinite(values))))
+    counts = (counts[ends] - counts[starts])[rows]
+    return tuple(_hold(rows, column, len(values))
+                 for column in (medians, deviations, mean_deviations, counts))
+
+
+def _linear_recurrence(log_decay, inputs, initial):
+    """
+    Solves y[t] = exp(log_decay[t]) * y[t - 1] + inputs[t], with y[-1] = initial.
+
+    Uses y = P * (initial + cumsum(inputs / P)) with P the running product
+    of the decay factors, restarted in segments before P underflows.
+    """
+    result = np.empty(len(inputs))
+    # A decay of exp(-MAX_LOG_DECAY) already forgets everything before it
+    log_decay = np.maximum(log_decay, -MAX_LOG_DECAY)
+    log_product = np.cumsum(log_decay)
+    boundaries = np.searchsorted(
+        -log_product, np.arange(MAX_LOG_DECAY, -log_product[-1] if len(log_product) else 0,
+                                MAX_LOG_DECAY)
+    ) if len(log_product) else []
+    previous = initial
+    start = 0
+    for end in list(boundaries) + [len(inputs)]:
+        if end <= start:
+            continue
+        product = np.exp(np.cumsum(log_decay[start:end]))
+        result[start:end] = product * (previous + np.cumsum(inputs[start:end] / product))
+        previous = result[end - 1]
+        start = end
+    return result
+
+
+def ewma(timestamps, values, halflife=DEFAULT_HALFLIFE):
+    """
+    Exponentially weighted moving average with a half-life in seconds.
+
+    A run's weight halves for every halflife seconds that pass after it, so
+    bursts of runs do not outweigh sparse ones. NaN values are skipped.
+
+    Returns:
+        numpy.ndarray: The average after each run; NaN before the first value
+    """
+    values = np.asarray(values, dtype=np.float64)
+    times = _monotonic_times(timestamps)
+    result = np.full(len(values), np.nan)
+    finite = np.flatnonzero(np.isfinite(values))
+    if not len(finite):
+        return result
+    x = values[finite]
+    t = times[finite]
+    log_decay = -math.log(2) * np.diff(t) / halflife
+    inputs = -np.expm1(log_decay) * x[1:]
+    smoothed = np.concatenate(([x[0]], _linear_recurrence(log_decay, inputs, x[0])))
+    # Runs without a value carry the previous average forward
+    result[finite] = smoothed
+    first = finite[0]
+    positions = np.maximum.accumulate(np.where(np.isfinite(values), np.arange(len(values)), -1))
+    result[first:] = result[positions[first:]]
+    return result
+
+
+def ewm_std(timestamps, values, halflife=DEFAULT_HALFLIFE):
+    """Exponentially weighted standard deviation matching ewma()."""
+    values = np.asarray(values, dtype=np.float64)
+    mean = ewma(timestamps, values, halflife)
+    mean_square = ewma(timestamps, values * values, halflife)
+    return np.sqrt(np.clip(mean_square - mean * mean, 0.0, None))
+
+
+def _previous(values):
+    """Shifts a series by one run, so each run sees only the runs before it."""
+    return np.concatenate(([np.nan], values[:-1]))
+
+
+def detect_anomalies(timestamps, values, method=METHOD_MAD, threshold=DEFAULT_THRESHOLD,
+                     window=DEFAULT_WINDOW, halflife=DEFAULT_HALFLIFE,
+                     max_runs=DEFAULT_MAX_WINDOW_RUNS, max_evaluations=DEFAULT_MAX_EVALUATIONS):
+    """
+    Flags runs that deviate from the baseline of the runs before them.
+
+    With METHOD_ZSCORE the baseline is the EWMA and the scale its standard
+    deviation; with METHOD_MAD the baseline is the rolling median of the
+    time window and the scale the MAD times 1.4826 (the mean absolute
+    deviation times 1.2533 where the MAD is 0). Histories of more than
+    max_evaluations runs are scored against the mean and standard deviation
+    of the same window instead, so every run still gets its own exact
+    baseline. A run is an anomaly when it lies more than threshold scales
+    from the baseline; the baseline is NaN until MIN_PERIODS runs came
+    before it.
+
+    Returns:
+        dict: baseline, lower and upper band, score (signed deviation in
+        scales) and anomaly (bool) arrays, one value per run
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if method == METHOD_ZSCORE:
+        baseline = _previous(ewma(timestamps, values, halflife))
+        scale = _previous(ewm_std(timestamps, values, halflife))
+        finite = np.isfinite(values)
+        periods = _previous(np.cumsum(finite).astype(np.float64))
+    elif method == METHOD_MAD and max_evaluations and len(values) > max_evaluations:
+        # A median per run would cost O(runs * max_runs); sums stay O(runs)
+        baseline, scale, periods = rolling_std(
+            timestamps, values, window, max_runs, include_current=False
+        )
+    elif method == METHOD_MAD:
+        baseline, deviation, mean_deviation, periods = rolling_mad(
+            timestamps, values, window, max_runs, include_current=False, max_evaluations=None
+        )
+        # Over half the window equal to the median leaves the MAD at 0
+        scale = np.where(deviation > 0, deviation * MAD_SCALE,
+                         mean_deviation * MEAN_DEVIATION_SCALE)
+    else:
+        raise ValueError(f"Unknown anomaly detection method: {method}")
+
+    # Too few earlier runs to trust; left blank instead of drawing a noisy band
+    warming_up = np.nan_to_num(periods) < MIN_PERIODS
+    baseline = np.where(warming_up, np.nan, baseline)
+    scale = np.where(warming_up, np.nan, scale)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        score = (values - baseline) / scale
+    # A flat baseline would flag any change at all
+    score = np.where(scale > 0, score, np.nan)
+    return {
+        "baseline": baseline,
+        "lower": baseline - threshold * scale,
+        "upper": baseline + threshold * scale,
+        "score": score,
+        "anomaly": np.abs(np.nan_to_num(score)) > threshold,
+    }
+
+
+def analyze_history(columns, settings=None, metrics=METRICS):
+    """
+    Rolling statistics and anomaly flags for the speed and ping columns.
+
+    Args:
+        columns: History columns with a timestamp column (epoch seconds)
+        settings: App settings with the anomaly_* keys (defaults if None);
+            anomaly_max_runs caps the runs of each window and
+            anomaly_percentiles chooses the percentile columns
+
+    Returns:
+        dict: {metric: {"mean", "p10", "p50", "p90", "baseline", "lower",
+        "upper", "score", "anomaly"}} of per-run arrays, with one "pNN" per
+        percentile
+    """
+    settings = settings or {}
+    window = settings.get("anomaly_window", DEFAULT_WINDOW)
+    max_runs = settings.get("anomaly_max_runs", DEFAULT_MAX_WINDOW_RUNS)
+    quantiles = tuple(settings.get("anomaly_percentiles", DEFAULT_PERCENTILES))
+    timestamps = columns["timestamp"]
+    analysis = {}
+    for metric in metrics:
+        values = columns[metric]
+        means, _ = rolling_mean(timestamps, values, window)
+        percentiles = rolling_percentiles(timestamps, values, window, quantiles, max_runs)
+        result = {"mean": means}
+        result.update((f"p{q:g}", percentiles[:, i]) for i, q in enumerate(quantiles))
+        result.update(detect_anomalies(
+            timestamps, values,
+            settings.get("anomaly_method", METHOD_MAD),
+            settings.get("anomaly_threshold", DEFAULT_THRESHOLD),
+            window,
+            settings.get("anomaly_halflife", DEFAULT_HALFLIFE),
+            max_runs
+        ))
+        analysis[metric] = result
+        flagged = int(result["anomaly"].sum())
+        if flagged:
+            logger.info(f"{flagged} anomalous runs in {metric}")
+    return analysis
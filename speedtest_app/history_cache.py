@@ -0,0 +1,230 @@
+"""
+Columnar NumPy cache of the test history.
+
+Each history column is kept in its own .npy file in the user data directory
+(int64 epoch timestamps, float64 speeds and ping) and opened as a read-only
+memory map, so plotting or computing statistics never has to parse the
+history file. The cache is appended to on every save and rebuilt from the
+history store only when the history file was changed behind its back.
+"""
+import os
+import json
+import hashlib
+import logging
+import numpy as np
+from speedtest_app.history_store import BinaryHistoryStore, timestamp_to_epoch
+from speedtest_app.utils import ensure_user_data_dir
+
+logger = logging.getLogger("SpeedTest")
+
+COLUMNS = {
+    "timestamp": np.int64,
+    "download_speed": np.float64,
+    "upload_speed": np.float64,
+    "ping": np.float64,
+    # Latency under load; NaN for runs that did not measure it
+    "download_latency_median": np.float64,
+    "upload_latency_median": np.float64,
+}
+LOADED_LATENCY_COLUMNS = ("download_latency_median", "upload_latency_median")
+
+INITIAL_CAPACITY = 1024
+
+# Called with (store, record) after every successful append_to_history
+_append_listeners = []
+
+
+def _file_fingerprint(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+class ColumnarHistoryCache:
+    """Memory-mapped column arrays mirroring one history store."""
+
+    def __init__(self, directory, source_path):
+        self.directory = directory
+        self.source_path = source_path
+        self._meta_path = os.path.join(directory, "meta.json")
+        self._meta = self._load_meta()
+
+    @classmethod
+    def for_store(cls, store, cache_root=None):
+        """Returns the cache for a history store, kept in the user data dir."""
+        if cache_root is None:
+            cache_root = os.path.join(ensure_user_data_dir(), "history_cache")
+        key = hashlib.sha1(os.path.abspath(store.path).encode("utf-8")).hexdigest()[:16]
+        return cls(os.path.join(cache_root, key), store.path)
+
+    def _column_path(self, name):
+        return os.path.join(self.directory, f"{name}.npy")
+
+    def _load_meta(self):
+        try:
+            with open(self._meta_path, "r", encoding="utf-8") as file:
+                return json.load(file)
+        except (OSError, json.JSONDecodeError):
+            return {"count": 0, "capacity": 0, "source": None}
+
+    def _save_meta(self):
+        tmp_path = self._meta_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(self._meta, file)
+        os.replace(tmp_path, self._meta_path)
+
+    def __len__(self):
+        return self._meta["count"]
+
+    def is_fresh(self):
+        """True if the cache mirrors the history file as it is on disk now."""
+        return (self._meta["source"] is not None
+                and self._meta.get("columns") == list(COLUMNS)
+                and self._meta["source"] == _file_fingerprint(self.source_path))
+
+    def _allocate(self, capacity):
+        """Creates or grows the column files to hold capacity rows."""
+        os.makedirs(self.directory, exist_ok=True)
+        count = self._meta["count"]
+        for name, dtype in COLUMNS.items():
+            path = self._column_path(name)
+            tmp_path = path + ".tmp.npy"
+            new_column = np.lib.format.open_memmap(
+                tmp_path, mode="w+", dtype=dtype, shape=(capacity,)
+            )
+            if count and os.path.exists(path):
+                new_column[:count] = np.load(path, mmap_mode="r")[:count]
+            new_column.flush()
+            del new_column
+            os.replace(tmp_path, path)
+        self._meta["capacity"] = capacity
+
+    def extend(self, records):
+        """Appends records to the columns; amortized O(1) per record."""
+        records = list(records)
+        if not records:
+            return
+        count = self._meta["count"]
+        needed = count + len(records)
+        if needed > self._meta["capacity"]:
+            capacity = max(INITIAL_CAPACITY, self._meta["capacity"])
+            while capacity < needed:
+                capacity *= 2
+            self._allocate(capacity)
+
+        for name in COLUMNS:
+            column = np.load(self._column_path(name), mmap_mode="r+")
+            if name == "timestamp":
+                values = [timestamp_to_epoch(record.get("timestamp")) for record in records]
+            else:
+                values = [record.get(name, np.nan) for record in records]
+            column[count:needed] = values
+            column.flush()
+            del column
+        self._meta["count"] = needed
+
+    def mark_synced(self):
+        """Records the current state of the history file as mirrored."""
+        self._meta["source"] = _file_fingerprint(self.source_path)
+        self._save_meta()
+
+    def rebuild(self, records, chunk_size=10000):
+        """Rebuilds the whole cache from an iterable of history records."""
+        # Caches written with other columns are rebuilt rather than reused
+        self._meta = {"count": 0, "capacity": 0, "source": None, "columns": list(COLUMNS)}
+        self._allocate(INITIAL_CAPACITY)
+        chunk = []
+        for record in records:
+            chunk.append(record)
+            if len(chunk) >= chunk_size:
+                self.extend(chunk)
+                chunk = []
+        self.extend(chunk)
+        self.mark_synced()
+        logger.info(f"Rebuilt history cache for {self.source_path} ({len(self)} runs)")
+
+    def columns(self):
+        """Returns read-only memory-mapped arrays for every column."""
+        count = self._meta["count"]
+        if not count:
+            return {name: np.empty(0, dtype=dtype) for name, dtype in COLUMNS.items()}
+        return {
+            name: np.load(self._column_path(name), mmap_mode="r")[:count]
+            for name in COLUMNS
+        }
+
+
+def load_history_columns(store):
+    """
+    Returns the history as memory-mapped column arrays.
+
+    The cache is rebuilt from the store only if it is missing or stale. A
+    binary history is already a fixed-width array and is mapped directly.
+
+    Returns:
+        dict: Column name to NumPy array
+    """
+    if isinstance(store, BinaryHistoryStore):
+        return store.columns(COLUMNS)
+    cache = ColumnarHistoryCache.for_store(store)
+    if not cache.is_fresh():
+        cache.rebuild(store.iter_records())
+    return cache.columns()
+
+
+def add_append_listener(listener):
+    """Registers listener(store, record) to be called after each append_to_history."""
+    _append_listeners.append(listener)
+
+
+def remove_append_listener(listener):
+    """Unregisters a listener added with add_append_listener, if it is registered."""
+    if listener in _append_listeners:
+        _append_listeners.remove(listener)
+
+
+def append_to_history(store, record):
+    """Appends a record to the store and, if it was in sync, to its cache."""
+    if isinstance(store, BinaryHistoryStore):
+        store.append(record)
+    else:
+        _append_with_cache(store, record)
+    for listener in list(_append_listeners):
+        listener(store, record)
+
+
+def _append_with_cache(store, record):
+    try:
+        cache = ColumnarHistoryCache.for_store(store)
+        was_fresh = cache.is_fresh()
+    except Exception as e:
+        logger.warning(f"History cache unavailable: {e}")
+        cache, was_fresh = None, False
+
+    store.append(record)
+
+    if cache is not None and was_fresh:
+        try:
+            cache.extend([record])
+            cache.mark_synced()
+        except Exception as e:
+            logger.warning(f"Could not update history cache: {e}")
+
+
+def column_statistics(columns):
+    """Returns min, max, mean and median of the speed and ping columns."""
+    stats = {}
+    for name in ("download_speed", "upload_speed", "ping"):
+        values = columns[name]
+        if len(values) == 0:
+            stats[name] = {"min": None, "max": None, "mean": None, "median": None}
+            continue
+        stats[name] = {
+            "min": float(np.nanmin(values)),
+            "max": float(np.nanmax(values)),
+            "mean": float(np.nanmean(values)),
+            "median": float(np.nanmedian(values)),
+        }
+    return stats
@@ -0,0 +1,203 @@
+"""
+Streaming CSV export of the test history.
+
+Records are read from the history store in chunks and written with the csv
+module on a worker thread, optionally gzip-compressed and limited to a time
+range. Exports with the history window's speed filter or sort order go
+through its HistoryPager instead. Progress is published through the job object, which the GUI polls.
+"""
+import os
+import csv
+import gzip
+import logging
+import uuid
+import threading
+import concurrent.futures
+from speedtest_app.history_store import normalize_timestamp, timestamp_to_epoch
+
+logger = logging.getLogger("SpeedTest")
+
+CSV_HEADER = ("#", "Timestamp", "Download (Mbps)", "Upload (Mbps)", "Ping (ms)")
+
+
+class ExportCancelled(Exception):
+    """Raised when an export is cancelled before it finished."""
+
+
+def _open_output(path, compress):
+    if compress:
+        return gzip.open(path, "wt", encoding="utf-8", newline="")
+    return open(path, "w", encoding="utf-8", newline="")
+
+
+def _create_output(file_path):
+    """
+    Creates an empty temp file next to file_path and returns its path.
+
+    The file gets the mode open() would give file_path: that of the file it
+    replaces, or 0o666 less the umask, which the kernel applies on creation.
+    """
+    directory = os.path.dirname(os.path.abspath(file_path))
+    while True:
+        tmp_path = os.path.join(directory, f".export-{uuid.uuid4().hex}.tmp")
+        try:
+            fd = os.open(tmp_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o666)
+            break
+        except FileExistsError:
+            continue
+    os.close(fd)
+    try:
+        os.chmod(tmp_path, os.stat(file_path).st_mode & 0o7777)
+    except FileNotFoundError:
+        pass
+    return tmp_path
+
+
+def _pager_rows(store, start, end, max_download, sort_by, descending):
+    """Yields (number, timestamp, download, upload, ping) rows in the history window's order."""
+    from speedtest_app.history_pager import HistoryPager
+
+    pager = HistoryPager(store)
+    pager.set_query(
+        sort_by=sort_by or "index",
+        descending=descending,
+        start=None if start is None else timestamp_to_epoch(normalize_timestamp(start)),
+        end=None if end is None else timestamp_to_epoch(normalize_timestamp(end)),
+        max_download=max_download
+    )
+    yield from pager.iter_rows()
+
+
+def _store_rows(store, start, end):
+    for number, record in enumerate(store.iter_between(start, end), start=1):
+        yield (
+            number,
+            record.get("timestamp", "N/A"),
+            record.get("download_speed"),
+            record.get("upload_speed"),
+            record.get("ping"),
+        )
+
+
+def export_history(store, file_path, compress=None, start=None, end=None,
+                   chunk_size=5000, progress_callback=None, cancel_event=None,
+                   max_download=None, sort_by=None, descending=False):
+    """
+    Exports history records to a CSV file.
+
+    The file is written to a temporary file next to file_path and moved into
+    place only when complete, so a failed or cancelled export never leaves a
+    truncated file behind.
+
+    Args:
+        store: History store to read from
+        file_path: Destination path; ".gz" enables compression by default
+        compress: Force gzip on or off (None: decide from the extension)
+        start, end: Optional timestamp bounds (inclusive)
+        chunk_size: Number of rows written between progress reports
+        progress_callback: Called as callback(rows_written, total_estimate)
+        cancel_event: threading.Event that aborts the export when set
+        max_download: Only export runs with a download below this (Mbps)
+        sort_by, descending: Row order, as in HistoryPager (default: run order);
+            the "#" column then holds each run's number in the history
+
+    Returns:
+        int: Number of exported rows
+
+    Raises:
+        ExportCancelled: If cancel_event was set during the export
+    """
+    if compress is None:
+        compress = file_path.lower().endswith(".gz")
+    total = store.estimated_count()
+    if progress_callback:
+        progress_callback(0, total)
+
+    if max_download is not None or sort_by not in (None, "index") or descending:
+        rows = _pager_rows(store, start, end, max_download, sort_by, descending)
+    else:
+        rows = _store_rows(store, start, end)
+
+    tmp_path = _create_output(file_path)
+    rows_written = 0
+    try:
+        with _open_output(tmp_path, compress) as file:
+            writer = csv.writer(file)
+            writer.writerow(CSV_HEADER)
+            chunk = []
+            for row in rows:
+                rows_written += 1
+                chunk.append(row)
+                if len(chunk) >= chunk_size:
+                    if cancel_event is not None and cancel_event.is_set():
+                        raise ExportCancelled()
+                    writer.writerows(chunk)
+                    chunk = []
+                    if progress_callback:
+                        progress_callback(rows_written, total)
+            writer.writerows(chunk)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    if progress_callback:
+        progress_callback(rows_written, total)
+    logger.info(f"Exported {rows_written} history records to {file_path}")
+    return rows_written
+
+
+class HistoryExportJob:
+    """Runs export_history on a worker thread and tracks its progress."""
+
+    def __init__(self, store, file_path, compress=None, start=None, end=None,
+                 max_download=None, sort_by=None, descending=False):
+        self.store = store
+        self.file_path = file_path
+        self.compress = compress
+        self.start = start
+        self.end = end
+        self.max_download = max_download
+        self.sort_by = sort_by
+        self.descending = descending
+        self.rows_written = 0
+        self.total = None
+        self.future = None
+        self._cancel_event = threading.Event()
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+
+    def _on_progress(self, rows_written, total):
+        self.rows_written = rows_written
+        self.total = total
+
+    def _run(self):
+        try:
+            return export_history(
+                self.store,
+                self.file_path,
+                compress=self.compress,
+                start=self.start,
+                end=self.end,
+                progress_callback=self._on_progress,
+                cancel_event=self._cancel_event,
+                max_download=self.max_download,
+                sort_by=self.sort_by,
+                descending=self.descending
+            )
+        finally:
+            self._executor.shutdown(wait=False)
+
+    def submit(self):
+        """Starts the export and returns its future."""
+        self.future = self._executor.submit(self._run)
+        return self.future
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    def fraction_done(self):
+        """Returns progress between 0 and 1, or None while the total is unknown."""
+        if not self.total:
+            return None
+        return min(self.rows_written / self.total, 1.0)
@@ -0,0 +1,129 @@
+"""
+Paged, sorted and filtered access to the test history.
+
+The history window only ever asks for the rows it is about to show. Sorting
+and filtering run over the memory-mapped columns of the history cache with
+NumPy, so neither the history file nor the Tk widget has to hold every run.
+"""
+import logging
+from datetime import datetime
+import numpy as np
+from speedtest_app.history_cache import load_history_columns, timestamp_to_epoch
+from speedtest_app.history_store import TIMESTAMP_FORMAT
+
+logger = logging.getLogger("SpeedTest")
+
+SORT_KEYS = ("index", "timestamp", "download_speed", "upload_speed", "ping")
+
+
+def parse_filter_time(value, end_of_day=False):
+    """
+    Parses a filter bound given as "YYYY-MM-DD" or "YYYY-MM-DD HH:MM:SS".
+
+    Returns:
+        int or None: Epoch seconds, or None for an empty bound
+
+    Raises:
+        ValueError: If the value is not a valid date
+    """
+    value = (value or "").strip()
+    if not value:
+        return None
+    if len(value) == 10:
+        value += " 23:59:59" if end_of_day else " 00:00:00"
+    datetime.strptime(value, TIMESTAMP_FORMAT)
+    return timestamp_to_epoch(value)
+
+
+def format_epoch(epoch):
+    """Formats epoch seconds from the cache back to a history timestamp."""
+    if not epoch:
+        return "N/A"
+    return datetime.fromtimestamp(int(epoch)).strftime(TIMESTAMP_FORMAT)
+
+
+class HistoryPager:
+    """Serves windows of history rows for the current sort and filter."""
+
+    def __init__(self, store):
+        self.store = store
+        self.sort_by = "index"
+        self.descending = False
+        self.start = None
+        self.end = None
+        self.max_download = None
+        self._columns = None
+        self._order = None
+
+    def refresh(self):
+        """Re-reads the history columns, e.g. after a new run was saved."""
+        self._columns = load_history_columns(self.store)
+        self._order = None
+
+    def set_query(self, sort_by=None, descending=None, start=None, end=None,
+                  max_download=None):
+        """
+        Changes sort order and filters.
+
+        start and end are epoch seconds and max_download is in Mbps; None
+        disables a filter.
+        """
+        if sort_by is not None:
+            if sort_by not in SORT_KEYS:
+                raise ValueError(f"Unknown sort key: {sort_by}")
+            self.sort_by = sort_by
+        if descending is not None:
+            self.descending = descending
+        self.start, self.end, self.max_download = start, end, max_download
+        self._order = None
+
+    def _ensure_order(self):
+        if self._columns is None:
+            self.refresh()
+        if self._order is not None:
+            return self._order
+
+        columns = self._columns
+        mask = np.ones(len(columns["timestamp"]), dtype=bool)
+        if self.start is not None:
+            mask &= columns["timestamp"] >= self.start
+        if self.end is not None:
+            mask &= columns["timestamp"] <= self.end
+        if self.max_download is not None:
+            mask &= columns["download_speed"] < self.max_download
+        order = np.flatnonzero(mask)
+
+        if self.sort_by != "index":
+            # Stable sort keeps chronological order between equal values
+            order = order[np.argsort(columns[self.sort_by][order], kind="stable")]
+        if self.descending:
+            order = order[::-1]
+        self._order = order
+        return order
+
+    def __len__(self):
+        return len(self._ensure_order())
+
+    def rows(self, offset, limit):
+        """
+        Returns up to limit rows starting at offset in the current order.
+
+        Returns:
+            list: Tuples of (number, timestamp, download, upload, ping)
+        """
+        indices = self._ensure_order()[offset:offset + limit]
+        columns = self._columns
+        timestamps = columns["timestamp"][indices]
+        downloads = columns["download_speed"][indices]
+        uploads = columns["upload_speed"][indices]
+        pings = columns["ping"][indices]
+        return [
+            (int(index) + 1, format_epoch(timestamps[i]),
+             float(downloads[i]), float(uploads[i]), float(pings[i]))
+            for i, index in enumerate(indices)
+        ]
+
+    def iter_rows(self, chunk_size=5000):
+        """Yields every row of the current order, one chunk at a time."""
+        for offset in range(0, len(self), chunk_size):
+            yield from self.rows(offset, chunk_size)
@@ -0,0 +1,872 @@
+"""
+History storage for macOS_application_speedtest_for_python.
+
+History is kept as line-delimited JSON (one test result per line), in a
+SQLite database with an index on the timestamp, or as fixed-width binary
+records with epoch timestamps. All engines make saving a result a single
+append and expose the same query functions, so callers can fetch only the
+records they need.
+"""
+import os
+import json
+import struct
+import logging
+import sqlite3
+import tempfile
+from collections import deque
+from itertools import islice
+from contextlib import closing
+from datetime import datetime
+from functools import lru_cache
+from speedtest_app.utils import load_settings
+
+logger = logging.getLogger("SpeedTest")
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Optional latency distribution of a run (ms, packet_loss in percent), see
+# speedtest_app.latency; records of older runs do not have them
+LATENCY_FIELDS = (
+    "latency_min", "latency_median", "latency_p95", "latency_p99", "jitter", "packet_loss"
+)
+
+
+def loaded_latency_fields(direction):
+    """Names of the latency-under-load fields of a download or upload phase."""
+    return {
+        "median": f"{direction}_latency_median",
+        "p95": f"{direction}_latency_p95",
+        "delta": f"{direction}_latency_delta",
+        "series": f"{direction}_latency_series",
+    }
+
+
+# Latency while each transfer phase ran (ms; delta is loaded minus idle median)
+LOADED_LATENCY_FIELDS = tuple(
+    loaded_latency_fields(direction)[key]
+    for direction in ("download", "upload") for key in ("median", "p95", "delta")
+)
+# Per-second loaded latency medians (lists, stored as JSON text in SQLite)
+LOADED_LATENCY_SERIES = tuple(
+    loaded_latency_fields(direction)["series"] for direction in ("download", "upload")
+)
+
+
+def nic_fields(direction):
+    """Names of the interface counter fields of a download or upload phase."""
+    return {
+        "mbps": f"{direction}_nic_mbps",
+        "bytes": f"{direction}_nic_bytes",
+        "series": f"{direction}_nic_series",
+    }
+
+
+# Throughput and bytes the network interfaces counted while each transfer
+# phase ran, competing traffic included (see speedtest_app.nic_sampler)
+NIC_FIELDS = tuple(
+    nic_fields(direction)[key] for direction in ("download", "upload") for key in ("mbps", "bytes")
+)
+# Per-second interface throughput in Mbps (lists, stored as JSON text in SQLite)
+NIC_SERIES = tuple(nic_fields(direction)["series"] for direction in ("download", "upload"))
+
+SERIES_FIELDS = LOADED_LATENCY_SERIES + NIC_SERIES
+OPTIONAL_FIELDS = (
+    LATENCY_FIELDS + LOADED_LATENCY_FIELDS + LOADED_LATENCY_SERIES + NIC_FIELDS + NIC_SERIES
+)
+
+
+def make_record(download_speed, upload_speed, ping, timestamp=None, latency=None):
+    """
+    Builds a history record in the format used by all history files.
+
+    latency may be any dict holding OPTIONAL_FIELDS (latency distribution,
+    latency under load and interface counters), such as a test result; missing or None values are
+    left out of the record.
+    """
+    if timestamp is None:
+        timestamp = datetime.now().strftime(TIMESTAMP_FORMAT)
+    record = {
+        "timestamp": timestamp,
+        "download_speed": download_speed,
+        "upload_speed": upload_speed,
+        "ping": ping
+    }
+    if latency:
+        record.update(
+            (field, latency[field]) for field in OPTIONAL_FIELDS if latency.get(field) is not None
+        )
+    return record
+
+
+def timestamp_to_epoch(timestamp):
+    """Converts a history timestamp string to epoch seconds (0 if missing)."""
+    if not timestamp:
+        return 0
+    try:
+        return int(datetime.strptime(timestamp, TIMESTAMP_FORMAT).timestamp())
+    except (TypeError, ValueError):
+        return 0
+
+
+def epoch_to_timestamp(epoch):
+    """Converts epoch seconds back to a history timestamp string ("" for 0)."""
+    if not epoch:
+        return ""
+    return datetime.fromtimestamp(epoch).strftime(TIMESTAMP_FORMAT)
+
+
+def normalize_timestamp(value):
+    """Normalizes a datetime or timestamp string for comparisons."""
+    if isinstance(value, datetime):
+        return value.strftime(TIMESTAMP_FORMAT)
+    return value
+
+
+def is_legacy_history_file(path):
+    """Returns True if the file holds a legacy pretty-printed JSON array."""
+    try:
+        with open(path, "r", encoding="utf-8") as file:
+            while True:
+                char = file.read(1)
+                if not char:
+                    return False
+                if not char.isspace():
+                    return char == "["
+    except OSError:
+        return False
+
+
+def _write_atomically(path, records):
+    """Writes records as JSON lines to a temp file and moves it over path."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".history-", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as file:
+            for record in records:
+                file.write(json.dumps(record) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def migrate_legacy_history(legacy_path, target_path):
+    """
+    Converts a legacy JSON array history file into a JSON lines file.
+
+    The legacy file is left untouched unless it is also the target. Corrupted
+    legacy files are skipped so a new history can be started.
+
+    Returns:
+        int: Number of migrated records
+    """
+    try:
+        with open(legacy_path, "r", encoding="utf-8") as file:
+            history = json.load(file)
+    except json.JSONDecodeError:
+        logger.error(f"Error decoding JSON from {legacy_path}. Starting new history.")
+        history = []
+
+    if not isinstance(history, list):
+        history = []
+
+    _write_atomically(target_path, (entry for entry in history if isinstance(entry, dict)))
+    logger.info(f"Migrated {len(history)} history records from {legacy_path} to {target_path}")
+    return len(history)
+
+
+def iter_history_file(path):
+    """Yields records from a history file of any supported format."""
+    engine = engine_for_path(path)
+    if engine in ("sqlite", "binary"):
+        yield from HISTORY_ENGINES[engine](path).iter_records()
+    elif is_legacy_history_file(path):
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                history = json.load(file)
+        except json.JSONDecodeError:
+            logger.error(f"Error decoding JSON from {path}. Skipping it.")
+            return
+        for entry in history if isinstance(history, list) else []:
+            if isinstance(entry, dict):
+                yield entry
+    else:
+        yield from JsonlHistoryStore(path).iter_records()
+
+
+class HistoryStore:
+    """
+    Base class for history storage engines.
+
+    Subclasses implement exists, append and iter_records. The query functions
+    below fall back to a streaming scan and can be overridden by engines that
+    support indexed lookups.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def append(self, record):
+        raise NotImplementedError
+
+    def extend(self, records):
+        """Appends several records, in order."""
+        for record in records:
+            self.append(record)
+
+    def iter_records(self):
+        raise NotImplementedError
+
+    def __iter__(self):
+        return self.iter_records()
+
+    def count(self):
+        return sum(1 for _ in self.iter_records())
+
+    def estimated_count(self):
+        """Returns the number of runs, possibly approximated for speed."""
+        return self.count()
+
+    def iter_between(self, start=None, end=None):
+        """Yields runs with start <= timestamp <= end (either bound optional)."""
+        start, end = normalize_timestamp(start), normalize_timestamp(end)
+        for record in self.iter_records():
+            timestamp = record.get("timestamp", "")
+            if (start is None or timestamp >= start) and (end is None or timestamp <= end):
+                yield record
+
+    def runs_between(self, start=None, end=None):
+        """Returns runs with start <= timestamp <= end (either bound optional)."""
+        return list(self.iter_between(start, end))
+
+    def last_runs(self, count):
+        """Returns the most recent count runs, oldest first."""
+        if count <= 0:
+            return []
+        return list(deque(self.iter_records(), maxlen=count))
+
+    def runs_below(self, download_mbps):
+        """Returns runs whose download speed is below download_mbps."""
+        return [
+            record for record in self.iter_records()
+            if record["download_speed"] < download_mbps
+        ]
+
+
+class JsonlHistoryStore(HistoryStore):
+    """Append-only history store backed by a JSON lines file."""
+
+    def _migrate_in_place(self):
+        if self.exists() and is_legacy_history_file(self.path):
+            migrate_legacy_history(self.path, self.path)
+
+    def _ends_with_newline(self):
+        with open(self.path, "rb") as file:
+            file.seek(0, os.SEEK_END)
+            if file.tell() == 0:
+                return True
+            file.seek(-1, os.SEEK_END)
+            return file.read(1) == b"\n"
+
+    def append(self, record):
+        """Appends one record to the end of the history file."""
+        self._migrate_in_place()
+        line = json.dumps(record) + "\n"
+        # A torn previous write must not glue two records onto one line
+        if self.exists() and not self._ends_with_newline():
+            line = "\n" + line
+        with open(self.path, "a", encoding="utf-8") as file:
+            file.write(line)
+            file.flush()
+            os.fsync(file.fileno())
+
+    def extend(self, records):
+        """Appends several records with a single write and fsync."""
+        self._migrate_in_place()
+        lines = "".join(json.dumps(record) + "\n" for record in records)
+        if not lines:
+            return
+        if self.exists() and not self._ends_with_newline():
+            lines = "\n" + lines
+        with open(self.path, "a", encoding="utf-8") as file:
+            file.write(lines)
+            file.flush()
+            os.fsync(file.fileno())
+
+    def iter_records(self):
+        """Yields records one at a time without loading the whole file."""
+        if not self.exists():
+            return
+        self._migrate_in_place()
+        with open(self.path, "r", encoding="utf-8") as file:
+            for line_number, line in enumerate(file, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning(f"Skipping corrupted history line {line_number} in {self.path}")
+                    continue
+                if isinstance(record, dict):
+                    yield record
+
+    def _reverse_lines(self, block_size=1 << 16):
+        """Yields the file's lines last to first, reading blocks from the end."""
+        with open(self.path, "rb") as file:
+            position = file.seek(0, os.SEEK_END)
+            partial = b""
+            while position > 0:
+                size = min(block_size, position)
+                position -= size
+                file.seek(position)
+                lines = (file.read(size) + partial).split(b"\n")
+                partial = lines.pop(0)
+                yield from reversed(lines)
+            yield partial
+
+    def last_runs(self, count):
+        """Returns the most recent count runs, oldest first, without reading the whole file."""
+        if count <= 0 or not self.exists():
+            return []
+        self._migrate_in_place()
+        records = []
+        for line in self._reverse_lines():
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line.decode("utf-8"))
+            except (UnicodeDecodeError, json.JSONDecodeError):
+                logger.warning(f"Skipping corrupted history line in {self.path}")
+                continue
+            if isinstance(record, dict):
+                records.append(record)
+                if len(records) == count:
+                    break
+        return records[::-1]
+
+    def estimated_count(self):
+        """Counts lines without parsing them (corrupted lines are included)."""
+        if not self.exists():
+            return 0
+        self._migrate_in_place()
+        lines = 0
+        with open(self.path, "rb") as file:
+            for block in iter(lambda: file.read(1 << 20), b""):
+                lines += block.count(b"\n")
+        return lines
+
+
+class SQLiteHistoryStore(HistoryStore):
+    """History store backed by a SQLite database indexed by timestamp."""
+
+    COLUMNS = ("timestamp", "download_speed", "upload_speed", "ping") + OPTIONAL_FIELDS
+
+    def __init__(self, path):
+        super().__init__(path)
+        self._schema_ready = False
+
+    def _connect(self):
+        # A short-lived connection per call keeps the store usable from
+        # the GUI thread and from worker threads alike
+        created = not self.exists()
+        connection = sqlite3.connect(self.path)
+        if self._schema_ready and not created:
+            return connection
+        self._create_schema(connection)
+        self._schema_ready = True
+        return connection
+
+    def _create_schema(self, connection):
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS history ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "timestamp TEXT NOT NULL, "
+            "download_speed REAL NOT NULL, "
+            "upload_speed REAL NOT NULL, "
+            "ping REAL NOT NULL, "
+            + ", ".join(f"{field} {self._column_type(field)}" for field in OPTIONAL_FIELDS) + ")"
+        )
+        self._add_missing_columns(connection)
+        connection.execute(
+            "CREATE INDEX IF NOT EXISTS idx_history_timestamp ON history (timestamp)"
+        )
+
+    @staticmethod
+    def _column_type(field):
+        if field in SERIES_FIELDS:
+            return "TEXT"
+        return "INTEGER" if field.endswith("_bytes") else "REAL"
+
+    def _add_missing_columns(self, connection):
+        # Databases created before the optional fields existed
+        existing = {row[1] for row in connection.execute("PRAGMA table_info(history)")}
+        for field in OPTIONAL_FIELDS:
+            if field not in existing:
+                connection.execute(
+                    f"ALTER TABLE history ADD COLUMN {field} {self._column_type(field)}"
+                )
+
+    def _row(self, record):
+        return tuple(
+            json.dumps(record[column])
+            if column in SERIES_FIELDS and record.get(column) is not None
+            else record.get(column)
+            for column in self.COLUMNS
+        )
+
+    def _record(self, row):
+        # Same shape as JSON lines records: absent optional fields are left out
+        record = {}
+        for column, value in zip(self.COLUMNS, row):
+            if value is None and column in OPTIONAL_FIELDS:
+                continue
+            record[column] = json.loads(value) if column in SERIES_FIELDS else value
+        return record
+
+    def _iter_select(self, where="", params=(), order="id", limit=None):
+        sql = f"SELECT {', '.join(self.COLUMNS)} FROM history"
+        if where:
+            sql += f" WHERE {where}"
+        sql += f" ORDER BY {order}"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params = tuple(params) + (limit,)
+        with closing(self._connect()) as connection:
+            for row in connection.execute(sql, params):
+                yield self._record(row)
+
+    def _select(self, where="", params=(), order="id", limit=None):
+        return list(self._iter_select(where, params, order, limit))
+
+    def append(self, record):
+        self.extend([record])
+
+    def extend(self, records):
+        placeholders = ", ".join("?" for _ in self.COLUMNS)
+        with closing(self._connect()) as connection:
+            with connection:
+                connection.executemany(
+                    f"INSERT INTO history ({', '.join(self.COLUMNS)}) VALUES ({placeholders})",
+                    (self._row(record) for record in records)
+                )
+
+    def iter_records(self):
+        if not self.exists():
+            return
+        yield from self._iter_select()
+
+    def count(self):
+        if not self.exists():
+            return 0
+        with closing(self._connect()) as connection:
+            return connection.execute("SELECT COUNT(*) FROM history").fetchone()[0]
+
+    def iter_between(self, start=None, end=None):
+        if not self.exists():
+            return
+        conditions, params = [], []
+        if start is not None:
+            conditions.append("timestamp >= ?")
+            params.append(normalize_timestamp(start))
+        if end is not None:
+            conditions.append("timestamp <= ?")
+            params.append(normalize_timestamp(end))
+        yield from self._iter_select(" AND ".join(conditions), params, order="timestamp, id")
+
+    def last_runs(self, count):
+        if count <= 0 or not self.exists():
+            return []
+        return self._select(order="id DESC", limit=count)[::-1]
+
+    def runs_below(self, download_mbps):
+        if not self.exists():
+            return []
+        return self._select("download_speed < ?", (download_mbps,))
+
+
+# Binary history files hold a header followed by one binary_dtype() record per
+# run. Latency fields, measured to 3 decimals in ms, are kept as float32 and
+# rounded back on read; missing values are NaN (MISSING_BYTES for byte
+# counts). The per-second series do not fit fixed-width records and are not kept.
+BINARY_MAGIC = b"SPDHIST\x00"
+BINARY_VERSION = 1
+BINARY_HEADER = struct.Struct("<8sII")          # magic, version, record size
+BINARY_CORE_FIELDS = ("download_speed", "upload_speed", "ping")
+BINARY_FLOAT32_FIELDS = LATENCY_FIELDS + LOADED_LATENCY_FIELDS
+BINARY_FIELDS = BINARY_CORE_FIELDS + LATENCY_FIELDS + LOADED_LATENCY_FIELDS + NIC_FIELDS
+BINARY_BYTES_FIELDS = tuple(field for field in BINARY_FIELDS if field.endswith("_bytes"))
+MISSING_BYTES = -1
+
+
+def _binary_type(field):
+    if field in BINARY_BYTES_FIELDS:
+        return "<i8"
+    return "<f4" if field in BINARY_FLOAT32_FIELDS else "<f8"
+
+
+@lru_cache(maxsize=None)
+def binary_dtype():
+    """Returns the NumPy dtype of one binary history record (NumPy is loaded on first use)."""
+    import numpy as np
+
+    return np.dtype(
+        [("timestamp", "<i8")] + [(field, _binary_type(field)) for field in BINARY_FIELDS]
+    )
+
+
+def encode_binary_records(records):
+    """Packs history records into a binary_dtype() array."""
+    import numpy as np
+
+    records = list(records)
+    rows = np.empty(len(records), dtype=binary_dtype())
+    rows["timestamp"] = [timestamp_to_epoch(record.get("timestamp")) for record in records]
+    for field in BINARY_FIELDS:
+        missing = MISSING_BYTES if field in BINARY_BYTES_FIELDS else np.nan
+        rows[field] = [missing if record.get(field) is None else record[field]
+                       for record in records]
+    return rows
+
+
+def decode_binary_records(rows):
+    """
+    Turns binary_dtype() rows back into history records.
+
+    Missing optional fields are left out, as in the other formats.
+    """
+    import numpy as np
+
+    columns = []
+    for field in BINARY_FIELDS:
+        values = rows[field]
+        if field in BINARY_FLOAT32_FIELDS:
+            values = np.round(values.astype(np.float64), 3)
+        column = values.tolist()
+        missing = values < 0 if field in BINARY_BYTES_FIELDS else np.isnan(values)
+        for index in np.flatnonzero(missing).tolist():
+            column[index] = None
+        columns.append(column)
+    records = []
+    for epoch, values in zip(rows["timestamp"].tolist(), zip(*columns)):
+        record = {"timestamp": epoch_to_timestamp(epoch)}
+        record.update(
+            (field, value) for field, value in zip(BINARY_FIELDS, values)
+            if value is not None or field in BINARY_CORE_FIELDS
+        )
+        records.append(record)
+    return records
+
+
+class BinaryHistoryStore(HistoryStore):
+    """
+    History store of fixed-width binary records (see binary_dtype()).
+
+    Every run takes binary_dtype().itemsize bytes, so run i is read with one
+    seek and the whole history maps onto a NumPy array without parsing.
+    """
+
+    CHUNK_SIZE = 10000
+
+    def _read_header(self, file):
+        """Checks the header; returns False for an empty file."""
+        header = file.read(BINARY_HEADER.size)
+        if not header:
+            return False
+        if len(header) < BINARY_HEADER.size:
+            raise ValueError(f"{self.path} is not a binary history file")
+        magic, version, record_size = BINARY_HEADER.unpack(header)
+        if magic != BINARY_MAGIC:
+            raise ValueError(f"{self.path} is not a binary history file")
+        if version != BINARY_VERSION or record_size != binary_dtype().itemsize:
+            raise ValueError(f"Unsupported binary history version {version} in {self.path}")
+        return True
+
+    def count(self):
+        if not self.exists():
+            return 0
+        # A torn last write leaves a partial record, which is ignored
+        size = os.path.getsize(self.path) - BINARY_HEADER.size
+        return max(0, size) // binary_dtype().itemsize
+
+    def estimated_count(self):
+        return self.count()
+
+    def rows(self):
+        """Returns every run as a read-only memory-mapped binary_dtype() array."""
+        import numpy as np
+
+        if not self.exists():
+            return np.empty(0, dtype=binary_dtype())
+        with open(self.path, "rb") as file:
+            self._read_header(file)
+        count = self.count()
+        if not count:
+            return np.empty(0, dtype=binary_dtype())
+        return np.memmap(self.path, dtype=binary_dtype(), mode="r",
+                         offset=BINARY_HEADER.size, shape=(count,))
+
+    def columns(self, dtypes):
+        """Returns the named columns ({name: dtype}) as arrays, without a copy where possible."""
+        import numpy as np
+
+        rows = self.rows()
+        return {name: np.asarray(rows[name], dtype=dtype) for name, dtype in dtypes.items()}
+
+    def __getitem__(self, index):
+        """Returns run index (negative counts from the end) with a single seek."""
+        import numpy as np
+
+        count = self.count()
+        if index < 0:
+            index += count
+        if not 0 <= index < count:
+            raise IndexError("history index out of range")
+        with open(self.path, "rb") as file:
+            self._read_header(file)
+            file.seek(BINARY_HEADER.size + index * binary_dtype().itemsize)
+            row = np.frombuffer(file.read(binary_dtype().itemsize), dtype=binary_dtype())
+        return decode_binary_records(row)[0]
+
+    def _decode(self, rows):
+        for start in range(0, len(rows), self.CHUNK_SIZE):
+            yield from decode_binary_records(rows[start:start + self.CHUNK_SIZE])
+
+    def append(self, record):
+        self.extend([record])
+
+    def extend(self, records):
+        records = iter(records)
+        with open(self.path, "r+b" if self.exists() else "w+b") as file:
+            if not self._read_header(file):
+                file.seek(0)
+                file.write(BINARY_HEADER.pack(BINARY_MAGIC, BINARY_VERSION,
+                                              binary_dtype().itemsize))
+                file.flush()
+            # Drops a torn last record so the next one starts at a record boundary
+            end = BINARY_HEADER.size + self.count() * binary_dtype().itemsize
+            file.truncate(end)
+            file.seek(end)
+            while True:
+                rows = encode_binary_records(islice(records, self.CHUNK_SIZE))
+                if not len(rows):
+                    break
+                file.write(rows.tobytes())
+            file.flush()
+            os.fsync(file.fileno())
+
+    def iter_records(self):
+        yield from self._decode(self.rows())
+
+    def iter_between(self, start=None, end=None):
+        import numpy as np
+
+        rows = self.rows()
+        selected = np.ones(len(rows), dtype=bool)
+        if start is not None:
+            selected &= rows["timestamp"] >= timestamp_to_epoch(normalize_timestamp(start))
+        if end is not None:
+            selected &= rows["timestamp"] <= timestamp_to_epoch(normalize_timestamp(end))
+        yield from self._decode(rows[selected])
+
+    def last_runs(self, count):
+        if count <= 0:
+            return []
+        return decode_binary_records(self.rows()[-count:])
+
+    def runs_below(self, download_mbps):
+        rows = self.rows()
+        return list(self._decode(rows[rows["download_speed"] < download_mbps]))
+
+
+HISTORY_ENGINES = {
+    "jsonl": JsonlHistoryStore,
+    "sqlite": SQLiteHistoryStore,
+    "binary": BinaryHistoryStore,
+}
+
+SQLITE_SUFFIXES = (".db", ".sqlite", ".sqlite3")
+BINARY_SUFFIXES = (".bin",)
+
+
+def engine_for_path(path):
+    """Returns the history engine name matching the file extension."""
+    if path.lower().endswith(SQLITE_SUFFIXES):
+        return "sqlite"
+    if path.lower().endswith(BINARY_SUFFIXES):
+        return "binary"
+    return "jsonl"
+
+
+def open_history_store(path, legacy_path=None):
+    """
+    Opens the history store at path, choosing the engine by file extension.
+
+    If the store does not exist yet and an older history (a legacy JSON array
+    or a JSON lines file) is found at legacy_path, it is migrated once into
+    the new store.
+    """
+    engine = engine_for_path(path)
+    store = HISTORY_ENGINES[engine](path)
+    if (legacy_path and not store.exists()
+            and os.path.exists(legacy_path) and legacy_path != path):
+        if engine == "jsonl":
+            _write_atomically(path, iter_history_file(legacy_path))
+        else:
+            store.extend(iter_history_file(legacy_path))
+        logger.info(f"Imported history from {legacy_path} into {path}")
+    return store
+
+
+HISTORY_FILE_NAMES = {
+    "jsonl": "speedtest_history.jsonl",
+    "sqlite": "speedtest_history.db",
+    "binary": "speedtest_history.bin",
+}
+
+# Format name of the pretty-printed JSON array older versions wrote
+LEGACY_FORMAT = "json"
+
+
+def history_format_for_path(path):
+    """Returns the history format matching the file extension, ".json" being the legacy one."""
+    if path.lower().endswith(".json"):
+        return LEGACY_FORMAT
+    return engine_for_path(path)
+
+
+def _replace_history(path, history_format, records):
+    """Writes records in history_format to a temp file and moves it over path."""
+    if history_format == "jsonl":
+        _write_atomically(path, records)
+        return
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".history-", suffix=".tmp", dir=directory)
+    try:
+        if history_format == LEGACY_FORMAT:
+            with os.fdopen(fd, "w", encoding="utf-8") as file:
+                json.dump(records, file, indent=4)
+                file.flush()
+                os.fsync(file.fileno())
+        else:
+            os.close(fd)
+            HISTORY_ENGINES[history_format](tmp_path).extend(records)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def convert_history(source_path, target_path, target_format=None):
+    """
+    Copies a history file into another format, replacing target_path.
+
+    The source may be in any format, the legacy JSON array included.
+    target_format is one of HISTORY_ENGINES or LEGACY_FORMAT and follows the
+    target extension by default. The target is written to a temp file first,
+    so a failed conversion leaves an existing target untouched.
+
+    Returns:
+        int: Number of converted records
+    """
+    if target_format is None:
+        target_format = history_format_for_path(target_path)
+    if target_format != LEGACY_FORMAT and target_format not in HISTORY_ENGINES:
+        raise ValueError(f"Unknown history format: {target_format}")
+    if not os.path.exists(source_path):
+        raise FileNotFoundError(f"History file not found: {source_path}")
+    if os.path.abspath(source_path) == os.path.abspath(target_path):
+        raise ValueError("Source and target are the same file")
+
+    records = list(iter_history_file(source_path))
+    if target_format == "binary" and any(
+            record.get(field) for record in records for field in SERIES_FIELDS):
+        logger.info("Per-second series are not kept in binary history files")
+
+    _replace_history(target_path, target_format, records)
+    logger.info(f"Converted {len(records)} history records from {source_path} to {target_path}")
+    return len(records)
+
+
+def get_history_file_path(backend=None):
+    """Returns the path to the history file in Downloads directory."""
+    if backend is None:
+        backend = load_settings().get("history_backend", "jsonl")
+    downloads_dir = os.path.join(os.path.expanduser("~"), "Downloads")
+    return os.path.join(downloads_dir, HISTORY_FILE_NAMES.get(backend, HISTORY_FILE_NAMES["jsonl"]))
+
+
+def get_legacy_history_file_path():
+    """Returns the path to the pre-JSONL history file in Downloads directory."""
+    downloads_dir = os.path.join(os.path.expanduser("~"), "Downloads")
+    return os.path.join(downloads_dir, "speedtest_history.json")
+
+
+def merge_history(store, source_paths):
+    """
+    Adds the runs of other history files that store does not hold yet.
+
+    Runs are matched by timestamp. New runs are appended when they are all
+    newer than the store's last run; otherwise the store is rewritten in
+    timestamp order.
+
+    Returns:
+        int: Number of added runs
+    """
+    records = list(store.iter_records())
+    known = {record.get("timestamp") for record in records}
+    added = []
+    for path in source_paths:
+        for record in iter_history_file(path):
+            if record.get("timestamp") not in known:
+                known.add(record.get("timestamp"))
+                added.append(record)
+    if not added:
+        return 0
+    added.sort(key=lambda record: record.get("timestamp") or "")
+    last = max((record.get("timestamp") or "" for record in records), default="")
+    if (added[0].get("timestamp") or "") >= last:
+        store.extend(added)
+    else:
+        merged = sorted(records + added, key=lambda record: record.get("timestamp") or "")
+        _replace_history(store.path, engine_for_path(store.path), merged)
+    logger.info(f"Merged {len(added)} history records from {', '.join(source_paths)} "
+                f"into {store.path}")
+    return len(added)
+
+
+def get_history_store(file_path=None):
+    """
+    Opens the history store, bringing in runs saved by the other engines.
+
+    Switching history_backend leaves the previous engine's file behind.
+    Whenever another engine's file or the legacy JSON array was written after
+    the current store, its missing runs are merged in, so switching engines
+    back and forth never hides saved runs.
+    """
+    default_path = get_history_file_path()
+    if file_path is not None and file_path != default_path:
+        return open_history_store(file_path)
+    store = open_history_store(default_path)
+    modified = os.path.getmtime(default_path) if store.exists() else None
+    candidates = [get_history_file_path(backend) for backend in HISTORY_FILE_NAMES]
+    candidates.append(get_legacy_history_file_path())
+    newer = [
+        path for path in candidates
+        if path != default_path and os.path.exists(path)
+        and (modified is None or os.path.getmtime(path) > modified)
+    ]
+    if newer:
+        merge_history(store, newer)
+        if store.exists():
+            # Marks the other files as merged, even if they added no runs
+            os.utime(default_path)
+    return store
@@ -0,0 +1,269 @@
+"""
+Latency distribution measurement.
+
+speedtest-cli reports a single ping per test. This module sends N probes to
+the chosen server's latency.txt over keep-alive HTTP connections, either
+paced (one connection, a fixed gap between probes) or concurrently (the
+probes split across several connections), and summarizes them as min,
+median, p95, p99, jitter and loss percentage, so tail latency is recorded
+next to the throughput figures.
+
+LoadedLatencySampler keeps probing on its own thread while a download or
+upload runs, which shows how much latency grows when the link is saturated
+(bufferbloat).
+"""
+import ssl
+import math
+import time
+import asyncio
+import logging
+import threading
+
+from speedtest_app.history_store import LATENCY_FIELDS, loaded_latency_fields
+from speedtest_app.server_selection import jitter, latency_target, read_http_response
+
+logger = logging.getLogger("SpeedTest")
+
+MODE_PACED = "paced"
+MODE_CONCURRENT = "concurrent"
+
+DEFAULT_PROBES = 20
+DEFAULT_INTERVAL = 0.05
+DEFAULT_TIMEOUT = 1.0
+DEFAULT_CONNECTIONS = 4
+
+# Probing during transfers: queues on a saturated link can hold packets for seconds
+DEFAULT_LOADED_INTERVAL = 0.1
+DEFAULT_LOADED_TIMEOUT = 3.0
+
+
+def latency_statistics(samples, sent):
+    """
+    Summarizes probe round-trip times.
+
+    Args:
+        samples: Round-trip times (ms) of the answered probes, in send order
+        sent: Number of probes sent
+
+    Returns:
+        dict: LATENCY_FIELDS; latency values are None if nothing answered
+    """
+    import numpy as np
+
+    loss = 100.0 * (sent - len(samples)) / sent if sent else 0.0
+    if not samples:
+        return dict(dict.fromkeys(LATENCY_FIELDS, None), packet_loss=loss)
+    values = np.asarray(samples, dtype=np.float64)
+    p95, p99 = np.percentile(values, [95, 99])
+    return {
+        "latency_min": round(float(values.min()), 3),
+        "latency_median": round(float(np.median(values)), 3),
+        "latency_p95": round(float(p95), 3),
+        "latency_p99": round(float(p99), 3),
+        "jitter": round(jitter(samples), 3),
+        "packet_loss": round(loss, 2),
+    }
+
+
+class _Connection:
+    """One keep-alive HTTP connection to a server's latency.txt."""
+
+    def __init__(self, server, timeout):
+        self.scheme, self.host, self.port, self.path = latency_target(server)
+        self.timeout = timeout
+        self.reader = self.writer = None
+        self._sequence = 0
+
+    async def _connect(self):
+        context = ssl.create_default_context() if self.scheme == "https" else None
+        self.reader, self.writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port, ssl=context), self.timeout
+        )
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+    async def probe(self):
+        """Returns the round-trip time in ms, or None if the probe was lost."""
+        self._sequence += 1
+        request = (
+            f"GET {self.path}?x={int(time.time() * 1000)}.{self._sequence} HTTP/1.1\r\n"
+            f"Host: {self.host}\r\nConnection: keep-alive\r\nCache-Control: no-cache\r\n\r\n"
+        )
+        try:
+            if self.writer is None:
+                await self._connect()
+            start = time.perf_counter()
+            self.writer.write(request.encode("ascii"))
+            await self.writer.drain()
+            status, body = await asyncio.wait_for(read_http_response(self.reader), self.timeout)
+            elapsed = (time.perf_counter() - start) * 1000
+        except (OSError, ValueError, ConnectionError, asyncio.TimeoutError,
+                asyncio.IncompleteReadError) as e:
+            logger.debug(f"Latency probe to {self.host} lost: {e}")
+            # A late answer would be read as the next probe's response
+            self.close()
+            return None
+        if status != 200 or not body.startswith(b"test=test"):
+            return None
+        return elapsed
+
+
+async def _paced_probes(server, count, interval, timeout):
+    connection = _Connection(server, timeout)
+    results = []
+    try:
+        for i in range(count):
+            if i and interval:
+                await asyncio.sleep(interval)
+            results.append(await connection.probe())
+    finally:
+        connection.close()
+    return results
+
+
+async def probe_latency(server, count=DEFAULT_PROBES, mode=MODE_PACED,
+                        interval=DEFAULT_INTERVAL, timeout=DEFAULT_TIMEOUT,
+                        connections=DEFAULT_CONNECTIONS):
+    """
+    Sends count latency probes to a server.
+
+    Returns:
+        list: Round-trip times in ms, None for lost probes
+    """
+    if mode == MODE_CONCURRENT:
+        connections = max(1, min(connections, count))
+        shares = [count // connections + (i < count % connections) for i in range(connections)]
+        batches = await asyncio.gather(
+            *(_paced_probes(server, share, 0, timeout) for share in shares)
+        )
+        return [rtt for batch in batches for rtt in batch]
+    return await _paced_probes(server, count, interval, timeout)
+
+
+def measure_latency(server, count=DEFAULT_PROBES, mode=MODE_PACED,
+                    interval=DEFAULT_INTERVAL, timeout=DEFAULT_TIMEOUT,
+                    connections=DEFAULT_CONNECTIONS):
+    """
+    Blocking wrapper around probe_latency for worker threads.
+
+    Returns:
+        dict: latency_statistics of the probes
+    """
+    results = asyncio.run(probe_latency(server, count, mode, interval, timeout, connections))
+    return latency_statistics([rtt for rtt in results if rtt is not None], len(results))
+
+
+def latency_series(samples, bucket=1.0):
+    """
+    Buckets timed probe results into a per-second series.
+
+    Args:
+        samples: (seconds since start, round-trip ms or None) pairs
+
+    Returns:
+        list: Median round-trip time of each bucket, None where every probe was lost
+    """
+    if not samples:
+        return []
+    import numpy as np
+
+    buckets = [[] for _ in range(int(math.floor(max(t for t, _ in samples) / bucket)) + 1)]
+    for t, rtt in samples:
+        if rtt is not None:
+            buckets[int(t // bucket)].append(rtt)
+    return [round(float(np.median(values)), 3) if values else None for values in buckets]
+
+
+def loaded_latency_summary(samples, idle_latency, direction):
+    """
+    Summarizes the probes of one transfer phase against the idle latency.
+
+    Returns:
+        dict: {direction}_latency_median, _p95, _delta (loaded minus idle
+        median, ms) and _series (per-second medians)
+    """
+    fields = loaded_latency_fields(direction)
+    answered = [rtt for _, rtt in samples if rtt is not None]
+    summary = {fields["series"]: latency_series(samples)}
+    if answered:
+        import numpy as np
+
+        median, p95 = np.percentile(answered, [50, 95])
+        summary[fields["median"]] = round(float(median), 3)
+        summary[fields["p95"]] = round(float(p95), 3)
+        if idle_latency is not None:
+            summary[fields["delta"]] = round(float(median) - idle_latency, 3)
+    return summary
+
+
+class LoadedLatencySampler:
+    """
+    Probes a server's latency at a fixed rate on a background thread.
+
+    Used as a context manager around a transfer phase; samples holds
+    (seconds since start, round-trip ms or None) pairs afterwards.
+    """
+
+    def __init__(self, server, interval=DEFAULT_LOADED_INTERVAL, timeout=DEFAULT_LOADED_TIMEOUT):
+        self.server = server
+        self.interval = interval
+        self.timeout = timeout
+        self.samples = []
+        self._started = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._loop = None
+        self._task = None
+
+    async def _sample(self):
+        connection = _Connection(self.server, self.timeout)
+        try:
+            while not self._stop.is_set():
+                sent = time.monotonic()
+                rtt = await connection.probe()
+                self.samples.append((sent - self._started, rtt))
+                await asyncio.sleep(max(0.0, self.interval - (time.monotonic() - sent)))
+        finally:
+            connection.close()
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        try:
+            self._task = self._loop.create_task(self._sample())
+            self._loop.run_until_complete(self._task)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.warning(f"Latency under load sampling failed: {e}")
+        finally:
+            self._loop.close()
+
+    def start(self):
+        self._started = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name="LoadedLatencySampler",
+                                        daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stops sampling, abandoning a probe still in flight; returns the samples."""
+        self._stop.set()
+        loop, task = self._loop, self._task
+        if loop is not None and task is not None and not loop.is_closed():
+            try:
+                loop.call_soon_threadsafe(task.cancel)
+            except RuntimeError:
+                pass  # The loop closed in the meantime
+        if self._thread is not None:
+            self._thread.join(timeout=self.timeout)
+        return list(self.samples)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
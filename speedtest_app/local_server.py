@@ -0,0 +1,283 @@
+"""
+Local stand-in for the speedtest.net endpoints speedtest-cli talks to.
+
+Serves the configuration, the server list, latency.txt, random*.jpg
+downloads and upload.php on a threaded HTTP server, with optional bandwidth
+shaping (token buckets shared by all connections) and latency injection.
+SpeedTestService uses it when the speedtest_server_url setting points here,
+which makes measurements reproducible on machines without network access:
+
+    python -m speedtest_app.local_server --port 8080 --download-mbps 100
+"""
+import re
+import sys
+import time
+import random
+import logging
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, urlunsplit
+from urllib.request import Request
+
+logger = logging.getLogger("SpeedTest")
+
+CHUNK_SIZE = 64 * 1024
+SPEEDTEST_HOSTS = ("www.speedtest.net", "c.speedtest.net")
+
+CONFIG_XML = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n<settings>'
+    '<client ip="127.0.0.1" lat="0.0" lon="0.0" isp="Local stand-in" country="LO"/>'
+    '<server-config threadcount="{threads}" ignoreids=""/>'
+    '<download testlength="{test_length}" threadsperurl="4"/>'
+    '<upload testlength="{test_length}" ratio="5" maxchunkcount="50" threads="{threads}"/>'
+    '</settings>'
+)
+SERVERS_XML = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n<settings><servers>'
+    '<server url="{base_url}/speedtest/upload.php" lat="0.0" lon="0.0" name="Localhost"'
+    ' country="Local" cc="LO" sponsor="Local stand-in" id="{server_id}" host="{host}"/>'
+    '</servers></settings>'
+)
+RANDOM_IMAGE = re.compile(r"^/speedtest/random(\d+)x(\d+)\.jpg$")
+
+
+class TokenBucket:
+    """Blocking token bucket limiting throughput in bytes per second."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(rate / 10, CHUNK_SIZE)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, amount):
+        """Waits until amount bytes may be sent or received."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity,
+                                   self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return
+                wait = (amount - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def image_size(width, height):
+    """Approximate byte size of speedtest.net's random{W}x{H}.jpg files."""
+    return width * height * 2
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "SpeedTestStandIn"
+    # Headers and body are written separately; Nagle would add ~40 ms to pings
+    disable_nagle_algorithm = True
+
+    def __init__(self, *args, **kwargs):
+        # handle() resets it per request; declared before the base class runs handle()
+        self.close_connection = True
+        super().__init__(*args, **kwargs)
+
+    def log_message(self, *args):
+        # Called as log_message(format, *values); the builtin format is not shadowed
+        logger.debug(f"Stand-in server: {args[0] % args[1:]}")
+
+    def _delay(self):
+        standin = self.server.standin
+        if standin.latency or standin.jitter:
+            time.sleep(standin.latency + random.uniform(0, standin.jitter))
+
+    def _send(self, body, content_type="text/plain"):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        standin = self.server.standin
+        path = urlsplit(self.path).path
+        self._delay()
+        if path == "/speedtest-config.php":
+            self._send(standin.config_xml().encode("utf-8"), "text/xml")
+        elif path in ("/speedtest-servers-static.php", "/speedtest-servers.php"):
+            self._send(standin.servers_xml().encode("utf-8"), "text/xml")
+        elif path == "/speedtest/latency.txt":
+            self._send(b"test=test")
+        elif RANDOM_IMAGE.match(path):
+            width, height = map(int, RANDOM_IMAGE.match(path).groups())
+            self._send_download(image_size(width, height))
+        else:
+            self.send_error(404)
+
+    def _send_download(self, size):
+        bucket = self.server.standin.download_bucket
+        self.send_response(200)
+        self.send_header("Content-Type", "image/jpeg")
+        self.send_header("Content-Length", str(size))
+        self.end_headers()
+        chunk = self.server.standin.payload
+        remaining = size
+        try:
+            while remaining > 0:
+                part = min(remaining, CHUNK_SIZE)
+                if bucket is not None:
+                    bucket.consume(part)
+                self.wfile.write(chunk[:part])
+                remaining -= part
+        except (BrokenPipeError, ConnectionResetError):
+            # Clients hang up once the test length is reached
+            self.close_connection = True
+
+    def do_POST(self):
+        if urlsplit(self.path).path != "/speedtest/upload.php":
+            self.send_error(404)
+            return
+        self._delay()
+        bucket = self.server.standin.upload_bucket
+        remaining = int(self.headers.get("Content-Length", 0))
+        received = 0
+        try:
+            while remaining > 0:
+                part = min(remaining, CHUNK_SIZE)
+                if bucket is not None:
+                    bucket.consume(part)
+                data = self.rfile.read(part)
+                if not data:
+                    break
+                received += len(data)
+                remaining -= len(data)
+            self._send(f"size={received}".encode("ascii"))
+        except (BrokenPipeError, ConnectionResetError):
+            # Upload threads are abandoned once the test length is reached
+            self.close_connection = True
+
+
+class LocalSpeedtestServer:
+    """
+    Threaded stand-in speed test server.
+
+    Args:
+        host, port: Address to listen on; port 0 picks a free port
+        download_mbps, upload_mbps: Bandwidth limits, None for unlimited
+        latency_ms, jitter_ms: Delay added before every response
+        test_length: Test length in seconds announced in the configuration
+        threads: Stream count announced in the configuration
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, download_mbps=None, upload_mbps=None,
+                 latency_ms=0.0, jitter_ms=0.0, test_length=10, threads=4, server_id=1):
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.test_length = test_length
+        self.threads = threads
+        self.server_id = server_id
+        self.download_bucket = TokenBucket(download_mbps * 125_000) if download_mbps else None
+        self.upload_bucket = TokenBucket(upload_mbps * 125_000) if upload_mbps else None
+        self.payload = bytes(CHUNK_SIZE)
+        self.httpd = ThreadingHTTPServer((host, port), _StandInHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.standin = self
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def config_xml(self):
+        return CONFIG_XML.format(threads=self.threads, test_length=self.test_length)
+
+    def servers_xml(self):
+        host, port = self.httpd.server_address[:2]
+        return SERVERS_XML.format(base_url=self.base_url, server_id=self.server_id,
+                                  host=f"{host}:{port}")
+
+    def start(self):
+        """Serves requests on a background thread."""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        logger.info(f"Stand-in speed test server listening on {self.base_url}")
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+
+class RedirectingOpener:
+    """
+    Wraps a urllib OpenerDirector and sends speedtest.net requests elsewhere.
+
+    speedtest-cli hardcodes www.speedtest.net for the configuration and the
+    server list; everything after that follows the URLs in the server list.
+    """
+
+    def __init__(self, opener, base_url):
+        self._opener = opener
+        self._base = urlsplit(base_url)
+
+    def _rewrite(self, request):
+        parts = urlsplit(request.full_url)
+        if parts.hostname not in SPEEDTEST_HOSTS:
+            return request
+        url = urlunsplit((self._base.scheme, self._base.netloc, parts.path, parts.query, ""))
+        return Request(url, data=request.data, headers=dict(request.header_items()),
+                       method=request.get_method())
+
+    def open(self, request, *args, **kwargs):
+        if isinstance(request, str):
+            request = Request(request)
+        return self._opener.open(self._rewrite(request), *args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._opener, name)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m speedtest_app.local_server",
+        description="Run a local stand-in speed test server."
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--download-mbps", type=float, default=None)
+    parser.add_argument("--upload-mbps", type=float, default=None)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--test-length", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    server = LocalSpeedtestServer(
+        args.host, args.port, args.download_mbps, args.upload_mbps,
+        args.latency_ms, args.jitter_ms, args.test_length
+    ).start()
+    print(f"Set speedtest_server_url to {server.base_url}", file=sys.stderr)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,326 @@
+"""
+Prometheus metrics for speed test history and live test state.
+
+SpeedTestMetrics keeps everything a scrape needs in memory: it is seeded
+once from the history store (through the columnar cache) and then updated
+from the progress events of every test SpeedTestService runs and from the
+runs appended to that store. MetricsExporter
+serves it in the Prometheus text format on a localhost HTTP endpoint, so a
+scrape never touches the history file:
+
+    alex-speedtest-cli --schedule --metrics-port 9469
+    curl http://127.0.0.1:9469/metrics
+"""
+import os
+import math
+import time
+import logging
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from speedtest_app.progress_events import (
+    PHASE_SERVER,
+    PhaseChanged,
+    SpeedTestFinished,
+    TransferProgress
+)
+
+logger = logging.getLogger("SpeedTest")
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 9469
+DEFAULT_WINDOW = 100
+QUANTILES = (0.5, 0.9, 0.95, 0.99)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Result key, history column, metric name and help text of the measured values
+SERIES = (
+    ("download", "download_speed", "speedtest_download_mbps", "Download speed in Mbps"),
+    ("upload", "upload_speed", "speedtest_upload_mbps", "Upload speed in Mbps"),
+    ("ping", "ping", "speedtest_ping_ms", "Ping in milliseconds"),
+)
+STATUSES = ("ok", "partial", "failed", "cancelled")
+
+
+def result_status(result):
+    """Classifies a run_speedtest result as ok, partial, failed or cancelled."""
+    if result.get("cancelled"):
+        return "cancelled"
+    if "error" in result:
+        return "failed"
+    if result.get("partial"):
+        return "partial"
+    return "ok"
+
+
+def _format_value(value):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return "NaN"
+    return repr(float(value))
+
+
+class SpeedTestMetrics:
+    """
+    In-memory metric state, updated by progress events.
+
+    Register it with SpeedTestService.add_listener; put() is called on the
+    test worker thread, render() on scrape threads.
+
+    Args:
+        window: How many recent runs the percentiles are computed over
+        clock: Monotonic time source used for durations
+    """
+
+    def __init__(self, window=DEFAULT_WINDOW, clock=time.monotonic):
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.recent = {key: deque(maxlen=window) for key, _, _, _ in SERIES}
+        # Summary _sum and _count are counters, so they cover every run, not the window
+        self.totals = {key: (0.0, 0) for key, _, _, _ in SERIES}
+        self.last = {}
+        self.last_timestamp = None
+        self.history_runs = 0
+        self.history_path = None
+        self.tests = dict.fromkeys(STATUSES, 0)
+        self.phase_timeouts = {}
+        self.duration_sum = 0.0
+        self.duration_count = 0
+        self.last_duration = None
+        self.phase_durations = {}
+        self._started = None
+        self._phase = None
+        self._phase_started = None
+        self._throughput = 0.0
+
+    def load_history(self, store):
+        """Seeds the last result and the percentile windows from the store."""
+        import numpy as np
+        from speedtest_app.history_cache import load_history_columns
+
+        self.history_path = os.path.abspath(store.path)
+        columns = load_history_columns(store)
+        with self._lock:
+            self.history_runs = len(columns["timestamp"])
+            if not self.history_runs:
+                return
+            for key, column, _, _ in SERIES:
+                values = columns[column][-self.recent[key].maxlen:]
+                self.recent[key].extend(float(v) for v in values)
+                self.last[key] = float(columns[column][-1])
+                measured = columns[column][np.isfinite(columns[column])]
+                self.totals[key] = (float(measured.sum()), len(measured))
+            self.last_timestamp = int(columns["timestamp"][-1])
+
+    def history_appended(self, store, record):
+        """Counts a run appended to the store the metrics were loaded from."""
+        if self.history_path is not None and os.path.abspath(store.path) == self.history_path:
+            with self._lock:
+                self.history_runs += 1
+
+    def put(self, event):
+        """Event sink interface used by SpeedTestService."""
+        with self._lock:
+            if isinstance(event, PhaseChanged):
+                self._enter_phase(event.phase)
+            elif isinstance(event, TransferProgress):
+                self._throughput = event.throughput
+            elif isinstance(event, SpeedTestFinished):
+                self._finish(event.result)
+
+    def _enter_phase(self, phase):
+        now = self._clock()
+        if self._started is None or phase == PHASE_SERVER:
+            self._started = now
+        if phase != self._phase:
+            self._close_phase(now)
+            self._phase, self._phase_started = phase, now
+        self._throughput = 0.0
+
+    def _close_phase(self, now):
+        if self._phase is None:
+            return
+        total, count = self.phase_durations.get(self._phase, (0.0, 0))
+        self.phase_durations[self._phase] = (total + now - self._phase_started, count + 1)
+
+    def _finish(self, result):
+        now = self._clock()
+        self._close_phase(now)
+        if self._started is not None:
+            self.last_duration = now - self._started
+            self.duration_sum += self.last_duration
+            self.duration_count += 1
+        self._started = self._phase = self._phase_started = None
+        self._throughput = 0.0
+
+        status = result_status(result)
+        self.tests[status] += 1
+        for phase in result.get("timed_out", ()):
+            self.phase_timeouts[phase] = self.phase_timeouts.get(phase, 0) + 1
+        if status in ("ok", "partial"):
+            for key, _, _, _ in SERIES:
+                if result.get(key) is not None:
+                    value = float(result[key])
+                    self.recent[key].append(value)
+                    self.last[key] = value
+                    total, count = self.totals[key]
+                    self.totals[key] = (total + value, count + 1)
+            self.last_timestamp = int(time.time())
+
+    def render(self):
+        """Returns the metrics in the Prometheus text exposition format."""
+        import numpy as np
+
+        with self._lock:
+            lines = []
+
+            def metric(name, kind, help_text, samples):
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for suffix, labels, value in samples:
+                    label_text = ",".join(f'{k}="{v}"' for k, v in labels)
+                    label_text = f"{{{label_text}}}" if label_text else ""
+                    lines.append(f"{name}{suffix}{label_text} {_format_value(value)}")
+
+            for key, _, name, help_text in SERIES:
+                metric(name.replace("speedtest_", "speedtest_last_", 1), "gauge",
+                       f"{help_text} of the last successful test",
+                       [("", (), self.last.get(key))])
+            metric("speedtest_last_timestamp_seconds", "gauge",
+                   "Unix time of the last successful test",
+                   [("", (), self.last_timestamp)])
+
+            for key, _, name, help_text in SERIES:
+                values = np.fromiter(self.recent[key], dtype=np.float64)
+                samples = [
+                    ("", (("quantile", str(q)),),
+                     np.quantile(values, q) if len(values) else None)
+                    for q in QUANTILES
+                ]
+                total, count = self.totals[key]
+                samples += [("_sum", (), total), ("_count", (), count)]
+                metric(name, "summary",
+                       f"{help_text}; quantiles over the last {self.recent[key].maxlen} tests",
+                       samples)
+
+            metric("speedtest_history_runs", "gauge", "Test runs in the history",
+                   [("", (), self.history_runs)])
+            metric("speedtest_tests_total", "counter",
+                   "Tests finished since the exporter started, by outcome",
+                   [("", (("status", status),), count) for status, count in self.tests.items()])
+            metric("speedtest_failures_total", "counter",
+                   "Tests that failed or were cancelled since the exporter started",
+                   [("", (), self.tests["failed"] + self.tests["cancelled"])])
+            metric("speedtest_phase_timeouts_total", "counter", "Phases that hit their timeout",
+                   [("", (("phase", phase),), count)
+                    for phase, count in sorted(self.phase_timeouts.items())])
+            metric("speedtest_test_duration_seconds", "summary", "Wall time of whole tests",
+                   [("_sum", (), self.duration_sum), ("_count", (), self.duration_count)])
+            metric("speedtest_last_test_duration_seconds", "gauge",
+                   "Wall time of the last test", [("", (), self.last_duration)])
+            metric("speedtest_phase_duration_seconds", "summary", "Wall time of test phases",
+                   [sample for phase, (total, count) in sorted(self.phase_durations.items())
+                    for sample in (("_sum", (("phase", phase),), total),
+                                   ("_count", (("phase", phase),), count))])
+
+            running = self._started is not None
+            metric("speedtest_test_running", "gauge", "1 while a test is running",
+                   [("", (), int(running))])
+            metric("speedtest_test_phase", "gauge", "The phase the running test is in",
+                   [("", (("phase", self._phase),), 1)] if running and self._phase else [])
+            metric("speedtest_current_throughput_mbps", "gauge",
+                   "Throughput of the running transfer phase",
+                   [("", (), self._throughput / 1_000_000)])
+            return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    server_version = "SpeedTestMetrics"
+
+    def log_message(self, *args):
+        # Called as log_message(format, *values); the builtin format is not shadowed
+        logger.debug(f"Metrics exporter: {args[0] % args[1:]}")
+
+    def do_GET(self):
+        if urlsplit(self.path).path not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = self.server.metrics.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class MetricsExporter:
+    """
+    Serves SpeedTestMetrics on http://host:port/metrics from a background thread.
+
+    Binds to localhost by default; port 0 picks a free port.
+    """
+
+    def __init__(self, metrics, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        self.metrics = metrics
+        self.httpd = ThreadingHTTPServer((host, port), _MetricsHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.metrics = metrics
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/metrics"
+
+    def start(self):
+        from speedtest_app.history_cache import add_append_listener
+
+        add_append_listener(self.metrics.history_appended)
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        logger.info(f"Metrics exporter listening on {self.url}")
+        return self
+
+    def stop(self):
+        from speedtest_app.history_cache import remove_append_listener
+
+        remove_append_listener(self.metrics.history_appended)
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+
+def start_metrics_exporter(service, settings, store=None, port=None):
+    """
+    Seeds metrics from the store, subscribes them to the service and starts
+    the endpoint (metrics_host, metrics_port and metrics_window settings).
+
+    Returns:
+        MetricsExporter or None: None if the endpoint could not be started
+    """
+    metrics = SpeedTestMetrics(settings.get("metrics_window", DEFAULT_WINDOW))
+    if store is not None:
+        try:
+            metrics.load_history(store)
+        except Exception as e:
+            logger.warning(f"Could not load history for metrics: {e}")
+    try:
+        exporter = MetricsExporter(
+            metrics,
+            settings.get("metrics_host", DEFAULT_HOST),
+            port if port is not None else settings.get("metrics_port", DEFAULT_PORT)
+        )
+    except OSError as e:
+        logger.error(f"Could not start metrics exporter: {e}")
+        return None
+    service.add_listener(metrics)
+    return exporter.start()
@@ -1,13 +1,110 @@
+"""
+Network adapter information.
+
+get_network_info enumerates every interface with its addresses, up/down
+state and byte counters. NetworkInfoService keeps that snapshot in memory
+and refreshes it from a background watcher, so the GUI reads it without
+enumerating the interfaces again.
+"""
 import socket
 import platform
 import logging
-import psutil
+import threading
 from datetime import datetime
 import concurrent.futures
+from dataclasses import dataclass
+from speedtest_app.progress_events import EventFanout
 
 # Получаем логгер
 logger = logging.getLogger("SpeedTest")
 
+# Seconds between the watcher's checks for interface changes
+DEFAULT_WATCH_INTERVAL = 5.0
+
+# Imported on first use (see _psutil), so importing this module stays cheap
+psutil = None
+
+
+def _psutil():
+    """Returns the psutil module, importing it on the first call."""
+    global psutil
+    if psutil is None:
+        import psutil as module
+        psutil = module
+    return psutil
+
+
+def _adapter_info(interface_name, interface_addresses, net_stats, if_stats):
+    """Builds the adapter dict of one interface."""
+    adapter_info = {
+        "Adapter": interface_name,
+        "IP Address": None,
+        "MAC Address": None,
+        "IPv6 Address": None,
+        "Netmask": None,
+        "Active": False,
+        "Up": if_stats[interface_name].isup if interface_name in if_stats else None,
+        "Bytes Sent": 0,
+        "Bytes Received": 0
+    }
+
+    # Check if adapter is active (has network stats)
+    if interface_name in net_stats:
+        adapter_info["Active"] = True
+        adapter_info["Bytes Sent"] = net_stats[interface_name].bytes_sent
+        adapter_info["Bytes Received"] = net_stats[interface_name].bytes_recv
+
+    # Get MAC and IP addresses for each adapter
+    for address in interface_addresses:
+        # socket.AF_LINK only exists on BSD and macOS; psutil defines it everywhere
+        if address.family == _psutil().AF_LINK:
+            adapter_info["MAC Address"] = address.address
+        elif address.family == socket.AF_INET:
+            adapter_info["IP Address"] = address.address
+            adapter_info["Netmask"] = address.netmask
+        elif address.family == socket.AF_INET6:
+            adapter_info["IPv6 Address"] = address.address
+    return adapter_info
+
+
+def _network_info(adapters):
+    """Builds the network information dict from the adapter dicts of all interfaces."""
+    network_info = {
+        "Computer Name": platform.node(),  # Get the computer's hostname
+        "System": f"{platform.system()} {platform.release()}",
+        "Time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "Adapters": []  # List to store network adapters' info
+    }
+    for adapter_info in adapters:
+        # Add adapter info if both IP and MAC addresses are found
+        if adapter_info["IP Address"] and adapter_info["MAC Address"]:
+            network_info["Adapters"].append(adapter_info)
+            logger.debug(
+                f"Found adapter: {adapter_info['Adapter']} with IP: {adapter_info['IP Address']}")
+
+    if not network_info["Adapters"]:
+        logger.warning("No network adapters with both IP and MAC addresses found")
+    return network_info
+
+
+def _error_info(error):
+    # Return basic info with error message
+    return {
+        "Computer Name": platform.node(),
+        "System": f"{platform.system()} {platform.release()}",
+        "Error": str(error),
+        "Adapters": []
+    }
+
+
+def _pick_active_adapter(network_info):
+    active_adapters = [adapter for adapter in network_info["Adapters"]
+                       if adapter["Active"] and adapter["IP Address"]]
+    if not active_adapters:
+        return None
+    # Сортировка по объему принятых данных
+    return max(active_adapters, key=lambda x: x["Bytes Received"])
+
 
 def get_network_info():
     """
@@ -15,73 +112,19 @@ def get_network_info():
 
     Returns:
         dict: Dictionary containing computer name and network adapter information
-
-    Raises:
-        Exception: If there's an error retrieving network information
     """
     try:
-        # Initialize network information dictionary
-        network_info = {
-            "Computer Name": platform.node(),  # Get the computer's hostname
-            "System": f"{platform.system()} {platform.release()}",
-            "Time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "Adapters": []  # List to store network adapters' info
-        }
-
-        logger.info(f"Getting network info for {network_info['Computer Name']}")
-
-        # Get network stats
-        net_stats = psutil.net_io_counters(pernic=True)
-
-        # Loop through network interfaces and their addresses
-        for interface_name, interface_addresses in psutil.net_if_addrs().items():
-            adapter_info = {
-                "Adapter": interface_name,
-                "IP Address": None,
-                "MAC Address": None,
-                "IPv6 Address": None,
-                "Netmask": None,
-                "Active": False,
-                "Bytes Sent": 0,
-                "Bytes Received": 0
-            }
-
-            # Check if adapter is active (has network stats)
-            if interface_name in net_stats:
-                adapter_info["Active"] = True
-                adapter_info["Bytes Sent"] = net_stats[interface_name].bytes_sent
-                adapter_info["Bytes Received"] = net_stats[interface_name].bytes_recv
-
-            # Get MAC and IP addresses for each adapter
-            for address in interface_addresses:
-                if address.family == socket.AF_LINK:
-                    adapter_info["MAC Address"] = address.address
-                elif address.family == socket.AF_INET:
-                    adapter_info["IP Address"] = address.address
-                    adapter_info["Netmask"] = address.netmask
-                elif address.family == socket.AF_INET6:
-                    adapter_info["IPv6 Address"] = address.address
-
-            # Add adapter info if both IP and MAC addresses are found
-            if adapter_info["IP Address"] and adapter_info["MAC Address"]:
-                network_info["Adapters"].append(adapter_info)
-                logger.debug(
-                    f"Found adapter: {interface_name} with IP: {adapter_info['IP Address']}")
-
-        if not network_info["Adapters"]:
-            logger.warning("No network adapters with both IP and MAC addresses found")
-
-        return network_info
+        logger.info(f"Getting network info for {platform.node()}")
+        net_stats = _psutil().net_io_counters(pernic=True)
+        if_stats = _psutil().net_if_stats()
+        return _network_info(
+            _adapter_info(name, addresses, net_stats, if_stats)
+            for name, addresses in _psutil().net_if_addrs().items()
+        )
 
     except Exception as e:
         logger.error(f"Error retrieving network information: {e}", exc_info=True)
-        # Return basic info with error message
-        return {
-            "Computer Name": platform.node(),
-            "System": f"{platform.system()} {platform.release()}",
-            "Error": str(e),
-            "Adapters": []
-        }
+        return _error_info(e)
 
 
 def get_active_adapter_info():
@@ -89,27 +132,168 @@ def get_active_adapter_info():
     Returns information about the currently active network adapter.
     """
     try:
-        all_info = get_network_info()
-        active_adapters = [adapter for adapter in all_info["Adapters"]
-                         if adapter["Active"] and adapter["IP Address"]]
-
-        if not active_adapters:
+        active_adapter = _pick_active_adapter(get_network_info())
+        if active_adapter is None:
             logger.warning("No active network adapters found")
-            return None
-
-        # Сортировка по объему принятых данных
-        active_adapters.sort(key=lambda x: x["Bytes Received"], reverse=True)
-        return active_adapters[0]
+        return active_adapter
 
     except Exception as e:
         logger.error(f"Error getting active adapter info: {e}", exc_info=True)
         return None
 
 
+def _adapter_name(adapter):
+    return adapter["Adapter"] if adapter is not None else None
+
+
+def _interface_signature(addresses, stats):
+    """What a change is detected on: the addresses and the up/down state."""
+    return (
+        stats.isup if stats is not None else None,
+        tuple(sorted((int(a.family), a.address or "", a.netmask or "") for a in addresses))
+    )
+
+
+@dataclass(frozen=True)
+class NetworkInfoChanged:
+    """Interfaces, their addresses or their up/down state changed."""
+    info: dict
+    active_adapter: dict
+
+
 class NetworkInfoService:
-    def __init__(self):
+    """
+    Network adapter information cached in memory.
+
+    The first read enumerates every interface. After that, refresh() (called
+    by the watcher thread every watch_interval seconds) compares each
+    interface's addresses and up/down state with the cached ones, rebuilds
+    only the adapters that changed and takes the current byte counters of
+    the others. The listeners (anything with put(event)) get a
+    NetworkInfoChanged when an interface changed or another adapter became
+    the active one. Reads never enumerate the interfaces again; treat the
+    returned dicts as read-only.
+    """
+
+    def __init__(self, watch_interval=DEFAULT_WATCH_INTERVAL):
         self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        self.watch_interval = watch_interval
+        self._lock = threading.Lock()
+        self._signatures = {}
+        self._adapters = {}
+        self._info = None
+        self._active_adapter = None
+        self._listeners = []
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add_listener(self, sink):
+        """Registers a sink that receives a NetworkInfoChanged on every change."""
+        self._listeners.append(sink)
+
+    def remove_listener(self, sink):
+        if sink in self._listeners:
+            self._listeners.remove(sink)
+
+    def refresh(self):
+        """
+        Re-reads the interface state and updates the cache.
+
+        Returns:
+            bool: True if the interfaces or the active adapter changed since
+            the last refresh
+        """
+        with self._lock:
+            try:
+                addresses = _psutil().net_if_addrs()
+                if_stats = _psutil().net_if_stats()
+                signatures = {
+                    name: _interface_signature(addrs, if_stats.get(name))
+                    for name, addrs in addresses.items()
+                }
+                # Read on every refresh: the active adapter is picked by received bytes
+                net_stats = _psutil().net_io_counters(pernic=True)
+                changed = self._info is None or signatures != self._signatures
+                adapters = {}
+                for name, addrs in addresses.items():
+                    cached = self._adapters.get(name)
+                    if cached is None or self._signatures.get(name) != signatures[name]:
+                        adapters[name] = _adapter_info(name, addrs, net_stats, if_stats)
+                        logger.info(f"Network adapter {name} changed")
+                    elif name in net_stats:
+                        # Unchanged: keep the addresses, take the new counters
+                        adapters[name] = dict(cached,
+                                              **{"Bytes Sent": net_stats[name].bytes_sent,
+                                                 "Bytes Received": net_stats[name].bytes_recv})
+                    else:
+                        adapters[name] = cached
+                for name in self._signatures.keys() - signatures.keys():
+                    logger.info(f"Network adapter {name} removed")
+
+                if changed:
+                    info = _network_info(adapters.values())
+                else:
+                    info = dict(self._info, Adapters=[adapters[adapter["Adapter"]]
+                                                      for adapter in self._info["Adapters"]])
+                self._signatures, self._adapters = signatures, adapters
+            except Exception as e:
+                logger.error(f"Error retrieving network information: {e}", exc_info=True)
+                if self._info is not None:
+                    return False
+                info, changed = _error_info(e), True
+            # New dicts replace the old ones, so readers never see a partial update
+            active_adapter = _pick_active_adapter(info)
+            if not changed:
+                changed = _adapter_name(active_adapter) != _adapter_name(self._active_adapter)
+            self._info = info
+            self._active_adapter = active_adapter
+            if not changed:
+                return False
+            event = NetworkInfoChanged(self._info, self._active_adapter)
+        EventFanout(self._listeners).put(event)
+        return True
+
+    def network_info(self):
+        """Returns the cached network information, enumerating on the first call."""
+        if self._info is None:
+            self.refresh()
+        return self._info
+
+    def active_adapter(self):
+        """Returns the cached active adapter (the one that received the most), or None."""
+        if self._info is None:
+            self.refresh()
+        return self._active_adapter
+
+    def _cached_or_submit(self, read):
+        if self._info is not None:
+            future = concurrent.futures.Future()
+            future.set_result(read())
+            return future
+        return self.executor.submit(read)
+
     def get_active_adapter_async(self):
-        return self.executor.submit(get_active_adapter_info)
+        return self._cached_or_submit(self.active_adapter)
+
     def get_network_info_async(self):
-        return self.executor.submit(get_network_info)
\ No newline at end of file
+        return self._cached_or_submit(self.network_info)
+
+    def _watch(self):
+        while not self._stop.wait(self.watch_interval):
+            self.refresh()
+
+    def start(self):
+        """Starts the watcher thread; does nothing if it is running."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, name="NetworkInfoWatcher",
+                                        daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stops the watcher thread."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
@@ -0,0 +1,329 @@
+"""
+Network interface counter sampling during transfers.
+
+speedtest-cli computes throughput from the bytes its own requests moved.
+NicCounterSampler reads the byte counters of the active network adapter at
+a high rate (every 50 ms by default) on a background thread while a download
+or upload runs, into a fixed-size NumPy ring buffer. The result then also
+holds what actually crossed the adapter, competing traffic included, as
+total bytes, average Mbps and a per-second throughput curve.
+
+BandwidthMonitor keeps a rolling window of the same counters for the live
+bandwidth panel, sampled by its caller (once a second by default).
+"""
+import time
+import logging
+import threading
+
+from speedtest_app.history_store import nic_fields
+
+logger = logging.getLogger("SpeedTest")
+
+DEFAULT_SAMPLE_INTERVAL = 0.05
+# 8192 samples hold almost 7 minutes at 50 ms, longer than any phase timeout
+DEFAULT_CAPACITY = 8192
+# Samples the live bandwidth panel shows (one minute at one per second)
+DEFAULT_MONITOR_WINDOW = 60
+
+RECEIVED = 0
+SENT = 1
+# Counter read for each direction: a download arrives, an upload leaves
+DIRECTION_COUNTERS = {"download": RECEIVED, "upload": SENT}
+
+
+class CounterRing:
+    """
+    Fixed-size ring buffer of timed counter rows backed by NumPy arrays.
+
+    Appending never allocates; once full, the oldest rows are overwritten.
+
+    Args:
+        capacity: Number of rows kept
+        shape: Shape of one row of counters
+    """
+
+    def __init__(self, capacity, shape):
+        import numpy as np
+
+        self.capacity = capacity
+        self.times = np.empty(capacity, dtype=np.float64)
+        self.values = np.empty((capacity,) + tuple(shape), dtype=np.int64)
+        self.appended = 0
+
+    def __len__(self):
+        return min(self.appended, self.capacity)
+
+    def append(self, timestamp, row):
+        index = self.appended % self.capacity
+        self.times[index] = timestamp
+        self.values[index] = row
+        self.appended += 1
+
+    def snapshot(self):
+        """
+        Returns:
+            tuple: Copies of the times and counter rows, oldest first
+        """
+        if self.appended <= self.capacity:
+            return self.times[:self.appended].copy(), self.values[:self.appended].copy()
+        import numpy as np
+
+        start = self.appended % self.capacity
+        order = np.r_[start:self.capacity, 0:start]
+        return self.times[order], self.values[order]
+
+
+def default_interfaces(counters, active=None):
+    """
+    Names of the interfaces worth sampling: the active adapter only.
+
+    Traffic through a VPN tunnel, a bridge or a container's virtual
+    interface also crosses the physical adapter, so summing every interface
+    would count it twice.
+
+    Args:
+        counters: Per-interface counters, as read_counters returns them
+        active: Name of the active adapter, e.g. from the cached
+            NetworkInfoService; without it (or if it has no counters) the
+            non-loopback interface that received the most is used
+    """
+    if active is not None and active in counters:
+        return [active]
+    candidates = [name for name in counters if not name.startswith("lo")]
+    if not candidates:
+        return []
+    return [max(candidates, key=lambda name: counters[name].bytes_recv)]
+
+
+def read_counters():
+    """Returns the per-interface counters as psutil reports them."""
+    import psutil
+
+    return psutil.net_io_counters(pernic=True)
+
+
+def counter_row(counters, interfaces, previous=None):
+    """
+    Returns the received and sent bytes of each interface as an array row.
+
+    An interface missing from counters keeps its previous value (0 at first).
+    """
+    import numpy as np
+
+    row = previous.copy() if previous is not None else np.zeros(
+        (len(interfaces), 2), dtype=np.int64
+    )
+    for i, name in enumerate(interfaces):
+        if name in counters:
+            row[i] = (counters[name].bytes_recv, counters[name].bytes_sent)
+    return row
+
+
+class NicCounterSampler:
+    """
+    Samples per-interface received and sent byte counters on a background thread.
+
+    Used as a context manager around a transfer phase. The interfaces are
+    fixed when sampling starts; one that disappears keeps its last value.
+
+    Args:
+        interval: Seconds between samples
+        capacity: Samples kept in the ring buffer
+        interfaces: Interface names to sample (default: the active adapter)
+        counters: Callable returning {name: counters with bytes_recv and bytes_sent}
+        active: Name of the active adapter, see default_interfaces
+    """
+
+    def __init__(self, interval=DEFAULT_SAMPLE_INTERVAL, capacity=DEFAULT_CAPACITY, interfaces=None,
+                 counters=read_counters, active=None):
+        self.interval = interval
+        self.interfaces = interfaces
+        self.active = active
+        self._capacity = capacity
+        self._counters = counters
+        self.ring = None
+        # Kept apart from the ring so totals survive the ring wrapping around
+        self.first = None
+        self._last_row = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _read(self):
+        self._last_row = counter_row(self._counters(), self.interfaces, self._last_row)
+        return time.monotonic(), self._last_row
+
+    def _sample(self):
+        timestamp, row = self._read()
+        self.ring.append(timestamp, row)
+        if self.first is None:
+            self.first = (timestamp, row)
+
+    def _run(self):
+        next_sample = time.monotonic()
+        while True:
+            next_sample += self.interval
+            if self._stop.wait(max(0.0, next_sample - time.monotonic())):
+                return
+            try:
+                self._sample()
+            except Exception as e:
+                logger.warning(f"Interface counter sampling failed: {e}")
+                return
+
+    def start(self):
+        try:
+            if self.interfaces is None:
+                self.interfaces = default_interfaces(self._counters(), self.active)
+            self.ring = CounterRing(self._capacity, (len(self.interfaces), 2))
+            self._sample()
+        except Exception as e:
+            logger.warning(f"Could not read interface counters: {e}")
+            self.ring = None
+            return self
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="NicCounterSampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stops sampling after one last sample."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+            try:
+                self._sample()
+            except Exception as e:
+                logger.warning(f"Interface counter sampling failed: {e}")
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+    def totals(self):
+        """
+        Returns:
+            dict: Bytes each interface received and sent since sampling started,
+            as {name: (received, sent)}
+        """
+        if self.ring is None or not len(self.ring):
+            return {}
+        delta = self._last_row - self.first[1]
+        return {name: (int(received), int(sent))
+                for name, (received, sent) in zip(self.interfaces, delta)}
+
+    def summary(self, direction, bucket=1.0):
+        """
+        Summarizes what the interfaces counted in one direction.
+
+        Returns:
+            dict: {direction}_nic_bytes, _mbps (average) and _series
+            (per-second Mbps); empty if fewer than two samples were taken
+        """
+        if self.ring is None or len(self.ring) < 2:
+            return {}
+        import numpy as np
+
+        times, values = self.ring.snapshot()
+        counted = values[:, :, DIRECTION_COUNTERS[direction]].sum(axis=1)
+        if self.ring.appended > self.ring.capacity:
+            # The ring wrapped; the first sample still anchors the totals
+            times = np.insert(times, 0, self.first[0])
+            counted = np.insert(counted, 0, self.first[1][:, DIRECTION_COUNTERS[direction]].sum())
+        return nic_throughput_summary(times, counted, direction, bucket)
+
+
+def nic_throughput_summary(times, counted, direction, bucket=1.0):
+    """
+    Turns sampled cumulative byte counts into totals and a throughput curve.
+
+    Args:
+        times: Sample times in seconds, oldest first
+        counted: Cumulative bytes at each sample time, summed over interfaces
+        bucket: Width of the series buckets in seconds
+
+    Returns:
+        dict: {direction}_nic_bytes, _mbps (average) and _series (Mbps per bucket)
+    """
+    import numpy as np
+
+    fields = nic_fields(direction)
+    offsets = np.asarray(times, dtype=np.float64) - times[0]
+    counted = np.asarray(counted, dtype=np.float64)
+    duration = offsets[-1]
+    total = counted[-1] - counted[0]
+
+    # Cumulative bytes interpolated at the bucket edges; the last bucket may be shorter
+    edges = np.append(np.arange(0.0, duration, bucket), duration)
+    widths = np.diff(edges)
+    transferred = np.diff(np.interp(edges, offsets, counted))
+    rates = transferred * 8 / 1_000_000 / np.where(widths > 0, widths, 1.0)
+
+    return {
+        fields["bytes"]: int(total),
+        fields["mbps"]: round(float(total * 8 / duration / 1_000_000), 3) if duration else 0.0,
+        fields["series"]: [round(float(rate), 3) for rate in rates],
+    }
+
+
+class BandwidthMonitor:
+    """
+    Rolling receive and send rates of a set of interfaces.
+
+    Every sample() writes one counter reading into a CounterRing holding
+    window + 1 readings; rates() turns them into Mbps with one vectorized
+    difference, so a redraw costs a single NumPy pass over the window.
+
+    Args:
+        interfaces: Interface names to monitor
+        window: Number of rates kept
+        counters, clock: Injectable counter source and monotonic time source
+    """
+
+    def __init__(self, interfaces=(), window=DEFAULT_MONITOR_WINDOW, counters=read_counters,
+                 clock=time.monotonic):
+        self.window = window
+        self._counters = counters
+        self._clock = clock
+        # Filled in by reset()
+        self.interfaces = []
+        self.ring = None
+        self._last_row = None
+        self.reset(interfaces)
+
+    def reset(self, interfaces):
+        """Starts over with another set of interfaces."""
+        self.interfaces = list(interfaces)
+        self.ring = CounterRing(self.window + 1, (len(self.interfaces), 2))
+        self._last_row = None
+
+    def sample(self):
+        """Reads the counters once; errors are logged and the sample skipped."""
+        try:
+            self._last_row = counter_row(self._counters(), self.interfaces, self._last_row)
+        except Exception as e:
+            logger.warning(f"Could not read interface counters: {e}")
+            return
+        self.ring.append(self._clock(), self._last_row)
+
+    def rates(self):
+        """
+        Returns:
+            tuple: (ages, rates): seconds between each rate's end and the newest
+            sample, shape (n,), and Mbps of shape (n, interfaces, 2) with
+            received then sent; n is 0 until two samples were taken
+        """
+        import numpy as np
+
+        times, values = self.ring.snapshot()
+        if len(times) < 2:
+            return np.empty(0), np.empty((0, len(self.interfaces), 2))
+        elapsed = np.diff(times)[:, None, None]
+        # A counter that went backwards (interface reset) counts as idle
+        moved = np.clip(np.diff(values, axis=0), 0, None)
+        rates = moved * 8 / np.where(elapsed > 0, elapsed, 1.0) / 1_000_000
+        return times[-1] - times[1:], rates
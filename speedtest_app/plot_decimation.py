@@ -0,0 +1,169 @@
+"""
+Downsampling of history series for plotting.
+
+Drawing every run of a large history makes matplotlib crawl, while the screen
+can only show about one point per pixel anyway. The functions below reduce a
+series to roughly the canvas width, using Largest-Triangle-Three-Buckets
+(keeps the visual shape) or min/max bucketing (keeps every spike).
+"""
+import logging
+import numpy as np
+
+logger = logging.getLogger("SpeedTest")
+
+# Markers are only drawn when few enough points are visible to tell them apart
+MARKER_THRESHOLD = 200
+
+
+def lttb(x, y, n_out):
+    """
+    Downsamples a series with Largest-Triangle-Three-Buckets.
+
+    Returns:
+        numpy.ndarray: Indices of the selected points, in ascending order
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # First and last points are always kept; the rest is split into n_out - 2 buckets
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            next_start, next_end = edges[i + 1], edges[i + 2]
+        else:
+            next_start, next_end = n - 1, n
+        avg_x = x[next_start:next_end].mean()
+        next_y = y[next_start:next_end]
+        finite = next_y[np.isfinite(next_y)]
+        avg_y = finite.mean() if len(finite) else y[a]
+
+        # Twice the triangle area; constant factors do not change the argmax
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        area = np.nan_to_num(area, nan=-1.0)
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+
+    return selected
+
+
+def minmax_decimate(y, n_buckets):
+    """
+    Downsamples a series by keeping the minimum and maximum of each bucket.
+
+    Returns:
+        numpy.ndarray: Indices of the selected points, in ascending order
+    """
+    n = len(y)
+    if n_buckets * 2 >= n or n_buckets < 1:
+        return np.arange(n)
+
+    y = np.asarray(y, dtype=np.float64)
+    edges = np.linspace(0, n, n_buckets + 1).astype(np.int64)
+    selected = []
+    filled = np.where(np.isnan(y), np.inf, y)
+    for start, end in zip(edges[:-1], edges[1:]):
+        if start == end:
+            continue
+        bucket = filled[start:end]
+        selected.append(start + int(np.argmin(bucket)))
+        selected.append(start + int(np.argmax(np.where(np.isinf(bucket), -np.inf, bucket))))
+    return np.unique(np.asarray(selected, dtype=np.int64))
+
+
+def decimate(x, y, n_out, method="lttb"):
+    """Returns the decimated (x, y) pair using the given method."""
+    if method == "minmax":
+        indices = minmax_decimate(y, max(1, n_out // 2))
+    else:
+        indices = lttb(x, y, n_out)
+    return np.asarray(x)[indices], np.asarray(y)[indices]
+
+
+def visible_range(x, xmin, xmax):
+    """Returns the slice of a sorted x array inside [xmin, xmax], plus one point each side."""
+    start = max(int(np.searchsorted(x, xmin, side="left")) - 1, 0)
+    end = min(int(np.searchsorted(x, xmax, side="right")) + 1, len(x))
+    return slice(start, end)
+
+
+class DecimatedLine:
+    """
+    A matplotlib line that only draws a decimated view of its data.
+
+    The full series stays in memory (it is usually a memory map); the drawn
+    points are re-selected whenever the visible x range or the canvas size
+    changes.
+    """
+
+    def __init__(self, ax, x, y, method="lttb", marker=None, **line_kwargs):
+        self.ax = ax
+        self.x = np.asarray(x, dtype=np.float64)
+        self.y = np.asarray(y, dtype=np.float64)
+        self.method = method
+        self.marker = marker
+        self.line, = ax.plot([], [], **line_kwargs)
+
+    def points_for_width(self):
+        """Target point count: about one point per horizontal pixel of the axes."""
+        return max(int(self.ax.bbox.width), 100)
+
+    def update(self):
+        if len(self.x) == 0:
+            return
+        xmin, xmax = self.ax.get_xlim()
+        view = visible_range(self.x, xmin, xmax)
+        x, y = decimate(self.x[view], self.y[view], self.points_for_width(), self.method)
+        self.line.set_data(x, y)
+        self.line.set_marker(self.marker if len(x) <= MARKER_THRESHOLD else "None")
+
+
+def attach_decimation(canvas, lines):
+    """
+    Keeps decimated lines in sync with zoom, pan and resize.
+
+    The lines are grouped by their axes; on every x-limit change of an axes
+    (for example from NavigationToolbar2Tk) its lines are re-decimated at the
+    new resolution.
+    """
+    by_axes = {}
+    for line in lines:
+        by_axes.setdefault(line.ax, []).append(line)
+
+    def redraw_axes(ax):
+        for line in by_axes[ax]:
+            line.update()
+        canvas.draw_idle()
+
+    for ax, ax_lines in by_axes.items():
+        if any(len(line.x) for line in ax_lines):
+            xmin = min(line.x[0] for line in ax_lines if len(line.x))
+            xmax = max(line.x[-1] for line in ax_lines if len(line.x))
+            if xmin == xmax:
+                xmin, xmax = xmin - 1, xmax + 1
+            ax.set_xlim(xmin, xmax)
+            ymin = min(np.nanmin(line.y) for line in ax_lines if len(line.y))
+            ymax = max(np.nanmax(line.y) for line in ax_lines if len(line.y))
+            if np.isfinite(ymin) and np.isfinite(ymax):
+                margin = (ymax - ymin) * 0.05 or 1.0
+                ax.set_ylim(ymin - margin, ymax + margin)
+        for line in ax_lines:
+            line.update()
+        ax.callbacks.connect("xlim_changed", redraw_axes)
+
+    def on_resize(_event):
+        for ax in by_axes:
+            redraw_axes(ax)
+
+    canvas.mpl_connect("resize_event", on_resize)
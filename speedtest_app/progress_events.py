@@ -0,0 +1,219 @@
+"""
+Progress events published by SpeedTestService while a test runs.
+
+The worker thread puts typed events on a thread-safe queue: phase changes,
+periodic transfer progress with bytes moved and instantaneous throughput,
+and the final result. The GUI drains the queue in batches on the Tk thread.
+Transferred bytes are counted by wrapping speedtest-cli's URL opener, so
+progress is reported while long requests are still streaming.
+"""
+import time
+import queue
+import logging
+import threading
+from collections.abc import Mapping
+from dataclasses import dataclass
+
+logger = logging.getLogger("SpeedTest")
+
+PHASE_SERVER = "server"
+PHASE_LATENCY = "latency"
+PHASE_DOWNLOAD = "download"
+PHASE_UPLOAD = "upload"
+
+# How often transfer progress is published during a measurement
+PROGRESS_INTERVAL = 0.25
+
+
+@dataclass(frozen=True)
+class PhaseChanged:
+    """The test entered a new phase."""
+    phase: str
+    message: str
+
+
+@dataclass(frozen=True)
+class TransferProgress:
+    """Bytes moved so far in a download or upload phase."""
+    phase: str
+    bytes_transferred: int
+    throughput: float  # bits per second over the last interval
+    fraction: float    # 0.0 - 1.0 of the phase
+
+
+@dataclass(frozen=True)
+class SpeedTestFinished:
+    """The test ended; result is the SpeedTestResult run_speedtest's future returns."""
+    result: Mapping
+
+
+def publish(sink, event):
+    """Puts an event on the sink queue, if there is one."""
+    if sink is not None:
+        sink.put(event)
+
+
+class EventFanout:
+    """A sink forwarding every event to several sinks (queues or observers)."""
+
+    def __init__(self, sinks):
+        self.sinks = [sink for sink in sinks if sink is not None]
+
+    def put(self, event):
+        for sink in self.sinks:
+            try:
+                sink.put(event)
+            except Exception as e:
+                # An observer must not break the test it is watching
+                logger.warning(f"Progress event sink failed: {e}")
+
+
+def drain_events(event_queue, max_events=500):
+    """
+    Takes up to max_events queued events without blocking.
+
+    Runs of consecutive TransferProgress events for the same phase are
+    collapsed to the newest one, so a slow consumer only renders the latest
+    state.
+
+    Returns:
+        list: The events, oldest first
+    """
+    events = []
+    for _ in range(max_events):
+        try:
+            event = event_queue.get_nowait()
+        except queue.Empty:
+            break
+        if (isinstance(event, TransferProgress) and events
+                and isinstance(events[-1], TransferProgress)
+                and events[-1].phase == event.phase):
+            events[-1] = event
+        else:
+            events.append(event)
+    return events
+
+
+class TransferMeter:
+    """Thread-safe counter of bytes moved by the downloader and uploader threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._total = 0
+
+    def add(self, count):
+        with self._lock:
+            self._total += count
+
+    @property
+    def total(self):
+        with self._lock:
+            return self._total
+
+
+class _MeteredResponse:
+    def __init__(self, response, meter):
+        self._response = response
+        self._meter = meter
+
+    def read(self, *args):
+        chunk = self._response.read(*args)
+        self._meter.add(len(chunk))
+        return chunk
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
+
+
+class MeteredOpener:
+    """
+    Wraps a urllib OpenerDirector and counts request and response bodies.
+
+    Upload bodies are file-like objects that urllib reads in chunks, so their
+    read method is wrapped before the request is sent.
+    """
+
+    def __init__(self, opener, meter):
+        self._opener = opener
+        self.meter = meter
+
+    def open(self, request, *args, **kwargs):
+        data = getattr(request, "data", None)
+        if data is not None and hasattr(data, "read"):
+            read = data.read
+            meter = self.meter
+
+            def metered_read(*read_args):
+                chunk = read(*read_args)
+                meter.add(len(chunk))
+                return chunk
+
+            data.read = metered_read
+            return self._opener.open(request, *args, **kwargs)
+        return _MeteredResponse(self._opener.open(request, *args, **kwargs), self.meter)
+
+    def __getattr__(self, name):
+        return getattr(self._opener, name)
+
+
+class ProgressReporter:
+    """
+    Publishes TransferProgress for one phase from a background thread.
+
+    Pass callback to speedtest-cli's download/upload so finished requests
+    count towards the phase fraction alongside elapsed time.
+    """
+
+    def __init__(self, meter, sink, phase, duration, interval=PROGRESS_INTERVAL):
+        self.meter = meter
+        self.sink = sink
+        self.phase = phase
+        self.duration = duration
+        self.interval = interval
+        self._finished_requests = 0
+        self._request_count = 0
+        # Set when the phase starts (__enter__)
+        self._baseline = 0
+        self._started = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._report, daemon=True)
+
+    def callback(self, i, request_count, start=False, end=False):
+        self._request_count = request_count
+        if end:
+            self._finished_requests += 1
+
+    def __enter__(self):
+        self._baseline = self.meter.total
+        self._started = time.monotonic()
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stop.set()
+        self._thread.join()
+        if exc_type is None:
+            # The closing event carries the average throughput of the phase
+            transferred = self.meter.total - self._baseline
+            elapsed = time.monotonic() - self._started
+            average = transferred * 8 / elapsed if elapsed > 0 else 0.0
+            publish(self.sink, TransferProgress(self.phase, transferred, average, 1.0))
+        return False
+
+    def _fraction(self, now):
+        by_time = (now - self._started) / self.duration if self.duration else 0.0
+        by_requests = (self._finished_requests / self._request_count
+                       if self._request_count else 0.0)
+        return min(1.0, max(by_time, by_requests))
+
+    def _report(self):
+        last_bytes, last_time = self._baseline, self._started
+        while not self._stop.wait(self.interval):
+            now = time.monotonic()
+            total = self.meter.total
+            elapsed = now - last_time
+            throughput = (total - last_bytes) * 8 / elapsed if elapsed > 0 else 0.0
+            publish(self.sink, TransferProgress(
+                self.phase, total - self._baseline, throughput, self._fraction(now)
+            ))
+            last_bytes, last_time = total, now
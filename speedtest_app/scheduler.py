@@ -0,0 +1,247 @@
+"""
+Periodic unattended speed tests.
+
+SpeedTestScheduler runs tests through SpeedTestService at a configurable
+interval plus random jitter, backs off exponentially after failures, skips
+runs while other traffic saturates the link or another test is running, and
+keeps its state in the user data directory so a restart continues the
+schedule instead of testing immediately. It works the same from the GUI
+and from the headless CLI.
+"""
+import os
+import json
+import time
+import random
+import logging
+import threading
+from speedtest_app.nic_sampler import default_interfaces, read_counters
+from speedtest_app.speedtest_service import SpeedTestBusy
+from speedtest_app.utils import SCHEDULER_DEFAULTS, ensure_user_data_dir
+
+logger = logging.getLogger("SpeedTest")
+
+# Retry delays (seconds) when a run is skipped instead of attempted
+BUSY_RETRY_SECONDS = 60
+SATURATED_RETRY_SECONDS = 300
+
+# The scheduler thread wakes at least this often so setting changes apply
+MAX_SLEEP_SECONDS = 60
+
+
+def link_usage_mbps(window=2.0, interface=None):
+    """
+    Measures current traffic on the active network adapter.
+
+    Only one interface is counted, as in nic_sampler.default_interfaces:
+    VPN tunnels, bridges and container interfaces carry traffic that also
+    crosses the physical adapter.
+
+    Args:
+        window: Seconds to measure over
+        interface: Name of the active adapter (default: the non-loopback
+            interface that received the most)
+
+    Returns:
+        float: Received plus sent Mbps over window seconds, None if unavailable
+    """
+    try:
+        before = read_counters()
+        names = default_interfaces(before, interface)
+        time.sleep(window)
+        after = read_counters()
+        moved = sum(
+            after[name].bytes_recv + after[name].bytes_sent
+            - before[name].bytes_recv - before[name].bytes_sent
+            for name in names if name in after
+        )
+        return moved * 8 / window / 1_000_000
+    except Exception as e:
+        logger.warning(f"Could not read network counters: {e}")
+        return None
+
+
+class SpeedTestScheduler:
+    """
+    Runs speed tests periodically on a background thread.
+
+    Args:
+        service: SpeedTestService running the tests
+        settings: Settings dict read at every check (scheduler_* keys)
+        store: History store successful results are appended to, or None
+        state_path: JSON file holding the schedule (default: user data dir)
+        on_result: Called from the scheduler thread with each result dict
+        clock, link_usage, rng: Injectable time source, traffic probe and
+            random generator
+    """
+
+    def __init__(self, service, settings=None, store=None, state_path=None, on_result=None,
+                 clock=time.time, link_usage=link_usage_mbps, rng=None):
+        self.service = service
+        self.settings = settings if settings is not None else {}
+        self.store = store
+        self._state_path = state_path
+        self.on_result = on_result
+        self._clock = clock
+        self._link_usage = link_usage
+        self._rng = rng or random.Random()
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.state = self._load_state()
+
+    @property
+    def state_path(self):
+        if self._state_path is None:
+            self._state_path = os.path.join(ensure_user_data_dir(), "scheduler_state.json")
+        return self._state_path
+
+    def _setting(self, key):
+        return self.settings.get(key, SCHEDULER_DEFAULTS[key])
+
+    def _load_state(self):
+        state = {"next_run": None, "failures": 0, "last_run": None, "last_status": None,
+                 "runs": 0, "failed_runs": 0, "skipped_runs": 0}
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as file:
+                state.update(json.load(file))
+        except (OSError, json.JSONDecodeError):
+            pass
+        return state
+
+    def _save_state(self):
+        tmp_path = self.state_path + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as file:
+                json.dump(self.state, file)
+            os.replace(tmp_path, self.state_path)
+        except OSError as e:
+            logger.warning(f"Could not save scheduler state: {e}")
+
+    def _next_delay(self):
+        interval = self._setting("scheduler_interval")
+        failures = self.state["failures"]
+        if failures:
+            # Exponential backoff, so an offline machine is not probed every interval
+            return min(interval * 2 ** failures, self._setting("scheduler_max_backoff"))
+        return interval + self._rng.uniform(0, self._setting("scheduler_jitter"))
+
+    def _defer(self, now, delay, status):
+        self.state.update(next_run=now + delay, last_status=status,
+                          skipped_runs=self.state["skipped_runs"] + 1)
+        self._save_state()
+        logger.info(f"Scheduled test skipped ({status}), retrying in {delay:.0f} s")
+        return delay
+
+    def tick(self):
+        """
+        Runs a test if one is due.
+
+        Returns:
+            float: Seconds until the next check
+        """
+        with self._lock:
+            now = self._clock()
+            next_run = self.state["next_run"]
+            if next_run is not None and now < next_run:
+                return next_run - now
+
+            # Saves measuring the link while a test runs; run_speedtest has the final say
+            if self.service.is_busy():
+                return self._defer(now, BUSY_RETRY_SECONDS, "busy")
+
+            threshold = self._setting("scheduler_saturation_mbps")
+            if threshold:
+                usage = self._link_usage(self._setting("scheduler_saturation_window"),
+                                         self.service.active_interface())
+                if usage is not None and usage > threshold:
+                    return self._defer(now, SATURATED_RETRY_SECONDS, "saturated")
+
+            try:
+                # A single test at a time, whether started here or from the GUI
+                future = self.service.run_speedtest()
+            except SpeedTestBusy:
+                return self._defer(now, BUSY_RETRY_SECONDS, "busy")
+            result = future.result()
+            self._record(self._clock(), result)
+            return self.state["next_run"] - self._clock()
+
+    def _record(self, now, result):
+        if result.get("cancelled"):
+            # Stopped on purpose; not a reason to back off
+            self.state.update(last_status="cancelled", next_run=now + self._next_delay())
+            self._save_state()
+            return
+        failed = "error" in result
+        self.state["runs"] += 1
+        self.state["last_run"] = now
+        if failed:
+            self.state["failures"] += 1
+            self.state["failed_runs"] += 1
+            self.state["last_status"] = "failed"
+            logger.warning(f"Scheduled test failed: {result['error']}")
+        else:
+            self.state["failures"] = 0
+            self.state["last_status"] = "ok"
+            if result.get("partial"):
+                # A phase cut off by its timeout would skew the history's statistics
+                logger.warning(f"Partial scheduled result not saved: {result['timed_out']} timed out")
+            elif self.store is not None:
+                # Loads NumPy for the columnar cache, so only when a run is saved
+                from speedtest_app.history_cache import append_to_history
+                try:
+                    append_to_history(self.store, result.history_record())
+                except Exception as e:
+                    logger.error(f"Error saving scheduled test results: {e}", exc_info=True)
+        self.state["next_run"] = now + self._next_delay()
+        self._save_state()
+        if self.on_result is not None:
+            self.on_result(result)
+
+    def _loop(self, stop):
+        while not stop.is_set():
+            try:
+                delay = self.tick()
+            except Exception as e:
+                logger.error(f"Scheduler error: {e}", exc_info=True)
+                delay = BUSY_RETRY_SECONDS
+            stop.wait(max(1.0, min(delay, MAX_SLEEP_SECONDS)))
+
+    def start(self):
+        """Starts the scheduler thread; does nothing if it is running."""
+        if self.is_running():
+            return
+        # Each thread watches its own event, so a thread that is still winding
+        # down after stop(wait=False) cannot be revived by this start
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, args=(self._stop,),
+                                        name="SpeedTestScheduler", daemon=True)
+        self._thread.start()
+        logger.info("Scheduler started")
+
+    def stop(self, cancel_running=True, wait=True):
+        """
+        Stops the scheduler thread, cancelling a scheduled test in progress.
+
+        Args:
+            wait: Wait (up to 5 s) for the thread to end; the Tk thread passes
+                False so it does not block while a cancelled test winds down
+        """
+        self._stop.set()
+        if cancel_running and self._lock.locked():
+            self.service.cancel()
+        if self._thread is not None:
+            if wait:
+                self._thread.join(timeout=5)
+            self._thread = None
+            logger.info("Scheduler stopped")
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def run_forever(self):
+        """Runs the schedule on the calling thread until stop() or Ctrl-C."""
+        self._stop = threading.Event()
+        try:
+            self._loop(self._stop)
+        finally:
+            self._stop.set()
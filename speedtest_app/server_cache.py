@@ -0,0 +1,165 @@
+"""
+On-disk cache of the speedtest.net configuration and server list.
+
+Building a speedtest-cli client downloads the configuration and the full
+server list and then pings candidate servers, which costs several seconds
+before any measuring starts. The cache keeps the configuration, the server
+list and the last best server in the user data directory, valid for a TTL
+and only while the machine stays on the same network.
+"""
+import os
+import copy
+import json
+import time
+import hashlib
+import logging
+import socket
+from speedtest_app.utils import ensure_user_data_dir
+
+logger = logging.getLogger("SpeedTest")
+
+DEFAULT_TTL_SECONDS = 6 * 60 * 60
+
+# speedtest-cli records 3600 s per failed latency probe
+UNREACHABLE_LATENCY = 3600
+
+
+def network_fingerprint():
+    """
+    Returns a hash of the interfaces that are up and their IPv4 addresses.
+
+    A different value means the machine changed networks, so cached server
+    choices (picked by location and latency) no longer apply.
+    """
+    try:
+        import psutil
+        stats = psutil.net_if_stats()
+        addresses = []
+        for name, interface_addresses in sorted(psutil.net_if_addrs().items()):
+            if name in stats and not stats[name].isup:
+                continue
+            for address in interface_addresses:
+                if address.family == socket.AF_INET and not address.address.startswith("127."):
+                    addresses.append(f"{name}={address.address}/{address.netmask}")
+        return hashlib.sha1("|".join(addresses).encode("utf-8")).hexdigest()
+    except Exception as e:
+        logger.warning(f"Could not compute network fingerprint: {e}")
+        return None
+
+
+class ServerCache:
+    """JSON file holding speedtest config, server list and the last best server."""
+
+    def __init__(self, path=None, ttl=DEFAULT_TTL_SECONDS, fingerprint=network_fingerprint):
+        self._path = path
+        self.ttl = ttl
+        self._fingerprint = fingerprint
+
+    @property
+    def path(self):
+        if self._path is None:
+            self._path = os.path.join(ensure_user_data_dir(), "server_cache.json")
+        return self._path
+
+    def load(self):
+        """
+        Returns the cached entry, or None if it is missing, expired or was
+        recorded on another network.
+        """
+        try:
+            with open(self.path, "r", encoding="utf-8") as file:
+                entry = json.load(file)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+        age = time.time() - entry.get("created", 0)
+        if age > self.ttl or age < 0:
+            logger.info("Server cache expired")
+            return None
+        if entry.get("network") != self._fingerprint():
+            logger.info("Network changed, ignoring server cache")
+            return None
+        return entry
+
+    def save(self, config, lat_lon, servers, best=None):
+        """Stores the config, the server list and the best server atomically."""
+        self._write({
+            "created": time.time(),
+            "network": self._fingerprint(),
+            "config": config,
+            "lat_lon": list(lat_lon),
+            "servers": servers,
+            "best": best,
+        })
+
+    def update_best(self, best):
+        """Replaces the best server of the current entry, keeping its age."""
+        entry = self.load()
+        if entry is not None:
+            entry["best"] = best
+            self._write(entry)
+
+    def _write(self, entry):
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as file:
+                json.dump(entry, file)
+            os.replace(tmp_path, self.path)
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning(f"Could not write server cache: {e}")
+
+    def invalidate(self):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+def flatten_servers(servers):
+    """Turns speedtest-cli's {distance: [server, ...]} mapping into a list."""
+    return [server for distance in sorted(servers) for server in servers[distance]]
+
+
+def group_servers(servers):
+    """Turns a list of servers back into speedtest-cli's distance mapping."""
+    grouped = {}
+    for server in servers:
+        grouped.setdefault(server["d"], []).append(server)
+    return grouped
+
+
+def cached_speedtest_class(speedtest_module):
+    """
+    Returns a speedtest-cli Speedtest subclass that can start from a cache entry.
+
+    With an entry, the configuration and server list come from the cache and
+    nothing is downloaded until the measurement itself. With base_url, the
+    configuration and server list are fetched from that server instead of
+    speedtest.net (see local_server).
+    """
+
+    class CachedSpeedtest(speedtest_module.Speedtest):
+        def __init__(self, cache_entry=None, base_url=None, **kwargs):
+            self._cache_entry = cache_entry
+            self._base_url = base_url
+            self._redirected = False
+            # Set by Speedtest.__init__ and get_config, which the base __init__ calls
+            self._opener = None
+            self.lat_lon = None
+            super().__init__(**kwargs)
+            if cache_entry is not None:
+                self.servers = group_servers(copy.deepcopy(cache_entry["servers"]))
+
+        def get_config(self):
+            if self._base_url and not self._redirected:
+                from speedtest_app.local_server import RedirectingOpener
+                self._opener = RedirectingOpener(self._opener, self._base_url)
+                self._redirected = True
+            if self._cache_entry is None:
+                return super().get_config()
+            # Deep copies keep engine settings from leaking into the cache
+            self.config.update(copy.deepcopy(self._cache_entry["config"]))
+            self.lat_lon = tuple(self._cache_entry["lat_lon"])
+            return self.config
+
+    return CachedSpeedtest
@@ -0,0 +1,150 @@
+"""
+Concurrent latency probing for best-server selection.
+
+speedtest-cli's get_best_server pings candidate servers one after another.
+This module probes the closest candidates at the same time with asyncio,
+either with HTTP requests for latency.txt over one keep-alive connection
+(what speedtest.net servers answer) or with plain TCP connects, and stops
+waiting for slow servers at a deadline.
+"""
+import ssl
+import time
+import asyncio
+import logging
+import posixpath
+import statistics
+from urllib.parse import urlsplit
+
+logger = logging.getLogger("SpeedTest")
+
+DEFAULT_TOP_K = 5
+DEFAULT_SAMPLES = 4
+DEFAULT_DEADLINE = 2.0
+
+
+def latency_target(server):
+    """Returns (scheme, host, port, path) of a server's latency.txt."""
+    parts = urlsplit(server["url"])
+    port = parts.port or (443 if parts.scheme == "https" else 80)
+    path = posixpath.join(posixpath.dirname(parts.path) or "/", "latency.txt")
+    return parts.scheme, parts.hostname, port, path
+
+
+def jitter(samples):
+    """Mean absolute difference between consecutive samples."""
+    if len(samples) < 2:
+        return 0.0
+    return statistics.mean(abs(b - a) for a, b in zip(samples, samples[1:]))
+
+
+async def read_http_response(reader):
+    status_line = await reader.readline()
+    if not status_line.startswith(b"HTTP/"):
+        raise ConnectionError("Invalid HTTP response")
+    status = int(status_line.split()[1])
+    content_length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.strip().lower() == "content-length":
+            content_length = int(value.strip())
+    body = await reader.readexactly(content_length) if content_length else b""
+    return status, body
+
+
+async def _http_samples(server, samples, timeout):
+    scheme, host, port, path = latency_target(server)
+    context = ssl.create_default_context() if scheme == "https" else None
+    reader, writer = await asyncio.wait_for(
+        asyncio.open_connection(host, port, ssl=context), timeout
+    )
+    results = []
+    try:
+        for i in range(samples):
+            request = (
+                f"GET {path}?x={int(time.time() * 1000)}.{i} HTTP/1.1\r\n"
+                f"Host: {host}\r\nConnection: keep-alive\r\nCache-Control: no-cache\r\n\r\n"
+            )
+            start = time.perf_counter()
+            writer.write(request.encode("ascii"))
+            await writer.drain()
+            status, body = await asyncio.wait_for(read_http_response(reader), timeout)
+            elapsed = (time.perf_counter() - start) * 1000
+            if status == 200 and body.startswith(b"test=test"):
+                results.append(elapsed)
+    finally:
+        writer.close()
+    return results
+
+
+async def _tcp_samples(server, samples, timeout):
+    _, host, port, _ = latency_target(server)
+    results = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        try:
+            _, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+        except (OSError, asyncio.TimeoutError):
+            continue
+        results.append((time.perf_counter() - start) * 1000)
+        writer.close()
+    return results
+
+
+async def probe_server(server, samples=DEFAULT_SAMPLES, timeout=1.0, method="http"):
+    """
+    Measures the latency of one server.
+
+    Returns:
+        dict: server, samples (ms), median, jitter and lost sample count
+    """
+    probe = _http_samples if method == "http" else _tcp_samples
+    try:
+        results = await probe(server, samples, timeout)
+    except (OSError, ValueError, ConnectionError, asyncio.TimeoutError,
+            asyncio.IncompleteReadError) as e:
+        logger.debug(f"Latency probe of {server.get('url')} failed: {e}")
+        results = []
+    return {
+        "server": server,
+        "samples": results,
+        "median": statistics.median(results) if results else None,
+        "jitter": jitter(results),
+        "lost": samples - len(results),
+    }
+
+
+async def probe_servers(servers, samples=DEFAULT_SAMPLES, deadline=DEFAULT_DEADLINE,
+                        method="http"):
+    """
+    Probes all servers concurrently and ranks them.
+
+    Servers that have not finished when the deadline passes, or that answered
+    no probe at all, are left out.
+
+    Returns:
+        list: Probe results sorted by median latency, then jitter
+    """
+    if not servers:
+        return []
+    tasks = [
+        asyncio.ensure_future(probe_server(server, samples, timeout=deadline, method=method))
+        for server in servers
+    ]
+    done, pending = await asyncio.wait(tasks, timeout=deadline)
+    for task in pending:
+        task.cancel()
+    if pending:
+        await asyncio.gather(*pending, return_exceptions=True)
+        logger.info(f"{len(pending)} servers missed the {deadline:.1f} s probe deadline")
+
+    ranked = [task.result() for task in done if task.result()["median"] is not None]
+    ranked.sort(key=lambda result: (result["median"], result["jitter"], result["lost"]))
+    return ranked
+
+
+def rank_servers(servers, samples=DEFAULT_SAMPLES, deadline=DEFAULT_DEADLINE, method="http"):
+    """Blocking wrapper around probe_servers for worker threads."""
+    return asyncio.run(probe_servers(servers, samples, deadline, method))
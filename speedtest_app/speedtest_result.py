@@ -0,0 +1,90 @@
+"""
+Speed test result record for macOS_application_speedtest_for_python.
+
+SpeedTestService returns one SpeedTestResult per run. It keeps every field in
+a __slots__ attribute instead of a per-instance dict and reads like the
+result dicts it replaces: result["download"], result.get("error") and
+"partial" in result work as before, with fields that were not measured
+(None) left out of the mapping.
+"""
+import time
+from collections.abc import Mapping
+from datetime import datetime
+from speedtest_app.history_store import OPTIONAL_FIELDS, TIMESTAMP_FORMAT, make_record
+
+# Every field a result can hold, in the order the mapping lists them
+RESULT_FIELDS = (
+    ("download", "upload", "ping", "download_streams", "upload_streams")
+    + OPTIONAL_FIELDS
+    + ("partial", "timed_out", "error", "cancelled")
+)
+
+
+class SpeedTestResult(Mapping):
+    """
+    Read-only result of one speed test run.
+
+    Args:
+        timestamp: Epoch seconds the run finished (default: now); an
+            attribute only, not part of the mapping
+        **fields: Any of RESULT_FIELDS (download and upload in Mbps, ping and
+            latency in ms)
+    """
+
+    __slots__ = RESULT_FIELDS + ("timestamp",)
+
+    def __init__(self, timestamp=None, **fields):
+        unknown = set(fields).difference(RESULT_FIELDS)
+        if unknown:
+            raise TypeError(f"Unknown result fields: {', '.join(sorted(unknown))}")
+        for name in RESULT_FIELDS:
+            object.__setattr__(self, name, fields.get(name))
+        object.__setattr__(self, "timestamp", time.time() if timestamp is None else timestamp)
+
+    @classmethod
+    def from_dict(cls, data, **fields):
+        """Builds a result from a mapping, ignoring keys that are not result fields."""
+        values = {name: data[name] for name in RESULT_FIELDS if name in data}
+        values.update(fields)
+        return cls(**values)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is read-only")
+
+    def __getitem__(self, name):
+        value = getattr(self, name, None) if name in RESULT_FIELDS else None
+        if value is None:
+            raise KeyError(name)
+        return value
+
+    def __iter__(self):
+        return (name for name in RESULT_FIELDS if getattr(self, name) is not None)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={value!r}" for name, value in self.items())
+        return f"{type(self).__name__}({fields})"
+
+    def __reduce__(self):
+        return (_restore, (self.timestamp, dict(self)))
+
+    @property
+    def succeeded(self):
+        """True if the run finished with download, upload and ping measured."""
+        return self.error is None and not self.cancelled and self.download is not None
+
+    def to_dict(self):
+        """Returns the measured fields as a plain dict."""
+        return dict(self)
+
+    def history_record(self):
+        """Returns the history record of this run, timestamped when it finished."""
+        timestamp = datetime.fromtimestamp(self.timestamp).strftime(TIMESTAMP_FORMAT)
+        return make_record(self.download, self.upload, self.ping,
+                           timestamp=timestamp, latency=self)
+
+
+def _restore(timestamp, fields):
+    return SpeedTestResult(timestamp, **fields)
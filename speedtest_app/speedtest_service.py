@@ -1,32 +1,546 @@
-import speedtest as st
+import copy
+import time
 import logging
+import threading
 from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from speedtest_app.latency import (
+    DEFAULT_INTERVAL,
+    DEFAULT_LOADED_INTERVAL,
+    DEFAULT_PROBES,
+    MODE_PACED,
+    LoadedLatencySampler,
+    loaded_latency_summary,
+    measure_latency
+)
+from speedtest_app.nic_sampler import DEFAULT_SAMPLE_INTERVAL, NicCounterSampler
+from speedtest_app.progress_events import (
+    PHASE_DOWNLOAD,
+    PHASE_LATENCY,
+    PHASE_SERVER,
+    PHASE_UPLOAD,
+    EventFanout,
+    MeteredOpener,
+    PhaseChanged,
+    ProgressReporter,
+    SpeedTestFinished,
+    TransferMeter,
+    publish
+)
+from speedtest_app.server_cache import (
+    DEFAULT_TTL_SECONDS,
+    UNREACHABLE_LATENCY,
+    ServerCache,
+    cached_speedtest_class,
+    flatten_servers
+)
+from speedtest_app.server_selection import DEFAULT_TOP_K, rank_servers
+from speedtest_app.speedtest_result import SpeedTestResult
+from speedtest_app.utils import ENGINE_DEFAULTS
 
 logger = logging.getLogger("SpeedTest")
 
-class SpeedTestService:
+# Auto-scaling probes each stream count briefly and stops once doubling the
+# streams improves throughput by less than this fraction
+AUTO_SCALE_PROBE_SECONDS = 3
+AUTO_SCALE_MIN_GAIN = 0.05
+
+# Settings holding the timeout of each phase in seconds (0 or None: no limit)
+PHASE_TIMEOUT_SETTINGS = {
+    PHASE_SERVER: "timeout_server_discovery",
+    PHASE_LATENCY: "timeout_latency",
+    PHASE_DOWNLOAD: "timeout_download",
+    PHASE_UPLOAD: "timeout_upload",
+}
+
+
+class SpeedTestCancelled(Exception):
+    """Raised inside a run after SpeedTestService.cancel was called."""
+
+
+class SpeedTestBusy(Exception):
+    """Raised by run_speedtest while another test is running."""
+
+
+class PhaseTimeout(Exception):
+    """Raised when a phase that cannot be stopped early runs past its timeout."""
+
+
+class ShutdownEvent(threading.Event):
+    """threading.Event with the isSet alias speedtest-cli still calls."""
+
+    def isSet(self):
+        return self.is_set()
+
+
+class CancelToken:
+    """
+    Cancellation state of one run.
+
+    shutdown is handed to speedtest-cli, whose transfer threads stop when it
+    is set; it is also set briefly by phase timeouts. cancelled is only set by
+    an explicit cancel.
+    """
+
     def __init__(self):
+        self.cancelled = threading.Event()
+        self.shutdown = ShutdownEvent()
+
+    def cancel(self):
+        self.cancelled.set()
+        self.shutdown.set()
+
+    def check(self):
+        if self.cancelled.is_set():
+            raise SpeedTestCancelled()
+
+
+class PhaseWatchdog:
+    """Stops a measuring phase through the shutdown event once it runs too long."""
+
+    def __init__(self, token, timeout):
+        self.token = token
+        self.timeout = timeout
+        self.expired = False
+        self._timer = None
+
+    def _expire(self):
+        self.expired = True
+        self.token.shutdown.set()
+
+    def __enter__(self):
+        if self.timeout:
+            self._timer = threading.Timer(self.timeout, self._expire)
+            self._timer.daemon = True
+            self._timer.start()
+        return self
+
+    def release(self):
+        """Clears the shutdown this watchdog set, unless the run was cancelled."""
+        if self.expired and not self.token.cancelled.is_set():
+            self.token.shutdown.clear()
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._timer is not None:
+            self._timer.cancel()
+        # Only this phase was cut short; the next one runs normally
+        self.release()
+        return False
+
+
+def run_with_timeout(func, timeout, token, poll_interval=0.1):
+    """
+    Runs func on a daemon thread and waits for it.
+
+    For blocking calls that ignore the shutdown event (configuration, server
+    list and latency requests): on timeout or cancel the thread is abandoned,
+    so the service's worker is free for the next test.
+
+    Raises:
+        PhaseTimeout: If func did not return within timeout seconds
+        SpeedTestCancelled: If the run was cancelled while waiting
+    """
+    outcome = {}
+
+    def target():
+        try:
+            outcome["result"] = func()
+        except BaseException as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + timeout if timeout else None
+    while thread.is_alive():
+        token.check()
+        wait = poll_interval
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise PhaseTimeout(f"timed out after {timeout} s")
+            wait = min(wait, remaining)
+        thread.join(wait)
+    if "error" in outcome:
+        raise outcome["error"]
+    return outcome["result"]
+
+
+def engine_settings(settings):
+    """Returns the engine settings from the app settings, with defaults filled in."""
+    settings = settings or {}
+    return {key: settings.get(key, default) for key, default in ENGINE_DEFAULTS.items()}
+
+
+def apply_engine_settings(config, engine):
+    """
+    Applies request sizes, request counts and test duration to a speedtest-cli
+    configuration dict in place.
+    """
+    if engine["engine_download_sizes"]:
+        config["sizes"]["download"] = list(engine["engine_download_sizes"])
+    if engine["engine_upload_sizes"]:
+        config["sizes"]["upload"] = list(engine["engine_upload_sizes"])
+    if engine["engine_requests_per_size"]:
+        config["counts"]["download"] = engine["engine_requests_per_size"]
+        config["counts"]["upload"] = engine["engine_requests_per_size"]
+    if engine["engine_test_duration"]:
+        config["length"]["download"] = engine["engine_test_duration"]
+        config["length"]["upload"] = engine["engine_test_duration"]
+    # speedtest-cli only issues upload_max upload requests
+    config["upload_max"] = config["counts"]["upload"] * len(config["sizes"]["upload"])
+
+
+def measure(speedtest, direction, streams=None, callback=None):
+    """Runs one download or upload measurement and returns bits per second."""
+    kwargs = {"threads": streams}
+    if callback is not None:
+        kwargs["callback"] = callback
+    if direction == "download":
+        return speedtest.download(**kwargs)
+    return speedtest.upload(**kwargs)
+
+
+def auto_scale_streams(speedtest, direction, max_streams, start_streams=None):
+    """
+    Finds the stream count that saturates the link.
+
+    Starting from start_streams (or the server's default), the stream count is
+    doubled with short probe measurements until throughput stops increasing
+    noticeably.
+
+    Returns:
+        int: The best stream count found
+    """
+    config = speedtest.config
+    full_length = config["length"][direction]
+    config["length"][direction] = min(full_length, AUTO_SCALE_PROBE_SECONDS)
+    streams = max(1, min(start_streams or config["threads"][direction], max_streams))
+    best_streams, best_rate = streams, 0.0
+    try:
+        while True:
+            rate = measure(speedtest, direction, streams)
+            logger.info(f"Auto-scale {direction}: {streams} streams -> {rate / 1_000_000:.1f} Mbps")
+            if rate <= best_rate * (1 + AUTO_SCALE_MIN_GAIN):
+                break
+            best_streams, best_rate = streams, rate
+            if streams >= max_streams:
+                break
+            streams = min(streams * 2, max_streams)
+    finally:
+        config["length"][direction] = full_length
+    return best_streams
+
+
+class SpeedTestService:
+    def __init__(self, settings=None, server_cache=None, network_info=None):
         self.executor = ThreadPoolExecutor(max_workers=1)
+        # Usually the app settings dict, so changes apply to the next test
+        self.settings = settings if settings is not None else {}
+        self.server_cache = server_cache if server_cache is not None else ServerCache()
+        # Cached NetworkInfoService naming the active adapter, if the caller has one
+        self.network_info = network_info
+        self._tokens = set()
+        self._tokens_lock = threading.Lock()
+        self._listeners = []
 
-    def run_speedtest(self):
+    def run_speedtest(self, events=None):
         """
         Runs the speedtest in a separate thread and returns download, upload, and ping (in Mbps, ms).
+
+        The future resolves to a SpeedTestResult.
+
+        Args:
+            events: Optional queue.Queue receiving progress_events while the test runs
+
+        Raises:
+            SpeedTestBusy: If a test is already running; the GUI and the
+                scheduler may both try to start one
         """
-        future = self.executor.submit(self._run)
+        token = CancelToken()
+        with self._tokens_lock:
+            if self._tokens:
+                raise SpeedTestBusy("A speed test is already running")
+            self._tokens.add(token)
+        future = self.executor.submit(self._run, events, token)
         return future
 
-    def _run(self):
+    def add_listener(self, sink):
+        """
+        Registers a sink (anything with put(event)) that receives the progress
+        events of every test, whoever started it.
+        """
+        self._listeners.append(sink)
+
+    def remove_listener(self, sink):
+        if sink in self._listeners:
+            self._listeners.remove(sink)
+
+    def is_busy(self):
+        """Returns True while a test is running."""
+        with self._tokens_lock:
+            return bool(self._tokens)
+
+    def cancel(self):
+        """Cancels the running test and any queued ones."""
+        with self._tokens_lock:
+            tokens = list(self._tokens)
+        for token in tokens:
+            token.cancel()
+        if tokens:
+            logger.info("Speed test cancelled")
+
+    def _phase_timeout(self, phase):
+        return self.settings.get(PHASE_TIMEOUT_SETTINGS[phase])
+
+    def _streams_for(self, speedtest, direction, engine, events=None):
+        configured = engine[f"engine_{direction}_streams"] or None
+        if engine["engine_auto_scale"]:
+            publish(events, PhaseChanged(direction, f"Tuning {direction} streams..."))
+            return auto_scale_streams(
+                speedtest, direction, engine["engine_max_streams"], configured
+            )
+        return configured
+
+    def _create_speedtest(self, st, token=None):
+        """
+        Builds a speedtest-cli client, from the server cache when it is valid.
+
+        Returns:
+            tuple: (client, cache entry or None)
+        """
+        shutdown_event = token.shutdown if token is not None else None
+        base_url = self.settings.get("speedtest_server_url")
+        if base_url:
+            # A stand-in server's list must not replace the cached real one
+            speedtest = cached_speedtest_class(st)(base_url=base_url, shutdown_event=shutdown_event)
+            speedtest.get_servers()
+            return speedtest, None
+
+        self.server_cache.ttl = self.settings.get("server_cache_ttl", DEFAULT_TTL_SECONDS)
+        entry = self.server_cache.load()
+        speedtest = cached_speedtest_class(st)(cache_entry=entry, shutdown_event=shutdown_event)
+        if entry is None:
+            logger.info("Server cache miss, downloading server list")
+            speedtest.get_servers()
+        return speedtest, entry
+
+    def _preferred_servers(self, speedtest, server_id):
+        candidates = [
+            server for server in flatten_servers(speedtest.servers)
+            if str(server.get("id")) == str(server_id)
+        ]
+        if candidates:
+            return candidates
         try:
-            speedtest = st.Speedtest()
-            speedtest.get_best_server()
-            download_speed = speedtest.download() / 1_000_000  # Мбит/с
-            upload_speed = speedtest.upload() / 1_000_000      # Мбит/с
-            ping = speedtest.results.ping                      # мс
-            return {
-                'download': download_speed,
-                'upload': upload_speed,
-                'ping': ping
-            }
+            return flatten_servers(speedtest.get_servers([server_id]))
+        except Exception as e:
+            logger.warning(f"Preferred server {server_id} not available: {e}")
+            return []
+
+    def _select_server(self, speedtest, entry):
+        """
+        Picks the server to test against, in order of preference: the
+        preferred_server_id setting, the cached best server if it still
+        answers, and finally latency-based discovery: concurrent probes of the
+        closest servers, falling back to speedtest-cli's sequential pings.
+        """
+        preferred_id = self.settings.get("preferred_server_id")
+        if preferred_id:
+            candidates = self._preferred_servers(speedtest, preferred_id)
+            if candidates:
+                return speedtest.get_best_server(candidates)
+
+        if entry and entry.get("best"):
+            best = speedtest.get_best_server([entry["best"]])
+            if best["latency"] < UNREACHABLE_LATENCY:
+                return best
+            logger.info("Cached best server did not answer, running discovery")
+
+        if self.settings.get("server_selection", "concurrent") == "concurrent":
+            best = self._select_concurrently(speedtest)
+            if best is not None:
+                return best
+        return speedtest.get_best_server()
+
+    def _select_concurrently(self, speedtest):
+        """
+        Probes the closest servers in parallel and adopts the fastest one.
+
+        Returns:
+            dict or None: The chosen server, None if no candidate answered
+        """
+        top_k = self.settings.get("server_top_k", DEFAULT_TOP_K)
+        closest = speedtest.get_closest_servers(limit=top_k)
+        ranked = rank_servers(closest)
+        for result in ranked:
+            logger.info(
+                f"Server {result['server'].get('id')}: median {result['median']:.1f} ms, "
+                f"jitter {result['jitter']:.1f} ms, lost {result['lost']}"
+            )
+        if not ranked:
+            return None
+        best = ranked[0]["server"]
+        best["latency"] = round(ranked[0]["median"], 3)
+        # Mirrors what get_best_server records, without probing again
+        speedtest.results.ping = best["latency"]
+        speedtest.results.server = best
+        speedtest._best.update(best)
+        return best
+
+    def _update_server_cache(self, speedtest, entry, config, servers, best):
+        if entry is None:
+            self.server_cache.save(config, speedtest.lat_lon, servers, best)
+        elif best.get("id") != (entry.get("best") or {}).get("id"):
+            self.server_cache.update_best(best)
+
+    def _discover(self, st, token):
+        """Creates the client and picks the server; returns the client."""
+        speedtest, entry = self._create_speedtest(st, token)
+        config_snapshot = copy.deepcopy(speedtest.config)
+        all_servers = flatten_servers(speedtest.servers)
+        best = self._select_server(speedtest, entry)
+        if not self.settings.get("speedtest_server_url"):
+            self._update_server_cache(speedtest, entry, config_snapshot, all_servers, best)
+        return speedtest
+
+    def _measure_latency(self, speedtest, events, token):
+        """
+        Probes the latency distribution of the chosen server.
+
+        Returns:
+            dict: latency_* fields, jitter and packet_loss; empty if probing
+            is disabled, failed or timed out
+        """
+        count = self.settings.get("latency_probes", DEFAULT_PROBES)
+        if not count:
+            return {}
+        publish(events, PhaseChanged(PHASE_LATENCY, "Measuring latency..."))
+        try:
+            return run_with_timeout(
+                lambda: measure_latency(
+                    speedtest.results.server,
+                    count,
+                    self.settings.get("latency_mode", MODE_PACED),
+                    self.settings.get("latency_interval", DEFAULT_INTERVAL)
+                ),
+                self._phase_timeout(PHASE_LATENCY),
+                token
+            )
+        except SpeedTestCancelled:
+            raise
+        except PhaseTimeout as e:
+            logger.warning(f"Latency measurement {e}")
+        except Exception as e:
+            logger.warning(f"Latency measurement failed: {e}")
+        return {}
+
+    def _loaded_latency_sampler(self, speedtest):
+        if not self.settings.get("latency_under_load"):
+            return nullcontext()
+        return LoadedLatencySampler(
+            speedtest.results.server,
+            self.settings.get("latency_under_load_interval", DEFAULT_LOADED_INTERVAL)
+        )
+
+    def active_interface(self):
+        """Returns the active adapter's name from the cached network info, or None."""
+        if self.network_info is None:
+            return None
+        adapter = self.network_info.active_adapter()
+        return adapter["Adapter"] if adapter is not None else None
+
+    def _nic_sampler(self):
+        if not self.settings.get("nic_sampling", True):
+            return nullcontext()
+        return NicCounterSampler(self.settings.get("nic_sampling_interval", DEFAULT_SAMPLE_INTERVAL),
+                                 active=self.active_interface())
+
+    def _measure_phase(self, speedtest, direction, engine, meter, events, token,
+                       idle_latency=None):
+        """
+        Tunes the stream count and measures one direction, sampling the
+        interface counters and, when latency_under_load is enabled, probing
+        latency in parallel.
+
+        Returns:
+            tuple: (Mbps, streams, True if the phase timed out, interface and
+            latency under load fields)
+        """
+        with PhaseWatchdog(token, self._phase_timeout(direction)) as watchdog:
+            streams = self._streams_for(speedtest, direction, engine, events)
+            token.check()
+            # A timeout during stream tuning must not stop the measurement
+            # before it starts; it runs for its configured length instead
+            watchdog.release()
+            publish(events, PhaseChanged(direction, f"Testing {direction} speed..."))
+            duration = speedtest.config["length"][direction]
+            sampler = self._loaded_latency_sampler(speedtest)
+            nic = self._nic_sampler()
+            with ProgressReporter(meter, events, direction, duration) as reporter, sampler, nic:
+                speed = measure(speedtest, direction, streams, reporter.callback) / 1_000_000
+        token.check()
+        if watchdog.expired:
+            logger.warning(f"{direction.title()} timed out, keeping the partial result")
+        fields = {}
+        if isinstance(nic, NicCounterSampler):
+            fields.update(nic.summary(direction))
+            logger.debug(f"Interface bytes (received, sent) during {direction}: {nic.totals()}")
+        if isinstance(sampler, LoadedLatencySampler):
+            fields.update(loaded_latency_summary(sampler.samples, idle_latency, direction))
+        streams = streams or speedtest.config["threads"][direction]
+        return speed, streams, watchdog.expired, fields
+
+    def _run(self, events=None, token=None):
+        token = token or CancelToken()
+        if self._listeners:
+            events = EventFanout([events, *self._listeners])
+        try:
+            result = self._run_test(events, token)
+        finally:
+            with self._tokens_lock:
+                self._tokens.discard(token)
+        publish(events, SpeedTestFinished(result))
+        return result
+
+    def _run_test(self, events, token):
+        measured = {}
+        try:
+            token.check()
+            publish(events, PhaseChanged(PHASE_SERVER, "Finding best server..."))
+            # speedtest-cli is imported on first use to keep app startup fast
+            import speedtest as st
+            try:
+                speedtest = run_with_timeout(
+                    lambda: self._discover(st, token), self._phase_timeout(PHASE_SERVER), token
+                )
+            except PhaseTimeout as e:
+                return SpeedTestResult(error=f"Server discovery {e}", timed_out=[PHASE_SERVER])
+            meter = TransferMeter()
+            speedtest._opener = MeteredOpener(speedtest._opener, meter)
+            engine = engine_settings(self.settings)
+            apply_engine_settings(speedtest.config, engine)
+            measured['ping'] = speedtest.results.ping                      # мс
+            measured.update(self._measure_latency(speedtest, events, token))
+            token.check()
+
+            timed_out = []
+            # latency_median is None when every idle probe was lost
+            idle_latency = measured.get('latency_median') or measured['ping']
+            for direction in (PHASE_DOWNLOAD, PHASE_UPLOAD):
+                speed, streams, expired, fields = self._measure_phase(
+                    speedtest, direction, engine, meter, events, token, idle_latency
+                )
+                measured[direction] = speed                                # Мбит/с
+                measured[f'{direction}_streams'] = streams
+                measured.update(fields)
+                if expired:
+                    timed_out.append(direction)
+
+            if timed_out:
+                return SpeedTestResult.from_dict(measured, partial=True, timed_out=timed_out)
+            return SpeedTestResult.from_dict(measured)
+        except SpeedTestCancelled:
+            return SpeedTestResult.from_dict(measured, error="Test cancelled", cancelled=True)
         except Exception as e:
             logger.error(f"Speedtest error: {e}", exc_info=True)
-            return {'error': str(e)} 
\ No newline at end of file
+            return SpeedTestResult(error=str(e))
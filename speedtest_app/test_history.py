@@ -1,38 +1,85 @@
 import os
-import json
 import logging
-from datetime import datetime
-from tkinter import Toplevel, Text, Scrollbar, messagebox, ttk, Frame, Button
-from matplotlib import pyplot as plt
-from matplotlib.backends._backend_tk import NavigationToolbar2Tk
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from tkinter import messagebox
 import ttkbootstrap as tb
-from ttkbootstrap.tableview import Tableview
 import concurrent.futures
-import tkinter.messagebox as messagebox
+from collections.abc import Mapping
+from numbers import Real
+import numpy as np
+from speedtest_app.history_store import (
+    get_history_file_path,
+    get_history_store,
+    make_record,
+    normalize_timestamp
+)
+from speedtest_app.history_analytics import analyze_history
+from speedtest_app.history_cache import (
+    LOADED_LATENCY_COLUMNS,
+    append_to_history,
+    load_history_columns,
+    timestamp_to_epoch
+)
+from speedtest_app.speedtest_result import SpeedTestResult
+from speedtest_app.gui.history_table import HistoryTable
+from speedtest_app.gui.export_dialog import ExportDialog
+from speedtest_app.utils import load_settings
 
 logger = logging.getLogger("SpeedTest")
 
+# The baseline band is drawn from at most this many evenly spaced runs
+BAND_POINTS = 2000
+ANOMALY_COLOR = "#e74c3c"
 
-def get_history_file_path():
-    """Returns the path to the history file in Downloads directory."""
-    downloads_dir = os.path.join(os.path.expanduser("~"), "Downloads")
-    return os.path.join(downloads_dir, "speedtest_history.json")
+
+def plot_baseline(ax, tests, values, analysis, color, label):
+    """Draws the anomaly baseline band of one metric and marks its anomalous runs."""
+    tests = np.asarray(tests)
+    if not len(tests):
+        return
+    band = np.unique(np.linspace(0, len(tests) - 1, min(len(tests), BAND_POINTS)).astype(np.int64))
+    ax.fill_between(tests[band], analysis["lower"][band], analysis["upper"][band],
+                    color=color, alpha=0.12, linewidth=0, label=f"{label} baseline")
+    ax.plot(tests[band], analysis["baseline"][band], linestyle="--", linewidth=1, color=color)
+    flagged = np.flatnonzero(analysis["anomaly"])
+    if len(flagged):
+        ax.scatter(tests[flagged], np.asarray(values, dtype=np.float64)[flagged], marker="x",
+                   s=40, color=ANOMALY_COLOR, zorder=3, label=f"{label} anomalies")
+
+
+def _history_record(result, upload_speed, ping, latency):
+    """Builds the history record for either form save_test_results accepts."""
+    if isinstance(result, Mapping):
+        if upload_speed is not None or ping is not None:
+            raise TypeError("save_test_results(result, file_path=None) takes the file path "
+                            "as its second argument only by keyword")
+        if not isinstance(result, SpeedTestResult):
+            result = SpeedTestResult.from_dict(result)
+        return result.history_record()
+    if isinstance(result, Real) and not isinstance(result, bool) \
+            and upload_speed is not None and ping is not None:
+        return make_record(result, upload_speed, ping, latency=latency)
+    raise TypeError("save_test_results expects a SpeedTestResult, as in "
+                    "save_test_results(result, file_path=path), or download, upload and ping "
+                    f"speeds, not {type(result).__name__}")
 
 
-def save_test_results(download_speed, upload_speed, ping, file_path=None):
-    """Saves the test results to the Downloads directory."""
+def save_test_results(result, upload_speed=None, ping=None, file_path=None, latency=None):
+    """
+    Saves a test result to the history in the Downloads directory.
+
+    Args:
+        result: SpeedTestResult (a plain result mapping is accepted too), or
+            the download speed in Mbps for the older
+            save_test_results(download, upload, ping, file_path) form
+        upload_speed, ping, latency: Only used with the older form
+        file_path: History file to append to (default: the configured one)
+    """
     if file_path is None:
         file_path = get_history_file_path()
 
-    data = {
-        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-        "download_speed": download_speed,
-        "upload_speed": upload_speed,
-        "ping": ping
-    }
-
     try:
+        data = _history_record(result, upload_speed, ping, latency)
+
         # Ensure directory exists (although Downloads should always exist)
         downloads_dir = os.path.dirname(file_path)
         if not os.path.exists(downloads_dir):
@@ -40,23 +87,8 @@ def save_test_results(download_speed, upload_speed, ping, file_path=None):
             messagebox.showerror("Error", "Downloads directory not found")
             return
 
-        # Load existing history or create new
-        if os.path.exists(file_path):
-            try:
-                with open(file_path, "r", encoding="utf-8") as file:
-                    history = json.load(file)
-            except json.JSONDecodeError:
-                logger.error(f"Error decoding JSON from {file_path}. Creating new history.")
-                history = []
-        else:
-            history = []
-
-        # Add new data
-        history.append(data)
-
-        # Save the updated file
-        with open(file_path, "w", encoding="utf-8") as file:
-            json.dump(history, file, indent=4)
+        # Append a single line instead of rewriting the whole history
+        append_to_history(get_history_store(file_path), data)
         logger.info(f"Test results saved to {file_path}")
 
     except Exception as e:
@@ -64,20 +96,15 @@ def save_test_results(download_speed, upload_speed, ping, file_path=None):
         messagebox.showerror("Error", f"Could not save test results: {e}")
 
 
-def view_history(root, history_path):
-    """Opens a new window with the test history using a Treeview widget."""
-    if not os.path.exists(history_path):
-        messagebox.showinfo("History", "No history available.")
-        return
+def view_history(root, history_path, start=None, end=None):
+    """
+    Opens a new window with the test history using a Treeview widget.
 
-    try:
-        with open(history_path, "r", encoding="utf-8") as file:
-            history = json.load(file)
-    except json.JSONDecodeError:
-        messagebox.showerror("Error", "Could not read history file. It may be corrupted.")
-        return
-    except Exception as e:
-        messagebox.showerror("Error", f"Could not read history file: {e}")
+    If start or end is given, only runs inside that time range are fetched.
+    """
+    store = get_history_store(history_path)
+    if not store.exists():
+        messagebox.showinfo("History", "No history available.")
         return
 
     history_window = tb.Toplevel(root)
@@ -86,38 +113,26 @@ def view_history(root, history_path):
     history_window.minsize(650, 450)
     frame = tb.Frame(history_window, padding=20)
     frame.pack(fill="both", expand=True, padx=10, pady=10)
-    columns = ("#", "Timestamp", "Download (Mbps)", "Upload (Mbps)", "Ping (ms)")
-    data = [
-        [idx, entry.get("timestamp", "N/A"), entry["download_speed"], entry["upload_speed"], entry["ping"]]
-        for idx, entry in enumerate(history, start=1)
-    ]
-    table = Tableview(
-        master=frame,
-        coldata=columns,
-        rowdata=data,
-        paginated=False,
-        searchable=False,
-        bootstyle="darkly",
-        autofit=True,
-        stripecolor=("#23272b", "#343a40")
-    )
+    try:
+        # Only the rows scrolled into view are fetched from the history
+        table = HistoryTable(frame, store)
+        if start is not None or end is not None:
+            table.pager.set_query(
+                start=None if start is None else timestamp_to_epoch(normalize_timestamp(start)),
+                end=None if end is None else timestamp_to_epoch(normalize_timestamp(end))
+            )
+            table.reload()
+    except Exception as e:
+        history_window.destroy()
+        messagebox.showerror("Error", f"Could not read history file: {e}")
+        return
     table.pack(fill="both", expand=True)
     def export_csv():
-        try:
-            from tkinter import filedialog
-            file_path = filedialog.asksaveasfilename(
-                defaultextension=".csv",
-                filetypes=[("CSV files", "*.csv"), ("All files", "*.*")],
-                title="Export History to CSV"
-            )
-            if file_path:
-                with open(file_path, "w", encoding="utf-8") as f:
-                    f.write(",".join(columns) + "\n")
-                    for row in data:
-                        f.write(",".join(str(x) for x in row) + "\n")
-                messagebox.showinfo("Export", f"History exported to {file_path}")
-        except Exception as e:
-            messagebox.showerror("Export Error", f"Could not export history: {e}")
+        # Streams the rows matching the current filter and sort on a worker thread
+        pager = table.pager
+        ExportDialog(history_window, store, start=pager.start, end=pager.end,
+                     max_download=pager.max_download, sort_by=pager.sort_by,
+                     descending=pager.descending)
     button_frame = tb.Frame(history_window)
     button_frame.pack(fill="x", padx=10, pady=10)
     export_button = tb.Button(button_frame, text="Export to CSV", command=export_csv)
@@ -126,8 +141,8 @@ def view_history(root, history_path):
     close_button.pack(side="right", padx=5)
 
 
-def plot_history(root, history_path):
-    if not os.path.exists(history_path):
+def plot_history(root, history_path, start=None, end=None):
+    if not get_history_store(history_path).exists():
         messagebox.showinfo("History", "No history available.")
         return
 
@@ -142,14 +157,36 @@ def plot_history(root, history_path):
 
     def build_plot_data():
         try:
-            with open(history_path, "r", encoding="utf-8") as file:
-                history = json.load(file)
-            download_speeds = [entry["download_speed"] for entry in history]
-            upload_speeds = [entry["upload_speed"] for entry in history]
-            pings = [entry["ping"] for entry in history]
-            tests = range(1, len(history) + 1)
-            timestamps = [entry.get("timestamp", f"Test {i+1}") for i, entry in enumerate(history)]
-            return (download_speeds, upload_speeds, pings, tests, timestamps)
+            store = get_history_store(history_path)
+            if start is None and end is None:
+                # Zero-parse path: memory-mapped columns from the history cache
+                columns = load_history_columns(store)
+                last_runs = store.last_runs(1)
+            else:
+                runs = store.runs_between(start, end)
+                columns = {
+                    name: [entry.get(name, float("nan")) for entry in runs]
+                    for name in LOADED_LATENCY_COLUMNS
+                }
+                columns.update({
+                    "download_speed": [entry["download_speed"] for entry in runs],
+                    "upload_speed": [entry["upload_speed"] for entry in runs],
+                    "ping": [entry["ping"] for entry in runs],
+                    "timestamp": [timestamp_to_epoch(entry.get("timestamp")) for entry in runs],
+                })
+                last_runs = runs[-1:]
+            download_speeds = columns["download_speed"]
+            upload_speeds = columns["upload_speed"]
+            pings = columns["ping"]
+            tests = range(1, len(download_speeds) + 1)
+            loaded = {name: columns[name] for name in LOADED_LATENCY_COLUMNS}
+            last_run = last_runs[0] if last_runs else {}
+            try:
+                analysis = analyze_history(columns, load_settings())
+            except Exception as e:
+                logger.warning(f"Could not analyze history: {e}")
+                analysis = {}
+            return download_speeds, upload_speeds, pings, tests, loaded, last_run, analysis
         except Exception as e:
             return e
 
@@ -158,28 +195,85 @@ def plot_history(root, history_path):
         if isinstance(result, Exception):
             messagebox.showerror("Plot Error", f"Could not build plot: {result}")
             return
-        download_speeds, upload_speeds, pings, tests, timestamps = result
-        fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(10, 8), gridspec_kw={'height_ratios': [3, 1]})
-        ax1.plot(tests, download_speeds, label="Download Speed (Mbps)", marker="o", color="#00bc8c")
-        ax1.plot(tests, upload_speeds, label="Upload Speed (Mbps)", marker="s", color="#375a7f")
+        # matplotlib is only loaded once a plot is actually shown
+        from matplotlib import pyplot as plt
+        from matplotlib.backends._backend_tk import NavigationToolbar2Tk
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        from speedtest_app.plot_decimation import DecimatedLine, attach_decimation
+        download_speeds, upload_speeds, pings, tests, loaded, last_run, analysis = result
+        series = {direction: last_run.get(f"{direction}_latency_series")
+                  for direction in ("download", "upload")}
+        show_series = any(series.values())
+        if show_series:
+            fig, (ax1, ax2, ax3) = plt.subplots(
+                3, 1, figsize=(10, 10), gridspec_kw={'height_ratios': [3, 1, 1]}
+            )
+        else:
+            fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(10, 8),
+                                           gridspec_kw={'height_ratios': [3, 1]})
+        # Lines draw a decimated view sized to the canvas, re-selected on zoom
+        lines = [
+            DecimatedLine(ax1, tests, download_speeds, marker="o",
+                          label="Download Speed (Mbps)", color="#00bc8c"),
+            DecimatedLine(ax1, tests, upload_speeds, marker="s",
+                          label="Upload Speed (Mbps)", color="#375a7f"),
+        ]
+        # Rolling baseline band and flagged anomalies (see history_analytics)
+        for metric, values, label, color in (
+            ("download_speed", download_speeds, "Download", "#00bc8c"),
+            ("upload_speed", upload_speeds, "Upload", "#375a7f"),
+        ):
+            if metric in analysis:
+                plot_baseline(ax1, tests, values, analysis[metric], color, label)
         ax1.set_xlabel("Test Number")
         ax1.set_ylabel("Speed (Mbps)")
         ax1.set_title("Internet Speed Test History", fontsize=14)
         ax1.legend()
         ax1.grid(True, color="#444")
-        ax2.plot(tests, pings, label="Ping (ms)", marker="^", color="#f39c12")
+        # Min/max bucketing keeps every ping spike visible
+        lines.append(DecimatedLine(ax2, tests, pings, method="minmax", marker="^",
+                                   label="Ping (ms)", color="#f39c12"))
+        if "ping" in analysis:
+            plot_baseline(ax2, tests, pings, analysis["ping"], "#f39c12", "Ping")
+        # Median latency while downloading / uploading, where it was measured
+        for name, label, color in (
+            ("download_latency_median", "Latency during download (ms)", "#00bc8c"),
+            ("upload_latency_median", "Latency during upload (ms)", "#375a7f"),
+        ):
+            values = np.asarray(loaded[name], dtype=np.float64)
+            measured = ~np.isnan(values)
+            if measured.any():
+                lines.append(DecimatedLine(ax2, np.asarray(tests)[measured], values[measured],
+                                           method="minmax", marker=".", label=label,
+                                           color=color))
         ax2.set_xlabel("Test Number")
-        ax2.set_ylabel("Ping (ms)")
+        ax2.set_ylabel("Latency (ms)")
         ax2.legend()
         ax2.grid(True, color="#444")
+        if show_series:
+            # Per-second latency of the newest test, against its idle latency
+            for direction, color in (("download", "#00bc8c"), ("upload", "#375a7f")):
+                if series[direction]:
+                    values = [np.nan if v is None else v for v in series[direction]]
+                    ax3.plot(range(len(values)), values, marker=".", color=color,
+                             label=f"During {direction}")
+            idle = last_run.get("latency_median", last_run.get("ping"))
+            if idle is not None:
+                ax3.axhline(idle, linestyle="--", color="#f39c12", label="Idle")
+            ax3.set_xlabel("Seconds into phase")
+            ax3.set_ylabel("Latency (ms)")
+            ax3.set_title("Latency under load, last test")
+            ax3.legend()
+            ax3.grid(True, color="#444")
         plt.tight_layout()
         plot_window = tb.Toplevel(root)
         plot_window.title("Speed Test History Graph")
-        plot_window.geometry("850x650")
+        plot_window.geometry("850x800" if show_series else "850x650")
         plot_window.minsize(850, 650)
         plot_frame = tb.Frame(plot_window)
         plot_frame.pack(fill="both", expand=True)
         canvas = FigureCanvasTkAgg(fig, master=plot_frame)
+        attach_decimation(canvas, lines)
         canvas.draw()
         canvas.get_tk_widget().pack(fill="both", expand=True)
         toolbar_frame = tb.Frame(plot_window)
@@ -0,0 +1,124 @@
+import unittest
+import os
+import sys
+import gzip
+import json
+import logging
+import logging.handlers
+import tempfile
+import shutil
+import threading
+from speedtest_app import app_logging
+
+
+def _record(message, level=logging.INFO):
+    return logging.makeLogRecord({"name": "SpeedTest", "levelno": level,
+                                  "levelname": logging.getLevelName(level), "msg": message})
+
+
+class TestAppLogging(unittest.TestCase):
+    """Tests for the app_logging module."""
+
+    def setUp(self):
+        """Set up a temporary log directory and remember the root logger state."""
+        self.test_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.test_dir, "speedtest_log.log")
+        root = logging.getLogger()
+        self.addCleanup(root.setLevel, root.level)
+        self.addCleanup(app_logging.stop_logging)
+
+    def tearDown(self):
+        """Clean up after tests."""
+        shutil.rmtree(self.test_dir)
+
+    def test_json_formatter(self):
+        """Test the JSON fields, extras and exception text."""
+        record = None
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            record = logging.getLogger("SpeedTest").makeRecord(
+                "SpeedTest", logging.ERROR, __file__, 42, "Saved %d runs", (3,),
+                exc_info=sys.exc_info(), extra={"backend": "binary"}
+            )
+
+        entry = json.loads(app_logging.JsonFormatter().format(record))
+
+        self.assertEqual(entry["message"], "Saved 3 runs")
+        self.assertEqual(entry["level"], "ERROR")
+        self.assertEqual(entry["line"], 42)
+        self.assertEqual(entry["backend"], "binary")
+        self.assertIn("ValueError: boom", entry["exception"])
+
+    def test_size_rotation_compresses_and_keeps_backups(self):
+        """Test that full files are gzipped, shifted and capped at backup_count."""
+        handler = app_logging.RotatingCompressedFileHandler(
+            self.path, max_bytes=100, interval=0, backup_count=2
+        )
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        for i in range(12):
+            handler.handle(_record(f"line {i:02d} " + "x" * 30))
+        handler.close()
+
+        self.assertTrue(os.path.exists(self.path + ".1.gz"))
+        self.assertTrue(os.path.exists(self.path + ".2.gz"))
+        self.assertFalse(os.path.exists(self.path + ".3.gz"))
+        self.assertLessEqual(os.path.getsize(self.path), 100)
+        with gzip.open(self.path + ".1.gz", "rt", encoding="utf-8") as f:
+            newest_backup = f.read().splitlines()
+        with open(self.path, "r", encoding="utf-8") as f:
+            live = f.read().splitlines()
+        self.assertEqual(int(newest_backup[-1].split()[1]) + 1, int(live[0].split()[1]))
+
+    def test_time_rotation(self):
+        """Test a rollover once the interval passed, and none for an empty file."""
+        now = [1000.0]
+        handler = app_logging.RotatingCompressedFileHandler(
+            self.path, max_bytes=0, interval=60, backup_count=3, compress=False,
+            clock=lambda: now[0]
+        )
+        handler.handle(_record("first"))
+        now[0] += 30
+        handler.handle(_record("second"))
+        now[0] += 31
+        handler.handle(_record("third"))
+        handler.close()
+
+        with open(self.path + ".1", "r", encoding="utf-8") as f:
+            self.assertEqual(f.read().splitlines(), ["first", "second"])
+        with open(self.path, "r", encoding="utf-8") as f:
+            self.assertEqual(f.read().splitlines(), ["third"])
+        self.assertEqual(handler.rollover_at, 1121.0)
+
+    def test_logging_goes_through_the_queue(self):
+        """Test that records from several threads reach the file after stop_logging."""
+        listener = app_logging.configure_logging(self.path, level="DEBUG", json_format=True,
+                                                 console=False)
+        root = logging.getLogger()
+        self.assertEqual(len([h for h in root.handlers
+                              if isinstance(h, logging.handlers.QueueHandler)]), 1)
+        self.assertIsNot(listener._thread, None)
+
+        logger = logging.getLogger("SpeedTest")
+        threads = [threading.Thread(target=logger.debug, args=("from %s", i)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        try:
+            {}["missing"]
+        except KeyError:
+            logger.error("Lookup failed", exc_info=True)
+        app_logging.stop_logging()
+
+        with open(self.path, "r", encoding="utf-8") as f:
+            entries = [json.loads(line) for line in f]
+        self.assertEqual(sorted(e["message"] for e in entries[:4]),
+                         [f"from {i}" for i in range(4)])
+        self.assertIn("KeyError: 'missing'", entries[4]["exception"])
+        self.assertFalse(any(isinstance(h, logging.handlers.QueueHandler)
+                             for h in root.handlers))
+
+
+if __name__ == '__main__':
+    unittest.main()
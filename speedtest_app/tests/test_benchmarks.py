@@ -0,0 +1,69 @@
+import unittest
+import os
+import tempfile
+import shutil
+from unittest.mock import patch
+from benchmarks import suite
+
+
+class TestBenchmarks(unittest.TestCase):
+    """Tests for the benchmark runner and baseline comparison."""
+
+    def setUp(self):
+        """Set up a temporary history cache location."""
+        self.test_dir = tempfile.mkdtemp()
+        patcher = patch("speedtest_app.history_cache.ensure_user_data_dir",
+                        return_value=self.test_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        """Clean up after tests."""
+        shutil.rmtree(self.test_dir)
+
+    def test_run_benchmarks(self):
+        """Test that sized cases produce time and peak memory per size."""
+        reported = []
+        document = suite.run_benchmarks(
+            sizes=[50, 200],
+            cases=["history_cold_load", "export_csv", "save_test_results"],
+            repeat=1,
+            report=lambda key, result: reported.append(key)
+        )
+
+        self.assertEqual(reported, [
+            "history_cold_load[50]", "export_csv[50]", "save_test_results[50]",
+            "history_cold_load[200]", "export_csv[200]", "save_test_results[200]",
+        ])
+        for result in document["results"].values():
+            self.assertGreater(result["seconds"], 0)
+            self.assertGreater(result["peak_bytes"], 0)
+        # Fixture caches are removed again
+        self.assertEqual(os.listdir(os.path.join(self.test_dir, "history_cache")), [])
+
+    def test_unknown_case(self):
+        """Test that unknown case names are rejected."""
+        with self.assertRaises(ValueError):
+            suite.run_benchmarks(sizes=[10], cases=["nope"])
+
+    def test_compare_flags_regressions(self):
+        """Test regressions beyond the threshold and the noise floor."""
+        baseline = {"results": {
+            "export_csv[1000]": {"seconds": 0.100, "peak_bytes": 10 << 20},
+            "plot_history_load[1000]": {"seconds": 0.001, "peak_bytes": 1000},
+            "get_network_info": {"error": "unsupported"},
+        }}
+        current = {"results": {
+            "export_csv[1000]": {"seconds": 0.200, "peak_bytes": 11 << 20},
+            "plot_history_load[1000]": {"seconds": 0.004, "peak_bytes": 5000},
+            "get_network_info": {"seconds": 0.5, "peak_bytes": 100},
+            "speedtest_service": {"seconds": 1.0, "peak_bytes": 100},
+        }}
+
+        regressions = suite.compare_results(baseline, current, threshold=0.25)
+
+        self.assertEqual(regressions, [("export_csv[1000]", "seconds", 0.100, 0.200)])
+
+
+if __name__ == '__main__':
+    unittest.main()
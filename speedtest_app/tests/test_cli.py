@@ -0,0 +1,135 @@
+import unittest
+import io
+import os
+import sys
+import json
+import tempfile
+import shutil
+import subprocess
+from datetime import datetime
+from concurrent.futures import Future
+from unittest.mock import patch, MagicMock
+from speedtest_app import cli
+from speedtest_app.history_store import BinaryHistoryStore, JsonlHistoryStore, TIMESTAMP_FORMAT
+from speedtest_app.speedtest_result import SpeedTestResult
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _service_returning(*results):
+    """Builds a mock SpeedTestService whose futures resolve to results in turn."""
+    futures = []
+    for result in results:
+        future = Future()
+        future.set_result(SpeedTestResult(timestamp=1711972800 + len(futures), **result))
+        futures.append(future)
+    service = MagicMock()
+    service.run_speedtest.side_effect = futures
+    return service
+
+
+class TestCli(unittest.TestCase):
+    """Tests for the headless command line entry point."""
+
+    def setUp(self):
+        """Set up a temporary history location."""
+        self.test_dir = tempfile.mkdtemp()
+        self.history_path = os.path.join(self.test_dir, "probe", "history.jsonl")
+        patcher = patch("speedtest_app.history_cache.ensure_user_data_dir",
+                        return_value=os.path.join(self.test_dir, "cache"))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        """Clean up after tests."""
+        shutil.rmtree(self.test_dir)
+
+    def _run(self, argv, service):
+        stdout = io.StringIO()
+        with patch.object(cli, "SpeedTestService", return_value=service), \
+                patch.object(sys, "stdout", stdout):
+            code = cli.main(argv)
+        return code, stdout.getvalue()
+
+    def test_json_output_and_history(self):
+        """Test JSON lines output and saving to the history."""
+        service = _service_returning({"download": 100.0, "upload": 50.0, "ping": 10.0},
+                                     {"download": 90.0, "upload": 45.0, "ping": 12.0})
+
+        code, output = self._run(["--count", "2", "--history", self.history_path], service)
+
+        self.assertEqual(code, cli.EXIT_OK)
+        lines = [json.loads(line) for line in output.splitlines()]
+        self.assertEqual([line["download"] for line in lines], [100.0, 90.0])
+        records = list(JsonlHistoryStore(self.history_path))
+        self.assertEqual([r["ping"] for r in records], [10.0, 12.0])
+        # Stamped with the time each run finished, in the output and the history alike
+        stamped = [datetime.fromtimestamp(1711972800 + i).strftime(TIMESTAMP_FORMAT)
+                   for i in range(2)]
+        self.assertEqual([line["timestamp"] for line in lines], stamped)
+        self.assertEqual([r["timestamp"] for r in records], stamped)
+
+    def test_csv_output_and_failure_exit_code(self):
+        """Test CSV output and the exit code of a failed test."""
+        service = _service_returning({"error": "no servers, try later"})
+
+        code, output = self._run(["--format", "csv", "--no-save"], service)
+
+        self.assertEqual(code, cli.EXIT_TEST_FAILED)
+        header, row = output.splitlines()
+        self.assertEqual(header, "timestamp,download,upload,ping,error")
+        self.assertTrue(row.endswith(',,,,"no servers, try later"'))
+
+    def test_invalid_arguments(self):
+        """Test the usage exit code."""
+        code, _ = self._run(["--count", "0"], MagicMock())
+        self.assertEqual(code, cli.EXIT_USAGE)
+
+    def test_convert_history(self):
+        """Test converting a history file without running a test."""
+        os.makedirs(os.path.dirname(self.history_path))
+        JsonlHistoryStore(self.history_path).append(
+            {"timestamp": "2024-04-01 12:00:00", "download_speed": 1.0,
+             "upload_speed": 2.0, "ping": 3.0}
+        )
+        target = os.path.join(self.test_dir, "history.bin")
+        service = MagicMock()
+
+        code, output = self._run(["--convert-history", self.history_path, target], service)
+
+        self.assertEqual(code, cli.EXIT_OK)
+        self.assertIn("Converted 1 history records", output)
+        self.assertEqual(BinaryHistoryStore(target)[0]["ping"], 3.0)
+        service.run_speedtest.assert_not_called()
+
+        code, _ = self._run(["--convert-history", target + ".missing", target], service)
+        self.assertEqual(code, cli.EXIT_HISTORY_FAILED)
+
+    def test_partial_result_is_not_saved(self):
+        """Test that a run cut off by a phase timeout is printed but not saved."""
+        service = _service_returning(
+            {"download": 100.0, "upload": 5.0, "ping": 10.0, "partial": True,
+             "timed_out": ["upload"]},
+            {"download": 90.0, "upload": 45.0, "ping": 12.0}
+        )
+
+        code, output = self._run(["--count", "2", "--history", self.history_path], service)
+
+        self.assertEqual(code, cli.EXIT_OK)
+        lines = [json.loads(line) for line in output.splitlines()]
+        self.assertEqual(lines[0]["timed_out"], ["upload"])
+        self.assertNotIn("timed_out", lines[1])
+        self.assertEqual([r["ping"] for r in JsonlHistoryStore(self.history_path)], [12.0])
+
+    def test_cli_does_not_import_gui_modules(self):
+        """Test that the CLI module stays free of GUI and plotting imports."""
+        probe = ("import sys, speedtest_app.cli; "
+                 "print(','.join(m for m in ('tkinter', 'ttkbootstrap', 'matplotlib') "
+                 "if m in sys.modules))")
+        output = subprocess.check_output([sys.executable, "-c", probe],
+                                         cwd=PROJECT_ROOT, text=True)
+        self.assertEqual(output.strip(), "")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,171 @@
+import unittest
+import numpy as np
+from speedtest_app import history_analytics
+
+HOUR = 3600.0
+
+
+class TestHistoryAnalytics(unittest.TestCase):
+    """Tests for the history_analytics module."""
+
+    def setUp(self):
+        """Set up an hourly series with a few gaps, NaN and outliers."""
+        rng = np.random.default_rng(7)
+        self.timestamps = np.cumsum(rng.choice([HOUR, 2 * HOUR, 5 * HOUR], 400))
+        self.values = rng.normal(200.0, 10.0, 400)
+        self.values[[50, 51, 300]] = [20.0, 25.0, 400.0]
+        self.values[120] = np.nan
+
+    def _windows(self, window, include_current=True):
+        """Yields the finite values of each run's window, computed naively."""
+        for i, now in enumerate(self.timestamps):
+            end = i + 1 if include_current else i
+            in_window = (self.timestamps[:end] > now - window)
+            values = self.values[:end][in_window]
+            yield values[np.isfinite(values)]
+
+    def test_rolling_mean_matches_naive_windows(self):
+        """Test the cumulative-sum rolling mean against a per-run loop."""
+        means, counts = history_analytics.rolling_mean(self.timestamps, self.values, 24 * HOUR)
+
+        expected = [w.mean() for w in self._windows(24 * HOUR)]
+        np.testing.assert_allclose(means, expected)
+        self.assertEqual(counts.tolist(), [len(w) for w in self._windows(24 * HOUR)])
+
+    def test_rolling_percentiles_match_naive_windows(self):
+        """Test rolling percentiles against numpy.percentile of every window."""
+        result = history_analytics.rolling_percentiles(
+            self.timestamps, self.values, 24 * HOUR, (10, 50, 90)
+        )
+
+        expected = [np.percentile(w, (10, 50, 90)) for w in self._windows(24 * HOUR)]
+        np.testing.assert_allclose(result, expected)
+
+    def test_long_histories_hold_evaluated_windows(self):
+        """Test that a capped evaluation count holds values between evaluated runs."""
+        exact = history_analytics.rolling_percentiles(self.timestamps, self.values,
+                                                      24 * HOUR, (50,))
+        held = history_analytics.rolling_percentiles(self.timestamps, self.values,
+                                                     24 * HOUR, (50,), max_evaluations=40)
+
+        self.assertEqual(held[0, 0], exact[0, 0])
+        self.assertEqual(held[-1, 0], exact[-1, 0])
+        self.assertEqual(held[11, 0], exact[10, 0])
+
+    def test_rolling_std_matches_naive_windows(self):
+        """Test the cumulative-sum mean and standard deviation of the prior window."""
+        means, stds, counts = history_analytics.rolling_std(
+            self.timestamps, self.values + 1e6, 24 * HOUR, include_current=False
+        )
+
+        for i, window in enumerate(self._windows(24 * HOUR, include_current=False)):
+            self.assertEqual(counts[i], len(window))
+            if len(window):
+                self.assertAlmostEqual(means[i], window.mean() + 1e6, places=6)
+                self.assertAlmostEqual(stds[i], window.std(), places=5)
+            else:
+                self.assertTrue(np.isnan(means[i]) and np.isnan(stds[i]))
+
+    def test_long_histories_score_every_run_exactly(self):
+        """Test that runs beyond max_evaluations get their own window's baseline."""
+        result = history_analytics.detect_anomalies(
+            self.timestamps, self.values, threshold=4.0, max_evaluations=40
+        )
+        means, stds, _ = history_analytics.rolling_std(
+            self.timestamps, self.values, history_analytics.DEFAULT_WINDOW,
+            history_analytics.DEFAULT_MAX_WINDOW_RUNS, include_current=False
+        )
+
+        ready = slice(history_analytics.MIN_PERIODS, None)
+        np.testing.assert_allclose(result["baseline"][ready], means[ready])
+        np.testing.assert_allclose(result["upper"][ready], means[ready] + 4.0 * stds[ready])
+        self.assertTrue(result["anomaly"][[50, 300]].all())
+
+    def test_rolling_mad_excludes_the_current_run(self):
+        """Test the median and MAD of the runs before each run."""
+        medians, mads, _, counts = history_analytics.rolling_mad(
+            self.timestamps, self.values, 48 * HOUR, include_current=False
+        )
+
+        windows = list(self._windows(48 * HOUR, include_current=False))
+        self.assertTrue(np.isnan(medians[0]))
+        self.assertEqual(counts[0], 0)
+        np.testing.assert_allclose(medians[1:], [np.median(w) for w in windows[1:]])
+        np.testing.assert_allclose(
+            mads[1:], [np.median(np.abs(w - np.median(w))) for w in windows[1:]]
+        )
+
+    def test_ewma_matches_recursive_definition(self):
+        """Test the closed-form EWMA against the half-life recursion."""
+        result = history_analytics.ewma(self.timestamps, self.values, 12 * HOUR)
+
+        expected, average, last = [], None, None
+        for now, value in zip(self.timestamps, self.values):
+            if np.isfinite(value):
+                if average is None:
+                    average = value
+                else:
+                    decay = 0.5 ** ((now - last) / (12 * HOUR))
+                    average = decay * average + (1 - decay) * value
+                last = now
+            expected.append(average)
+        np.testing.assert_allclose(result, expected)
+
+    def test_ewma_survives_long_gaps(self):
+        """Test that years between runs do not overflow the closed form."""
+        timestamps = np.array([0.0, HOUR, 10 * 365 * 24 * HOUR, 10 * 365 * 24 * HOUR + HOUR])
+
+        result = history_analytics.ewma(timestamps, [10.0, 20.0, 30.0, 40.0], HOUR)
+
+        self.assertEqual(result[0], 10.0)
+        self.assertAlmostEqual(result[1], 15.0)
+        self.assertAlmostEqual(result[2], 30.0)
+        self.assertAlmostEqual(result[3], 35.0)
+
+    def test_detects_outliers_with_both_methods(self):
+        """Test that both methods flag the injected drops and spike."""
+        for method in (history_analytics.METHOD_MAD, history_analytics.METHOD_ZSCORE):
+            with self.subTest(method=method):
+                result = history_analytics.detect_anomalies(
+                    self.timestamps, self.values, method, threshold=4.0
+                )
+                flagged = set(np.flatnonzero(result["anomaly"]))
+                self.assertTrue({50, 300} <= flagged)
+                self.assertLess(len(flagged), 10)
+                self.assertTrue(np.isnan(result["baseline"][:history_analytics.MIN_PERIODS]).all())
+
+    def test_unknown_method(self):
+        """Test that an unknown detection method is rejected."""
+        with self.assertRaises(ValueError):
+            history_analytics.detect_anomalies(self.timestamps, self.values, "nope")
+
+    def test_analyze_history_columns(self):
+        """Test the per-metric result of the whole history, empty history included."""
+        columns = {"timestamp": self.timestamps, "download_speed": self.values,
+                   "upload_speed": self.values / 4, "ping": np.full(400, 12.0)}
+
+        analysis = history_analytics.analyze_history(columns, {"anomaly_threshold": 4.0})
+
+        self.assertEqual(set(analysis), set(history_analytics.METRICS))
+        self.assertEqual(len(analysis["download_speed"]["p90"]), 400)
+        self.assertTrue(analysis["download_speed"]["anomaly"][50])
+        self.assertFalse(analysis["ping"]["anomaly"].any())
+
+        settings = {"anomaly_percentiles": [25, 75], "anomaly_max_runs": 10}
+        analysis = history_analytics.analyze_history(columns, settings, ("download_speed",))
+        result = analysis["download_speed"]
+        self.assertEqual({"p25", "p75"}, {key for key in result if key.startswith("p")})
+        median, _, _, counts = history_analytics.rolling_mad(
+            self.timestamps, self.values, history_analytics.DEFAULT_WINDOW, 10,
+            include_current=False
+        )
+        self.assertEqual(counts.max(), 10)
+        ready = counts >= history_analytics.MIN_PERIODS
+        np.testing.assert_array_equal(result["baseline"][ready], median[ready])
+
+        empty = {name: np.array([]) for name in columns}
+        self.assertEqual(len(history_analytics.analyze_history(empty)["ping"]["mean"]), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import unittest
+import os
+import tempfile
+import shutil
+from unittest.mock import patch
+import numpy as np
+from speedtest_app import history_cache
+from speedtest_app.history_store import BinaryHistoryStore, JsonlHistoryStore, make_record
+
+
+class TestHistoryCache(unittest.TestCase):
+    """Tests for the history_cache module."""
+
+    def setUp(self):
+        """Set up a history file and a private cache directory."""
+        self.test_dir = tempfile.mkdtemp()
+        self.cache_root = os.path.join(self.test_dir, "cache")
+        self.store = JsonlHistoryStore(os.path.join(self.test_dir, "history.jsonl"))
+        self.store.extend([
+            make_record(100.0, 50.0, 10.0, "2024-04-01 12:00:00"),
+            make_record(80.0, 40.0, 20.0, "2024-04-02 12:00:00"),
+        ])
+        patcher = patch.object(history_cache, "ensure_user_data_dir", return_value=self.cache_root)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        """Clean up after tests."""
+        shutil.rmtree(self.test_dir)
+
+    def test_load_builds_memory_mapped_columns(self):
+        """Test that a stale cache is rebuilt and served as memory maps."""
+        columns = history_cache.load_history_columns(self.store)
+
+        np.testing.assert_array_equal(columns["download_speed"], [100.0, 80.0])
+        np.testing.assert_array_equal(columns["ping"], [10.0, 20.0])
+        self.assertEqual(columns["timestamp"].dtype, np.int64)
+        self.assertEqual(columns["timestamp"][0],
+                         history_cache.timestamp_to_epoch("2024-04-01 12:00:00"))
+        self.assertIsInstance(columns["upload_speed"].base, np.memmap)
+
+    def test_append_updates_cache_incrementally(self):
+        """Test that saving a run extends a fresh cache without a rebuild."""
+        history_cache.load_history_columns(self.store)
+
+        with patch.object(history_cache.ColumnarHistoryCache, "rebuild") as mock_rebuild:
+            for i in range(history_cache.INITIAL_CAPACITY):
+                history_cache.append_to_history(self.store, make_record(float(i), 1.0, 1.0))
+            columns = history_cache.load_history_columns(self.store)
+            mock_rebuild.assert_not_called()
+
+        self.assertEqual(len(columns["download_speed"]), history_cache.INITIAL_CAPACITY + 2)
+        self.assertEqual(columns["download_speed"][-1], history_cache.INITIAL_CAPACITY - 1)
+
+    def test_external_change_triggers_rebuild(self):
+        """Test that a history file changed behind the cache is re-read."""
+        history_cache.load_history_columns(self.store)
+        self.store.append(make_record(5.0, 5.0, 5.0))
+
+        columns = history_cache.load_history_columns(self.store)
+
+        self.assertEqual(len(columns["download_speed"]), 3)
+        stats = history_cache.column_statistics(columns)
+        self.assertEqual(stats["download_speed"]["max"], 100.0)
+        self.assertEqual(stats["download_speed"]["median"], 80.0)
+
+    def test_loaded_latency_columns(self):
+        """Test that latency under load is cached, NaN for runs without it."""
+        history_cache.load_history_columns(self.store)
+        history_cache.append_to_history(self.store, make_record(
+            90.0, 45.0, 11.0, latency={"download_latency_median": 60.0}
+        ))
+
+        columns = history_cache.load_history_columns(self.store)
+
+        np.testing.assert_array_equal(columns["download_latency_median"], [np.nan, np.nan, 60.0])
+        self.assertTrue(np.isnan(columns["upload_latency_median"]).all())
+
+    def test_cache_with_other_columns_is_rebuilt(self):
+        """Test that a cache written before a column was added is not reused."""
+        history_cache.load_history_columns(self.store)
+        cache = history_cache.ColumnarHistoryCache.for_store(self.store)
+        del cache._meta["columns"]
+        cache._save_meta()
+
+        self.assertFalse(history_cache.ColumnarHistoryCache.for_store(self.store).is_fresh())
+        columns = history_cache.load_history_columns(self.store)
+        self.assertEqual(len(columns["upload_latency_median"]), 2)
+
+
+    def test_binary_history_is_mapped_directly(self):
+        """Test that a binary history is served from its own file, without a cache."""
+        store = BinaryHistoryStore(os.path.join(self.test_dir, "history.bin"))
+        history_cache.append_to_history(store, make_record(
+            70.0, 35.0, 9.0, "2024-04-01 12:00:00", latency={"upload_latency_median": 42.5}
+        ))
+
+        columns = history_cache.load_history_columns(store)
+
+        np.testing.assert_array_equal(columns["download_speed"], [70.0])
+        np.testing.assert_array_equal(columns["upload_latency_median"], [42.5])
+        self.assertTrue(np.isnan(columns["download_latency_median"][0]))
+        self.assertEqual(columns["timestamp"][0],
+                         history_cache.timestamp_to_epoch("2024-04-01 12:00:00"))
+        self.assertFalse(os.path.exists(self.cache_root))
+
+
+if __name__ == '__main__':
+    unittest.main()
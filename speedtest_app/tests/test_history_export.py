@@ -0,0 +1,110 @@
+import unittest
+import os
+import csv
+import gzip
+import tempfile
+import shutil
+import threading
+from unittest.mock import patch
+from speedtest_app import history_cache, history_export
+from speedtest_app.history_store import JsonlHistoryStore, make_record
+
+
+class TestHistoryExport(unittest.TestCase):
+    """Tests for the history_export module."""
+
+    def setUp(self):
+        """Set up a history with a field that contains a comma."""
+        self.test_dir = tempfile.mkdtemp()
+        self.store = JsonlHistoryStore(os.path.join(self.test_dir, "history.jsonl"))
+        self.store.extend(
+            make_record(float(i), 1.0, 2.0, f"2024-04-{i + 1:02d} 12:00:00") for i in range(20)
+        )
+        self.store.append(make_record(5.0, 5.0, 5.0, "2024-05-01, late"))
+
+    def tearDown(self):
+        """Clean up after tests."""
+        shutil.rmtree(self.test_dir)
+
+    def test_export_csv_with_range_and_progress(self):
+        """Test a range-limited export and its progress reports."""
+        path = os.path.join(self.test_dir, "out.csv")
+        progress = []
+
+        rows = history_export.export_history(
+            self.store, path, start="2024-04-05 00:00:00", end="2024-04-10 23:59:59",
+            chunk_size=2, progress_callback=lambda done, total: progress.append((done, total))
+        )
+
+        self.assertEqual(rows, 6)
+        with open(path, newline="", encoding="utf-8") as f:
+            data = list(csv.reader(f))
+        self.assertEqual(tuple(data[0]), history_export.CSV_HEADER)
+        self.assertEqual(data[1][1], "2024-04-05 12:00:00")
+        self.assertEqual(progress[0], (0, 21))
+        self.assertEqual(progress[-1], (6, 21))
+
+    def test_export_gzip_quotes_commas(self):
+        """Test gzip output and proper quoting of fields with commas."""
+        path = os.path.join(self.test_dir, "out.csv.gz")
+
+        history_export.export_history(self.store, path)
+
+        with gzip.open(path, "rt", newline="", encoding="utf-8") as f:
+            data = list(csv.reader(f))
+        self.assertEqual(len(data), 22)
+        self.assertEqual(data[-1][1], "2024-05-01, late")
+
+    @unittest.skipIf(os.name == "nt", "POSIX file modes")
+    def test_export_gets_regular_file_mode(self):
+        """Test that a new export follows the umask and an overwritten one keeps its mode."""
+        path = os.path.join(self.test_dir, "out.csv")
+        umask = os.umask(0o027)
+        try:
+            history_export.export_history(self.store, path)
+        finally:
+            os.umask(umask)
+        self.assertEqual(os.stat(path).st_mode & 0o777, 0o640)
+
+        os.chmod(path, 0o604)
+        history_export.export_history(self.store, path)
+        self.assertEqual(os.stat(path).st_mode & 0o777, 0o604)
+
+    def test_export_with_speed_filter_and_sort(self):
+        """Test that the history window's filter and sort carry over to the file."""
+        path = os.path.join(self.test_dir, "out.csv")
+
+        with patch.object(history_cache, "ensure_user_data_dir",
+                          return_value=os.path.join(self.test_dir, "cache")):
+            rows = history_export.export_history(
+                self.store, path, start="2024-04-03 12:00:00", end="2024-04-10 12:00:00",
+                max_download=6.0, sort_by="download_speed", descending=True
+            )
+
+        self.assertEqual(rows, 4)
+        with open(path, newline="", encoding="utf-8") as f:
+            data = list(csv.reader(f))[1:]
+        self.assertEqual([float(row[2]) for row in data], [5.0, 4.0, 3.0, 2.0])
+        self.assertEqual([row[0] for row in data], ["6", "5", "4", "3"])
+
+    def test_cancelled_job_leaves_no_file(self):
+        """Test that cancelling an export removes the partial output."""
+        path = os.path.join(self.test_dir, "out.csv")
+        cancel_event = threading.Event()
+        cancel_event.set()
+
+        with self.assertRaises(history_export.ExportCancelled):
+            history_export.export_history(self.store, path, chunk_size=1,
+                                          cancel_event=cancel_event)
+
+        self.assertEqual(os.listdir(self.test_dir), ["history.jsonl"])
+
+    def test_job_runs_in_background(self):
+        """Test the worker-thread job wrapper."""
+        job = history_export.HistoryExportJob(self.store, os.path.join(self.test_dir, "a.csv"))
+        self.assertEqual(job.submit().result(timeout=10), 21)
+        self.assertEqual(job.fraction_done(), 1.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+import os
+import tempfile
+import shutil
+from unittest.mock import patch
+from speedtest_app import history_cache
+from speedtest_app.history_pager import HistoryPager, parse_filter_time
+from speedtest_app.history_store import JsonlHistoryStore, make_record
+
+
+class TestHistoryPager(unittest.TestCase):
+    """Tests for the history_pager module."""
+
+    def setUp(self):
+        """Set up a small history and a private cache directory."""
+        self.test_dir = tempfile.mkdtemp()
+        patcher = patch.object(history_cache, "ensure_user_data_dir",
+                               return_value=os.path.join(self.test_dir, "cache"))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        store = JsonlHistoryStore(os.path.join(self.test_dir, "history.jsonl"))
+        store.extend([
+            make_record(100.0, 50.0, 10.0, "2024-04-01 12:00:00"),
+            make_record(20.0, 10.0, 30.0, "2024-04-02 12:00:00"),
+            make_record(90.0, 40.0, 12.0, "2024-04-03 12:00:00"),
+            make_record(5.0, 1.0, 80.0, "2024-04-04 12:00:00"),
+        ])
+        self.pager = HistoryPager(store)
+
+    def tearDown(self):
+        """Clean up after tests."""
+        shutil.rmtree(self.test_dir)
+
+    def test_rows_are_paged_in_chronological_order(self):
+        """Test that rows come back one window at a time."""
+        self.assertEqual(len(self.pager), 4)
+        page = self.pager.rows(1, 2)
+        self.assertEqual([row[0] for row in page], [2, 3])
+        self.assertEqual(page[0][1], "2024-04-02 12:00:00")
+        self.assertEqual(page[0][2], 20.0)
+
+    def test_sort_and_filter(self):
+        """Test sorting by a column and filtering by date and speed."""
+        self.pager.set_query(sort_by="download_speed", descending=True)
+        self.assertEqual([row[2] for row in self.pager.rows(0, 10)], [100.0, 90.0, 20.0, 5.0])
+
+        self.pager.set_query(
+            sort_by="ping",
+            descending=False,
+            start=parse_filter_time("2024-04-02"),
+            end=parse_filter_time("2024-04-04", end_of_day=True),
+            max_download=50.0
+        )
+        self.assertEqual([row[0] for row in self.pager.iter_rows(chunk_size=1)], [2, 4])
+
+    def test_invalid_filter_values(self):
+        """Test that bad sort keys and dates are rejected."""
+        with self.assertRaises(ValueError):
+            self.pager.set_query(sort_by="server")
+        with self.assertRaises(ValueError):
+            parse_filter_time("04/02/2024")
+        self.assertIsNone(parse_filter_time(""))
+
+
+if __name__ == '__main__':
+    unittest.main()
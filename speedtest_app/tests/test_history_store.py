@@ -0,0 +1,340 @@
+import unittest
+import os
+import json
+import tempfile
+import shutil
+import sqlite3
+from unittest.mock import patch
+from speedtest_app import history_store
+
+
+class TestHistoryStore(unittest.TestCase):
+    """Tests for the history_store module."""
+
+    def setUp(self):
+        """Set up a temporary directory for test files."""
+        self.test_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.test_dir, "history.jsonl")
+        self.legacy_path = os.path.join(self.test_dir, "history.json")
+
+    def tearDown(self):
+        """Clean up after tests."""
+        shutil.rmtree(self.test_dir)
+
+    def test_append_writes_one_line_per_record(self):
+        """Test that each append adds exactly one JSON line."""
+        store = history_store.JsonlHistoryStore(self.path)
+        for i in range(3):
+            store.append(history_store.make_record(10.0 * i, 5.0, 20.0))
+
+        with open(self.path, 'r', encoding='utf-8') as f:
+            lines = f.read().splitlines()
+
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(json.loads(lines[2])["download_speed"], 20.0)
+        self.assertEqual(store.count(), 3)
+
+    def test_append_after_torn_line(self):
+        """Test that a record is not glued onto a partially written line."""
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write('{"download_speed": 1')
+
+        store = history_store.JsonlHistoryStore(self.path)
+        store.append(history_store.make_record(100.0, 50.0, 10.0))
+
+        records = list(store)
+        self.assertEqual(len(records), 1)
+        self.assertEqual(records[0]["download_speed"], 100.0)
+
+    def test_open_store_migrates_legacy_history(self):
+        """Test the one-time migration from the legacy JSON array."""
+        legacy = [history_store.make_record(80.0, 40.0, 15.0, "2024-04-01 12:00:00"),
+                  history_store.make_record(90.0, 45.0, 12.0, "2024-04-02 12:00:00")]
+        with open(self.legacy_path, 'w', encoding='utf-8') as f:
+            json.dump(legacy, f, indent=4)
+
+        store = history_store.open_history_store(self.path, self.legacy_path)
+
+        self.assertEqual(list(store), legacy)
+        self.assertTrue(os.path.exists(self.legacy_path))
+        self.assertFalse(history_store.is_legacy_history_file(self.path))
+
+        # A second open must not migrate again
+        store.append(history_store.make_record(1.0, 1.0, 1.0))
+        store = history_store.open_history_store(self.path, self.legacy_path)
+        self.assertEqual(store.count(), 3)
+
+    def test_switching_engines_keeps_every_run(self):
+        """Test that runs saved under another engine show up after switching back."""
+        settings = {"history_backend": "jsonl"}
+        with patch.object(history_store, "load_settings", return_value=settings), \
+                patch.object(history_store.os.path, "expanduser", return_value=self.test_dir):
+            os.mkdir(os.path.join(self.test_dir, "Downloads"))
+            history_store.get_history_store().extend([
+                history_store.make_record(1.0, 1.0, 1.0, "2024-04-01 12:00:00"),
+                history_store.make_record(2.0, 1.0, 1.0, "2024-04-02 12:00:00"),
+            ])
+            settings["history_backend"] = "sqlite"
+            sqlite_store = history_store.get_history_store()
+            sqlite_store.append(history_store.make_record(3.0, 1.0, 1.0, "2024-04-03 12:00:00"))
+            settings["history_backend"] = "jsonl"
+            jsonl_store = history_store.get_history_store()
+            settings["history_backend"] = "sqlite"
+            sqlite_again = history_store.get_history_store()
+
+        self.assertIsInstance(sqlite_store, history_store.SQLiteHistoryStore)
+        self.assertEqual([r["download_speed"] for r in jsonl_store], [1.0, 2.0, 3.0])
+        self.assertEqual([r["download_speed"] for r in sqlite_again], [1.0, 2.0, 3.0])
+
+    def test_merge_keeps_timestamp_order(self):
+        """Test that older runs from another file are merged in timestamp order."""
+        store = history_store.JsonlHistoryStore(self.path)
+        store.extend([history_store.make_record(1.0, 1.0, 1.0, "2024-04-01 12:00:00"),
+                      history_store.make_record(3.0, 1.0, 1.0, "2024-04-03 12:00:00")])
+        other = history_store.BinaryHistoryStore(os.path.join(self.test_dir, "history.bin"))
+        other.extend([history_store.make_record(1.0, 1.0, 1.0, "2024-04-01 12:00:00"),
+                      history_store.make_record(2.0, 1.0, 1.0, "2024-04-02 12:00:00")])
+
+        self.assertEqual(history_store.merge_history(store, [other.path]), 1)
+        self.assertEqual([r["download_speed"] for r in store], [1.0, 2.0, 3.0])
+        self.assertEqual(history_store.merge_history(store, [other.path]), 0)
+
+    def test_make_record_keeps_latency_fields(self):
+        """Test that latency fields of a result are copied and other keys are not."""
+        result = {"download": 100.0, "latency_median": 12.0, "latency_p99": 30.0,
+                  "jitter": None, "download_streams": 8}
+
+        record = history_store.make_record(100.0, 50.0, 10.0, "2024-04-01 12:00:00",
+                                           latency=result)
+
+        self.assertEqual(record, {"timestamp": "2024-04-01 12:00:00", "download_speed": 100.0,
+                                  "upload_speed": 50.0, "ping": 10.0,
+                                  "latency_median": 12.0, "latency_p99": 30.0})
+
+    def test_last_runs_reads_from_the_end(self):
+        """Test last_runs across read blocks, skipping blank and corrupted lines."""
+        store = history_store.JsonlHistoryStore(self.path)
+        store.extend(history_store.make_record(float(i), 1.0, 1.0) for i in range(2000))
+        with open(self.path, "a", encoding="utf-8") as file:
+            file.write("\n{not json\n")
+
+        last = store.last_runs(3)
+
+        self.assertEqual([r["download_speed"] for r in last], [1997.0, 1998.0, 1999.0])
+        self.assertEqual(len(store.last_runs(5000)), 2000)
+        self.assertEqual(history_store.JsonlHistoryStore(
+            os.path.join(self.test_dir, "missing.jsonl")).last_runs(1), [])
+
+
+class TestSQLiteHistoryStore(unittest.TestCase):
+    """Tests for the SQLite history engine and its queries."""
+
+    def setUp(self):
+        """Set up a database with a few runs."""
+        self.test_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.test_dir, "history.db")
+        self.store = history_store.open_history_store(self.path)
+        self.store.extend([
+            history_store.make_record(100.0, 50.0, 10.0, "2024-04-01 12:00:00"),
+            history_store.make_record(20.0, 10.0, 30.0, "2024-04-02 12:00:00"),
+            history_store.make_record(90.0, 40.0, 12.0, "2024-04-03 12:00:00"),
+            history_store.make_record(5.0, 1.0, 80.0, "2024-04-04 12:00:00"),
+        ])
+
+    def tearDown(self):
+        """Clean up after tests."""
+        shutil.rmtree(self.test_dir)
+
+    def test_engine_selected_by_extension(self):
+        """Test that .db paths open the SQLite engine."""
+        self.assertIsInstance(self.store, history_store.SQLiteHistoryStore)
+        self.assertEqual(self.store.count(), 4)
+
+    def test_queries(self):
+        """Test time-range, last N and below-threshold queries."""
+        between = self.store.runs_between("2024-04-02 00:00:00", "2024-04-03 23:59:59")
+        self.assertEqual([r["download_speed"] for r in between], [20.0, 90.0])
+
+        last = self.store.last_runs(2)
+        self.assertEqual([r["timestamp"] for r in last],
+                         ["2024-04-03 12:00:00", "2024-04-04 12:00:00"])
+
+        below = self.store.runs_below(50.0)
+        self.assertEqual([r["download_speed"] for r in below], [20.0, 5.0])
+
+    def test_queries_do_not_create_a_database(self):
+        """Test that queries on a missing database return nothing and leave no file."""
+        path = os.path.join(self.test_dir, "missing.db")
+        store = history_store.SQLiteHistoryStore(path)
+
+        self.assertEqual(store.last_runs(3), [])
+        self.assertEqual(store.runs_below(50.0), [])
+        self.assertEqual(store.count(), 0)
+        self.assertFalse(os.path.exists(path))
+
+    def test_queries_match_jsonl_engine(self):
+        """Test that both engines answer queries identically."""
+        jsonl = history_store.open_history_store(
+            os.path.join(self.test_dir, "history.jsonl"), self.path
+        )
+        self.assertIsInstance(jsonl, history_store.JsonlHistoryStore)
+        self.assertEqual(jsonl.runs_between(end="2024-04-02 12:00:00"),
+                         self.store.runs_between(end="2024-04-02 12:00:00"))
+        self.assertEqual(jsonl.last_runs(3), self.store.last_runs(3))
+        self.assertEqual(jsonl.runs_below(95.0), self.store.runs_below(95.0))
+
+    def test_latency_fields_round_trip(self):
+        """Test that latency fields are stored and older rows come back without them."""
+        latency = {"latency_min": 9.0, "latency_median": 11.0, "latency_p95": 15.0,
+                   "latency_p99": 25.0, "jitter": 1.2, "packet_loss": 0.0,
+                   "download_latency_median": 60.0, "download_latency_delta": 49.0,
+                   "download_latency_series": [55.0, None, 65.0]}
+        self.store.append(history_store.make_record(
+            80.0, 30.0, 11.0, "2024-04-05 12:00:00", latency=latency
+        ))
+
+        first, last = self.store.last_runs(5)[0], self.store.last_runs(1)[0]
+        self.assertNotIn("latency_median", first)
+        self.assertNotIn("download_latency_series", first)
+        self.assertEqual({field: last[field] for field in latency}, latency)
+        self.assertNotIn("upload_latency_series", last)
+
+    def test_interface_counter_fields_round_trip(self):
+        """Test that interface bytes come back as integers and series as lists."""
+        nic = {"download_nic_mbps": 410.5, "download_nic_bytes": 513_125_000,
+               "download_nic_series": [380.0, 420.0, 431.5]}
+        self.store.append(history_store.make_record(
+            400.0, 30.0, 11.0, "2024-04-05 12:00:00", latency=nic
+        ))
+
+        last = self.store.last_runs(1)[0]
+        self.assertEqual({field: last[field] for field in nic}, nic)
+        self.assertIsInstance(last["download_nic_bytes"], int)
+
+    def test_database_without_latency_columns_is_upgraded(self):
+        """Test that a database created before the latency fields gains the columns."""
+        path = os.path.join(self.test_dir, "old.db")
+        with sqlite3.connect(path) as connection:
+            connection.execute(
+                "CREATE TABLE history (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                "timestamp TEXT NOT NULL, download_speed REAL NOT NULL, "
+                "upload_speed REAL NOT NULL, ping REAL NOT NULL)"
+            )
+            connection.execute("INSERT INTO history (timestamp, download_speed, upload_speed, "
+                               "ping) VALUES ('2024-04-01 12:00:00', 1.0, 2.0, 3.0)")
+        connection.close()
+        store = history_store.open_history_store(path)
+
+        store.append(history_store.make_record(4.0, 5.0, 6.0, latency={"jitter": 0.5}))
+
+        records = list(store.iter_records())
+        self.assertEqual(len(records), 2)
+        self.assertEqual(records[1]["jitter"], 0.5)
+
+
+class TestBinaryHistoryStore(unittest.TestCase):
+    """Tests for the fixed-width binary history engine and the format converter."""
+
+    def setUp(self):
+        """Set up a binary history with a few runs."""
+        self.test_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.test_dir, "history.bin")
+        self.records = [
+            history_store.make_record(100.0, 50.0, 10.0, "2024-04-01 12:00:00"),
+            history_store.make_record(20.0, 10.0, 30.0, "2024-04-02 12:00:00"),
+            history_store.make_record(90.0, 40.0, 12.0, "2024-04-03 12:00:00"),
+            history_store.make_record(5.0, 1.0, 80.0, "2024-04-04 12:00:00"),
+        ]
+        self.store = history_store.open_history_store(self.path)
+        self.store.extend(self.records)
+
+    def tearDown(self):
+        """Clean up after tests."""
+        shutil.rmtree(self.test_dir)
+
+    def test_fixed_width_records_with_random_access(self):
+        """Test the file size and reading single runs by index."""
+        self.assertIsInstance(self.store, history_store.BinaryHistoryStore)
+        self.assertEqual(os.path.getsize(self.path),
+                         history_store.BINARY_HEADER.size + 4 * history_store.binary_dtype().itemsize)
+        self.assertEqual(self.store.count(), 4)
+        self.assertEqual(self.store[2], self.records[2])
+        self.assertEqual(self.store[-1], self.records[3])
+        with self.assertRaises(IndexError):
+            self.store[4]
+
+    def test_queries_match_jsonl_engine(self):
+        """Test that the binary and JSON lines engines answer queries identically."""
+        jsonl = history_store.open_history_store(
+            os.path.join(self.test_dir, "history.jsonl"), self.path
+        )
+        self.assertEqual(list(jsonl), self.records)
+        self.assertEqual(self.store.runs_between("2024-04-02 00:00:00", "2024-04-03 23:59:59"),
+                         jsonl.runs_between("2024-04-02 00:00:00", "2024-04-03 23:59:59"))
+        self.assertEqual(self.store.last_runs(3), jsonl.last_runs(3))
+        self.assertEqual(self.store.runs_below(95.0), jsonl.runs_below(95.0))
+
+    def test_optional_fields_round_trip(self):
+        """Test latency and interface fields; series are not kept."""
+        fields = {"latency_min": 9.123, "latency_median": 11.0, "jitter": 1.2,
+                  "packet_loss": 2.5, "download_latency_delta": -0.75,
+                  "upload_latency_p95": 812.345, "download_nic_mbps": 410.123456,
+                  "download_nic_bytes": 513_125_000, "download_nic_series": [380.0, 420.0]}
+        self.store.append(history_store.make_record(
+            400.0, 30.0, 11.0, "2024-04-05 12:00:00", latency=fields
+        ))
+
+        last = self.store[-1]
+        del fields["download_nic_series"]
+        self.assertEqual({field: last[field] for field in fields}, fields)
+        self.assertNotIn("download_nic_series", last)
+        self.assertNotIn("upload_nic_bytes", last)
+        self.assertNotIn("jitter", self.store[0])
+
+    def test_torn_record_is_overwritten(self):
+        """Test that a partially written last record is ignored and replaced."""
+        with open(self.path, "ab") as f:
+            f.write(b"\x01" * 10)
+        self.assertEqual(self.store.count(), 4)
+
+        self.store.append(history_store.make_record(1.0, 2.0, 3.0, "2024-04-06 12:00:00"))
+
+        self.assertEqual(self.store.count(), 5)
+        self.assertEqual(self.store[4]["download_speed"], 1.0)
+
+    def test_rejects_other_files(self):
+        """Test that a file without the binary header is not read as history."""
+        path = os.path.join(self.test_dir, "other.bin")
+        with open(path, "wb") as f:
+            f.write(b"not a history file at all")
+
+        with self.assertRaises(ValueError):
+            list(history_store.BinaryHistoryStore(path))
+
+    def test_convert_to_and_from_legacy_json(self):
+        """Test converting binary history to the legacy JSON array and back."""
+        legacy_path = os.path.join(self.test_dir, "legacy.json")
+        converted_path = os.path.join(self.test_dir, "converted.bin")
+
+        self.assertEqual(history_store.convert_history(self.path, legacy_path), 4)
+        self.assertTrue(history_store.is_legacy_history_file(legacy_path))
+        with open(legacy_path, "r", encoding="utf-8") as f:
+            self.assertEqual(json.load(f), self.records)
+
+        self.assertEqual(history_store.convert_history(legacy_path, converted_path), 4)
+        with open(self.path, "rb") as original, open(converted_path, "rb") as converted:
+            self.assertEqual(original.read(), converted.read())
+
+    def test_convert_rejects_unknown_format_and_same_file(self):
+        """Test converter argument checks."""
+        with self.assertRaises(ValueError):
+            history_store.convert_history(self.path, os.path.join(self.test_dir, "x.bin"), "xml")
+        with self.assertRaises(ValueError):
+            history_store.convert_history(self.path, self.path)
+        with self.assertRaises(FileNotFoundError):
+            history_store.convert_history(os.path.join(self.test_dir, "missing.jsonl"),
+                                          os.path.join(self.test_dir, "x.bin"))
+
+
+if __name__ == '__main__':
+    unittest.main()
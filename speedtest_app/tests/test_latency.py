@@ -0,0 +1,98 @@
+import unittest
+import time
+import asyncio
+from speedtest_app import latency
+from speedtest_app.local_server import LocalSpeedtestServer
+
+
+class TestLatency(unittest.TestCase):
+    """Tests for the latency module."""
+
+    def test_statistics(self):
+        """Test min, median, percentiles, jitter and loss of known samples."""
+        samples = [float(ms) for ms in range(1, 101)]
+
+        stats = latency.latency_statistics(samples, sent=125)
+
+        self.assertEqual(stats["latency_min"], 1.0)
+        self.assertEqual(stats["latency_median"], 50.5)
+        self.assertAlmostEqual(stats["latency_p95"], 95.05)
+        self.assertAlmostEqual(stats["latency_p99"], 99.01)
+        self.assertEqual(stats["jitter"], 1.0)
+        self.assertEqual(stats["packet_loss"], 20.0)
+
+    def test_statistics_without_answers(self):
+        """Test that a fully lost probe run reports 100 % loss and no latency."""
+        stats = latency.latency_statistics([], sent=10)
+
+        self.assertIsNone(stats["latency_median"])
+        self.assertEqual(stats["packet_loss"], 100.0)
+
+    def test_paced_probes_against_local_server(self):
+        """Test paced probes of a stand-in server with injected latency."""
+        with LocalSpeedtestServer(latency_ms=20) as server:
+            target = {"url": f"{server.base_url}/speedtest/upload.php"}
+            stats = latency.measure_latency(target, count=5, interval=0.01)
+
+        self.assertEqual(stats["packet_loss"], 0.0)
+        self.assertGreaterEqual(stats["latency_min"], 20.0)
+        self.assertLess(stats["latency_median"], 200.0)
+
+    def test_concurrent_probes_split_across_connections(self):
+        """Test that concurrent mode sends every probe over several connections."""
+        with LocalSpeedtestServer(latency_ms=50) as server:
+            target = {"url": f"{server.base_url}/speedtest/upload.php"}
+            results = asyncio.run(latency.probe_latency(
+                target, count=8, mode=latency.MODE_CONCURRENT, connections=4
+            ))
+
+        self.assertEqual(len(results), 8)
+        self.assertTrue(all(rtt is not None and rtt >= 50.0 for rtt in results))
+
+    def test_lost_probes_are_counted(self):
+        """Test that probes to a closed port count as lost."""
+        stats = latency.measure_latency({"url": "http://127.0.0.1:1/upload.php"}, count=3,
+                                        interval=0, timeout=0.5)
+
+        self.assertEqual(stats["packet_loss"], 100.0)
+        self.assertIsNone(stats["latency_min"])
+
+    def test_latency_series_buckets_per_second(self):
+        """Test per-second medians with a fully lost second in between."""
+        samples = [(0.1, 10.0), (0.5, 20.0), (0.9, 30.0), (1.2, None), (2.4, 50.0)]
+
+        self.assertEqual(latency.latency_series(samples), [20.0, None, 50.0])
+        self.assertEqual(latency.latency_series([]), [])
+
+    def test_loaded_latency_summary(self):
+        """Test loaded median, p95, delta against the idle latency and the series."""
+        samples = [(i / 10, 40.0 + i) for i in range(20)]
+
+        summary = latency.loaded_latency_summary(samples, idle_latency=10.0, direction="upload")
+
+        self.assertEqual(summary["upload_latency_median"], 49.5)
+        self.assertEqual(summary["upload_latency_delta"], 39.5)
+        self.assertAlmostEqual(summary["upload_latency_p95"], 58.05)
+        self.assertEqual(summary["upload_latency_series"], [44.5, 54.5])
+
+    def test_loaded_sampler_probes_until_stopped(self):
+        """Test that the background sampler keeps probing and stops promptly."""
+        with LocalSpeedtestServer(latency_ms=5) as server:
+            target = {"url": f"{server.base_url}/speedtest/upload.php"}
+            sampler = latency.LoadedLatencySampler(target, interval=0.02).start()
+            time.sleep(0.3)
+            stopping = time.monotonic()
+            samples = sampler.stop()
+            stop_time = time.monotonic() - stopping
+            time.sleep(0.1)
+
+        self.assertGreaterEqual(len(samples), 3)
+        self.assertEqual(len(sampler.samples), len(samples))
+        self.assertLess(stop_time, 0.5)
+        self.assertTrue(all(rtt >= 5.0 for _, rtt in samples))
+        offsets = [t for t, _ in samples]
+        self.assertEqual(offsets, sorted(offsets))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+import os
+import time
+import tempfile
+import shutil
+import urllib.request
+from speedtest_app.local_server import LocalSpeedtestServer, RedirectingOpener, TokenBucket
+from speedtest_app.server_cache import ServerCache
+from speedtest_app.speedtest_service import SpeedTestService
+
+
+class TestLocalServer(unittest.TestCase):
+    """Tests for the local stand-in speed test server."""
+
+    def setUp(self):
+        """Set up a private server cache."""
+        self.test_dir = tempfile.mkdtemp()
+        self.cache = ServerCache(os.path.join(self.test_dir, "server_cache.json"),
+                                 fingerprint=lambda: "local")
+
+    def tearDown(self):
+        """Clean up after tests."""
+        shutil.rmtree(self.test_dir)
+
+    def test_token_bucket_limits_rate(self):
+        """Test that consuming beyond the burst waits for the configured rate."""
+        bucket = TokenBucket(1_000_000, burst=100_000)
+        start = time.monotonic()
+        for _ in range(4):
+            bucket.consume(100_000)
+        self.assertGreaterEqual(time.monotonic() - start, 0.25)
+
+    def test_redirects_speedtest_urls(self):
+        """Test that speedtest.net config requests reach the stand-in server."""
+        with LocalSpeedtestServer() as server:
+            opener = RedirectingOpener(urllib.request.build_opener(), server.base_url)
+            response = opener.open("http://www.speedtest.net/speedtest-config.php?x=1")
+            self.assertIn(b"<server-config", response.read())
+            response.close()
+
+            latency_url = f"{server.base_url}/speedtest/latency.txt"
+            with opener.open(latency_url) as response:
+                self.assertEqual(response.read(), b"test=test")
+
+    def test_service_measures_shaped_link(self):
+        """Test a full speed test against a shaped, delayed stand-in server."""
+        settings = {"engine_download_streams": 2, "engine_upload_streams": 2}
+        with LocalSpeedtestServer(download_mbps=40, upload_mbps=20, latency_ms=30,
+                                  test_length=1) as server:
+            settings["speedtest_server_url"] = server.base_url
+            service = SpeedTestService(settings, server_cache=self.cache)
+            result = service.run_speedtest().result(timeout=60)
+
+        self.assertNotIn("error", result)
+        self.assertLess(result["download"], 40 * 1.25)
+        self.assertGreater(result["download"], 5)
+        self.assertLess(result["upload"], 20 * 1.25)
+        self.assertGreater(result["upload"], 2)
+        self.assertGreaterEqual(result["ping"], 30)
+        self.assertLess(result["ping"], 60)
+        # Stand-in runs must not overwrite the cached speedtest.net servers
+        self.assertFalse(os.path.exists(self.cache.path))
+
+
+if __name__ == '__main__':
+    unittest.main()
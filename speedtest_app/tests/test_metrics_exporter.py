@@ -0,0 +1,151 @@
+import unittest
+import os
+import tempfile
+import shutil
+import urllib.request
+from unittest.mock import patch
+from speedtest_app import history_cache
+from speedtest_app.history_store import JsonlHistoryStore, make_record
+from speedtest_app.metrics_exporter import MetricsExporter, SpeedTestMetrics
+from speedtest_app.progress_events import PhaseChanged, SpeedTestFinished, TransferProgress
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def parse(text):
+    """Returns {sample name with labels: value} for a Prometheus text page."""
+    samples = {}
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            name, value = line.rsplit(" ", 1)
+            samples[name] = float(value)
+    return samples
+
+
+class TestMetricsExporter(unittest.TestCase):
+    """Tests for the metrics_exporter module."""
+
+    def setUp(self):
+        """Set up a history with two runs and a private cache directory."""
+        self.test_dir = tempfile.mkdtemp()
+        self.store = JsonlHistoryStore(os.path.join(self.test_dir, "history.jsonl"))
+        self.store.extend([
+            make_record(100.0, 50.0, 10.0, "2024-04-01 12:00:00"),
+            make_record(80.0, 40.0, 20.0, "2024-04-02 12:00:00"),
+        ])
+        patcher = patch.object(history_cache, "ensure_user_data_dir",
+                               return_value=os.path.join(self.test_dir, "cache"))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.clock = FakeClock()
+        self.metrics = SpeedTestMetrics(window=3, clock=self.clock)
+
+    def tearDown(self):
+        """Clean up after tests."""
+        shutil.rmtree(self.test_dir)
+
+    def _run_test(self, result):
+        self.metrics.put(PhaseChanged("server", "Finding best server..."))
+        self.clock.now += 1
+        self.metrics.put(PhaseChanged("download", "Testing download speed..."))
+        self.clock.now += 4
+        self.metrics.put(PhaseChanged("upload", "Testing upload speed..."))
+        self.clock.now += 5
+        self.metrics.put(SpeedTestFinished(result))
+
+    def test_history_seeds_last_result_and_percentiles(self):
+        """Test that the store's last run and recent values are exported."""
+        self.metrics.load_history(self.store)
+        samples = parse(self.metrics.render())
+
+        self.assertEqual(samples["speedtest_last_download_mbps"], 80.0)
+        self.assertEqual(samples["speedtest_history_runs"], 2)
+        self.assertEqual(samples['speedtest_download_mbps{quantile="0.5"}'], 90.0)
+        self.assertEqual(samples["speedtest_ping_ms_count"], 2)
+
+    def test_scrape_does_not_read_history(self):
+        """Test that scrapes are served from memory once the history is loaded."""
+        self.metrics.load_history(self.store)
+        with patch.object(history_cache, "load_history_columns") as mock_load, \
+                patch.object(JsonlHistoryStore, "iter_records") as mock_iter:
+            self.metrics.render()
+            self._run_test({"download": 60.0, "upload": 30.0, "ping": 5.0})
+            self.metrics.render()
+
+        mock_load.assert_not_called()
+        mock_iter.assert_not_called()
+
+    def test_finished_tests_update_counters_and_window(self):
+        """Test outcome counters, durations and the rolling window."""
+        self.metrics.load_history(self.store)
+        self._run_test({"download": 60.0, "upload": 30.0, "ping": 5.0})
+        self._run_test({"download": 40.0, "upload": 20.0, "ping": 7.0,
+                        "partial": True, "timed_out": ["upload"]})
+        self._run_test({"error": "No network"})
+        samples = parse(self.metrics.render())
+
+        self.assertEqual(samples['speedtest_tests_total{status="ok"}'], 1)
+        self.assertEqual(samples['speedtest_tests_total{status="partial"}'], 1)
+        self.assertEqual(samples['speedtest_tests_total{status="failed"}'], 1)
+        self.assertEqual(samples["speedtest_failures_total"], 1)
+        self.assertEqual(samples['speedtest_phase_timeouts_total{phase="upload"}'], 1)
+        self.assertEqual(samples["speedtest_last_download_mbps"], 40.0)
+        # Quantiles over the window of 3 (80 from the history, then 60 and 40);
+        # sum and count over every run, so they never go down
+        self.assertEqual(samples['speedtest_download_mbps{quantile="0.5"}'], 60.0)
+        self.assertEqual(samples["speedtest_download_mbps_sum"], 280.0)
+        self.assertEqual(samples["speedtest_download_mbps_count"], 4)
+        self.assertEqual(samples["speedtest_test_duration_seconds_count"], 3)
+        self.assertEqual(samples["speedtest_last_test_duration_seconds"], 10.0)
+        self.assertEqual(samples['speedtest_phase_duration_seconds_sum{phase="download"}'], 12.0)
+
+    def test_history_runs_count_appended_runs_only(self):
+        """Test that runs count once saved to the store, not when they finish."""
+        self.metrics.load_history(self.store)
+        other = JsonlHistoryStore(os.path.join(self.test_dir, "other.jsonl"))
+        with MetricsExporter(self.metrics, port=0):
+            self._run_test({"download": 60.0, "upload": 30.0, "ping": 5.0})
+            self.assertEqual(self.metrics.history_runs, 2)
+            history_cache.append_to_history(self.store, make_record(60.0, 30.0, 5.0))
+            history_cache.append_to_history(other, make_record(60.0, 30.0, 5.0))
+        history_cache.append_to_history(self.store, make_record(60.0, 30.0, 5.0))
+
+        self.assertEqual(parse(self.metrics.render())["speedtest_history_runs"], 3)
+
+    def test_live_state_while_running(self):
+        """Test the running gauge, phase and throughput during a test."""
+        self.metrics.put(PhaseChanged("download", "Testing download speed..."))
+        self.metrics.put(TransferProgress("download", 1000, 250_000_000, 0.5))
+        samples = parse(self.metrics.render())
+
+        self.assertEqual(samples["speedtest_test_running"], 1)
+        self.assertEqual(samples['speedtest_test_phase{phase="download"}'], 1)
+        self.assertEqual(samples["speedtest_current_throughput_mbps"], 250.0)
+
+    def test_empty_metrics_render(self):
+        """Test that missing values are exported as NaN."""
+        samples = parse(self.metrics.render())
+
+        self.assertNotEqual(samples["speedtest_last_ping_ms"], samples["speedtest_last_ping_ms"])
+        self.assertEqual(samples["speedtest_test_running"], 0)
+
+    def test_http_endpoint(self):
+        """Test that the exporter serves the metrics page over HTTP."""
+        self.metrics.load_history(self.store)
+        with MetricsExporter(self.metrics, port=0) as exporter:
+            with urllib.request.urlopen(exporter.url, timeout=5) as response:
+                content_type = response.headers["Content-Type"]
+                body = response.read().decode("utf-8")
+
+        self.assertTrue(content_type.startswith("text/plain; version=0.0.4"))
+        self.assertEqual(parse(body)["speedtest_last_upload_mbps"], 40.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,6 +2,8 @@
 import unittest
 from unittest.mock import patch, MagicMock
 import socket
+import queue
+import psutil
 from speedtest_app import network_adapter_information
 
 
@@ -23,16 +25,18 @@ class TestNetworkAdapter(unittest.TestCase):
             "lo0": MagicMock(bytes_sent=500, bytes_recv=500)
         }
         mock_psutil.net_io_counters.return_value = mock_net_io
+        mock_psutil.AF_LINK = psutil.AF_LINK
+        mock_psutil.net_if_stats.return_value = {"en0": MagicMock(isup=True)}
 
         # Mock network interfaces
         mock_address_en0_ip = MagicMock(family=socket.AF_INET, address="192.168.1.10",
                                     netmask="255.255.255.0")
-        mock_address_en0_mac = MagicMock(family=socket.AF_LINK, address="00:11:22:33:44:55")
+        mock_address_en0_mac = MagicMock(family=psutil.AF_LINK, address="00:11:22:33:44:55")
         mock_address_en0_ipv6 = MagicMock(family=socket.AF_INET6, address="fe80::1")
 
         mock_address_lo0_ip = MagicMock(family=socket.AF_INET, address="127.0.0.1",
                                     netmask="255.0.0.0")
-        mock_address_lo0_mac = MagicMock(family=socket.AF_LINK, address="00:00:00:00:00:00")
+        mock_address_lo0_mac = MagicMock(family=psutil.AF_LINK, address="00:00:00:00:00:00")
 
         mock_interfaces = {
             "en0": [mock_address_en0_ip, mock_address_en0_mac, mock_address_en0_ipv6],
@@ -59,6 +63,7 @@ class TestNetworkAdapter(unittest.TestCase):
             self.assertTrue(en0_adapter["Active"])
             self.assertEqual(en0_adapter["Bytes Sent"], 1000)
             self.assertEqual(en0_adapter["Bytes Received"], 2000)
+            self.assertTrue(en0_adapter["Up"])
 
     @patch('speedtest_app.network_adapter_information.platform')
     @patch('speedtest_app.network_adapter_information.psutil')
@@ -117,5 +122,95 @@ class TestNetworkAdapter(unittest.TestCase):
             self.assertEqual(result["Bytes Received"], 5000)
 
 
+def _fake_psutil(interfaces):
+    """A psutil stand-in reading interfaces: {name: (ip, up, bytes received)}."""
+    fake = MagicMock(AF_LINK=psutil.AF_LINK)
+    fake.net_if_addrs.side_effect = lambda: {
+        name: [MagicMock(family=socket.AF_INET, address=ip, netmask="255.255.255.0"),
+               MagicMock(family=psutil.AF_LINK, address=f"00:00:00:00:00:0{i}", netmask=None)]
+        for i, (name, (ip, _, _)) in enumerate(sorted(interfaces.items()))
+    }
+    fake.net_if_stats.side_effect = lambda: {
+        name: MagicMock(isup=up) for name, (_, up, _) in interfaces.items()
+    }
+    fake.net_io_counters.side_effect = lambda pernic: {
+        name: MagicMock(bytes_sent=0, bytes_recv=received)
+        for name, (_, _, received) in interfaces.items()
+    }
+    return fake
+
+
+class TestNetworkInfoService(unittest.TestCase):
+    """Tests for the cached NetworkInfoService."""
+
+    def setUp(self):
+        """Set up two fake interfaces and a service listening for changes."""
+        self.interfaces = {"en0": ("192.168.1.10", True, 5000), "en1": ("10.0.0.2", True, 100)}
+        patcher = patch.object(network_adapter_information, "psutil",
+                               _fake_psutil(self.interfaces))
+        self.psutil = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.service = network_adapter_information.NetworkInfoService()
+        self.changes = queue.Queue()
+        self.service.add_listener(self.changes)
+
+    def test_reads_are_served_from_the_cache(self):
+        """Test that repeated reads enumerate the interfaces only once."""
+        first = self.service.active_adapter()
+        for _ in range(5):
+            self.assertIs(self.service.active_adapter(), first)
+            self.assertTrue(self.service.get_active_adapter_async().done())
+
+        self.assertEqual(first["Adapter"], "en0")
+        self.assertEqual(self.psutil.net_if_addrs.call_count, 1)
+        self.assertEqual(self.changes.qsize(), 1)
+
+    def test_listeners_are_notified_only_on_change(self):
+        """Test that an unchanged refresh is silent but takes the new byte counters."""
+        self.service.refresh()
+        self.interfaces["en0"] = ("192.168.1.10", True, 9000)
+
+        self.assertFalse(self.service.refresh())
+        self.assertEqual(self.changes.qsize(), 1)
+        self.assertEqual(self.service.active_adapter()["Bytes Received"], 9000)
+        self.assertEqual(self.service.network_info()["Adapters"][0]["Bytes Received"], 9000)
+
+    def test_active_adapter_follows_the_counters(self):
+        """Test that an adapter overtaking the active one is reported without other changes."""
+        self.service.refresh()
+        self.interfaces["en1"] = ("10.0.0.2", True, 50000)
+
+        self.assertTrue(self.service.refresh())
+        self.assertEqual(self.service.active_adapter()["Adapter"], "en1")
+        self.changes.get_nowait()
+        self.assertEqual(self.changes.get_nowait().active_adapter["Adapter"], "en1")
+
+    def test_address_and_up_down_changes_are_detected(self):
+        """Test that a new address and a downed interface update the cache."""
+        self.service.refresh()
+        unchanged = self.service.network_info()["Adapters"][1]
+        self.interfaces["en0"] = ("192.168.1.11", True, 5000)
+
+        self.assertTrue(self.service.refresh())
+        info = self.service.network_info()
+        self.assertEqual(info["Adapters"][0]["IP Address"], "192.168.1.11")
+        self.assertEqual(info["Adapters"][1], unchanged)
+
+        self.interfaces["en1"] = ("10.0.0.2", False, 100)
+        self.assertTrue(self.service.refresh())
+        self.assertFalse(self.service.network_info()["Adapters"][1]["Up"])
+
+        events = [self.changes.get_nowait() for _ in range(3)]
+        self.assertEqual(events[-1].info, self.service.network_info())
+
+    def test_failed_refresh_keeps_the_snapshot(self):
+        """Test that a psutil error after the first read keeps the cached data."""
+        active = self.service.active_adapter()
+        self.psutil.net_if_addrs.side_effect = OSError("gone")
+
+        self.assertFalse(self.service.refresh())
+        self.assertIs(self.service.active_adapter(), active)
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
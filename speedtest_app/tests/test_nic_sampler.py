@@ -0,0 +1,133 @@
+import unittest
+import time
+from types import SimpleNamespace
+from unittest.mock import patch
+import numpy as np
+from speedtest_app import network_adapter_information, nic_sampler
+
+
+class FakeCounters:
+    """Interface counters that grow by a fixed amount on every read."""
+
+    def __init__(self, received_step, sent_step):
+        self.reads = 0
+        self.received_step = received_step
+        self.sent_step = sent_step
+
+    def __call__(self):
+        self.reads += 1
+        return {
+            "lo": SimpleNamespace(bytes_recv=10 ** 9, bytes_sent=10 ** 9),
+            "eth0": SimpleNamespace(bytes_recv=self.reads * self.received_step,
+                                    bytes_sent=self.reads * self.sent_step),
+            "wlan0": SimpleNamespace(bytes_recv=self.reads, bytes_sent=0),
+        }
+
+
+class TestNicSampler(unittest.TestCase):
+    """Tests for the nic_sampler module."""
+
+    def test_ring_keeps_the_newest_rows_in_order(self):
+        """Test that a full ring overwrites the oldest rows and returns them oldest first."""
+        ring = nic_sampler.CounterRing(3, (1, 2))
+        for i in range(5):
+            ring.append(float(i), [[i, 10 * i]])
+
+        times, values = ring.snapshot()
+
+        self.assertEqual(len(ring), 3)
+        self.assertEqual(times.tolist(), [2.0, 3.0, 4.0])
+        self.assertEqual(values[:, 0, 1].tolist(), [20, 30, 40])
+
+    def test_throughput_summary(self):
+        """Test totals, average and per-second series of a steady transfer."""
+        times = np.arange(0.0, 2.55, 0.05)
+        counted = times * 1_250_000                     # 10 Mbps
+
+        summary = nic_sampler.nic_throughput_summary(times, counted, "download")
+
+        self.assertEqual(summary["download_nic_bytes"], 3_125_000)
+        self.assertAlmostEqual(summary["download_nic_mbps"], 10.0)
+        self.assertEqual(len(summary["download_nic_series"]), 3)
+        np.testing.assert_allclose(summary["download_nic_series"], 10.0)
+
+    def test_sampler_reads_the_active_adapter(self):
+        """Test sampling of fake counters, per interface and per direction."""
+        counters = FakeCounters(received_step=125_000, sent_step=1000)
+        with nic_sampler.NicCounterSampler(interval=0.01, counters=counters,
+                                           active="eth0") as sampler:
+            time.sleep(0.1)
+
+        self.assertEqual(sampler.interfaces, ["eth0"])
+        totals = sampler.totals()
+        samples = len(sampler.ring)
+        self.assertGreaterEqual(samples, 3)
+        self.assertEqual(totals["eth0"], (125_000 * (samples - 1), 1000 * (samples - 1)))
+        download = sampler.summary("download")
+        self.assertEqual(download["download_nic_bytes"], 125_000 * (samples - 1))
+        self.assertEqual(sampler.summary("upload")["upload_nic_bytes"], 1000 * (samples - 1))
+
+    def test_default_interfaces(self):
+        """Test that only one adapter is sampled, so tunnelled traffic is not counted twice."""
+        counters = FakeCounters(received_step=125_000, sent_step=1000)()
+        counters["utun0"] = SimpleNamespace(bytes_recv=10 ** 6, bytes_sent=0)
+        with patch.object(network_adapter_information, "get_network_info") as enumerate_all:
+            self.assertEqual(nic_sampler.default_interfaces(counters, "wlan0"), ["wlan0"])
+            self.assertEqual(nic_sampler.default_interfaces(counters), ["utun0"])
+            self.assertEqual(nic_sampler.default_interfaces(counters, "en9"), ["utun0"])
+            self.assertEqual(nic_sampler.default_interfaces({"lo0": counters["lo"]}), [])
+        enumerate_all.assert_not_called()
+
+    def test_totals_survive_ring_wrap(self):
+        """Test that totals still start at the first sample once the ring wrapped."""
+        counters = FakeCounters(received_step=100, sent_step=0)
+        with nic_sampler.NicCounterSampler(interval=0.005, capacity=4, interfaces=["eth0"],
+                                           counters=counters) as sampler:
+            time.sleep(0.1)
+
+        self.assertGreater(sampler.ring.appended, 4)
+        summary = sampler.summary("download")
+        self.assertEqual(summary["download_nic_bytes"], 100 * (counters.reads - 1))
+
+    def test_unreadable_counters_give_no_summary(self):
+        """Test that a failing counter source leaves the result without interface fields."""
+        def broken():
+            raise OSError("no counters")
+
+        with nic_sampler.NicCounterSampler(counters=broken) as sampler:
+            pass
+
+        self.assertEqual(sampler.summary("download"), {})
+        self.assertEqual(sampler.totals(), {})
+
+    def test_bandwidth_monitor_rates(self):
+        """Test per-interface Mbps from vectorized deltas over a rolling window."""
+        clock = iter(float(t) for t in range(10))
+        counters = FakeCounters(received_step=1_250_000, sent_step=125_000)
+        monitor = nic_sampler.BandwidthMonitor(["eth0"], window=3, counters=counters,
+                                               clock=lambda: next(clock))
+        for _ in range(6):
+            monitor.sample()
+
+        ages, rates = monitor.rates()
+
+        self.assertEqual(ages.tolist(), [2.0, 1.0, 0.0])
+        np.testing.assert_allclose(rates[:, 0, nic_sampler.RECEIVED], 10.0)
+        np.testing.assert_allclose(rates[:, 0, nic_sampler.SENT], 1.0)
+
+    def test_bandwidth_monitor_reset(self):
+        """Test that switching interfaces starts an empty window."""
+        monitor = nic_sampler.BandwidthMonitor(["eth0"], counters=FakeCounters(1, 1))
+        monitor.sample()
+        monitor.sample()
+
+        monitor.reset(["wlan0"])
+        monitor.sample()
+
+        ages, rates = monitor.rates()
+        self.assertEqual(len(ages), 0)
+        self.assertEqual(rates.shape, (0, 1, 2))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+import numpy as np
+import matplotlib
+matplotlib.use("Agg")
+from matplotlib import pyplot as plt
+from speedtest_app import plot_decimation
+
+
+class TestPlotDecimation(unittest.TestCase):
+    """Tests for the plot_decimation module."""
+
+    def setUp(self):
+        """Set up a long noisy series with one spike."""
+        rng = np.random.default_rng(0)
+        self.x = np.arange(1, 100_001, dtype=np.float64)
+        self.y = 100 + rng.normal(0, 5, len(self.x))
+        self.y[54_321] = 1000.0
+
+    def test_lttb_keeps_endpoints_and_spike(self):
+        """Test that LTTB returns n_out sorted indices including the extremes."""
+        indices = plot_decimation.lttb(self.x, self.y, 500)
+
+        self.assertEqual(len(indices), 500)
+        self.assertEqual(indices[0], 0)
+        self.assertEqual(indices[-1], len(self.x) - 1)
+        self.assertTrue(np.all(np.diff(indices) > 0))
+        self.assertIn(54_321, indices)
+
+    def test_minmax_keeps_bucket_extremes(self):
+        """Test that min/max bucketing keeps the global minimum and maximum."""
+        indices = plot_decimation.minmax_decimate(self.y, 250)
+
+        self.assertLessEqual(len(indices), 500)
+        self.assertIn(int(np.argmax(self.y)), indices)
+        self.assertIn(int(np.argmin(self.y)), indices)
+
+    def test_short_series_is_not_decimated(self):
+        """Test that series shorter than the target are returned unchanged."""
+        x, y = plot_decimation.decimate([1, 2, 3], [4.0, 5.0, 6.0], 100)
+        np.testing.assert_array_equal(x, [1, 2, 3])
+        np.testing.assert_array_equal(y, [4.0, 5.0, 6.0])
+
+    def test_zoom_redecimates_visible_range(self):
+        """Test that changing the x limits re-selects points in the new view."""
+        fig, ax = plt.subplots(figsize=(8, 4), dpi=100)
+        self.addCleanup(plt.close, fig)
+        line = plot_decimation.DecimatedLine(ax, self.x, self.y, marker="o")
+        plot_decimation.attach_decimation(fig.canvas, [line])
+
+        full_x = line.line.get_xdata()
+        self.assertLessEqual(len(full_x), int(ax.bbox.width))
+        self.assertEqual(line.line.get_marker(), "None")
+
+        ax.set_xlim(1000, 1100)
+        zoomed_x = line.line.get_xdata()
+        self.assertGreaterEqual(zoomed_x[1], 1000)
+        self.assertLessEqual(zoomed_x[-2], 1100)
+        self.assertEqual(len(zoomed_x), 103)
+        self.assertEqual(line.line.get_marker(), "o")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import unittest
+import io
+import time
+import queue
+from unittest.mock import MagicMock
+from speedtest_app import progress_events
+from speedtest_app.progress_events import PhaseChanged, TransferProgress
+
+
+class TestProgressEvents(unittest.TestCase):
+    """Tests for the progress_events module."""
+
+    def test_drain_collapses_progress(self):
+        """Test that consecutive progress events of a phase collapse to the newest."""
+        events = queue.Queue()
+        events.put(PhaseChanged("download", "Testing download speed..."))
+        for i in range(5):
+            events.put(TransferProgress("download", i * 100, 800.0, i / 4))
+        events.put(PhaseChanged("upload", "Testing upload speed..."))
+        events.put(TransferProgress("upload", 10, 80.0, 0.1))
+
+        drained = progress_events.drain_events(events)
+
+        self.assertEqual(drained, [
+            PhaseChanged("download", "Testing download speed..."),
+            TransferProgress("download", 400, 800.0, 1.0),
+            PhaseChanged("upload", "Testing upload speed..."),
+            TransferProgress("upload", 10, 80.0, 0.1),
+        ])
+        self.assertTrue(events.empty())
+
+    def test_drain_respects_batch_size(self):
+        """Test that a drain takes at most max_events from the queue."""
+        events = queue.Queue()
+        for i in range(10):
+            events.put(PhaseChanged("server", str(i)))
+
+        self.assertEqual(len(progress_events.drain_events(events, max_events=4)), 4)
+        self.assertEqual(events.qsize(), 6)
+
+    def test_metered_opener_counts_both_directions(self):
+        """Test that response reads and upload body reads are counted."""
+        meter = progress_events.TransferMeter()
+        opener = MagicMock()
+        opener.open.side_effect = lambda request: io.BytesIO(b"x" * 25000)
+        metered = progress_events.MeteredOpener(opener, meter)
+
+        response = metered.open(MagicMock(data=None))
+        while response.read(10240):
+            pass
+        self.assertEqual(meter.total, 25000)
+
+        upload_request = MagicMock(data=io.BytesIO(b"y" * 5000))
+        opener.open.side_effect = lambda request: request.data.read(4096) + request.data.read()
+        metered.open(upload_request)
+        self.assertEqual(meter.total, 30000)
+
+    def test_reporter_publishes_progress(self):
+        """Test periodic progress and the closing event of a phase."""
+        meter = progress_events.TransferMeter()
+        events = queue.Queue()
+        with progress_events.ProgressReporter(meter, events, "download", 10,
+                                              interval=0.05) as reporter:
+            reporter.callback(0, 4, start=True)
+            meter.add(1000)
+            reporter.callback(0, 4, end=True)
+            time.sleep(0.15)
+
+        received = [events.get_nowait() for _ in range(events.qsize())]
+        self.assertTrue(all(event.phase == "download" for event in received))
+        self.assertGreaterEqual(received[0].fraction, 0.25)
+        self.assertEqual((received[-1].bytes_transferred, received[-1].fraction), (1000, 1.0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,227 @@
+import unittest
+import os
+import json
+import random
+import tempfile
+import shutil
+import threading
+from types import SimpleNamespace
+from concurrent.futures import Future
+from unittest.mock import MagicMock, patch
+from speedtest_app import history_cache, scheduler as scheduler_module
+from speedtest_app.history_store import JsonlHistoryStore
+from speedtest_app.scheduler import (
+    BUSY_RETRY_SECONDS, SATURATED_RETRY_SECONDS, SpeedTestScheduler
+)
+from speedtest_app.speedtest_result import SpeedTestResult
+from speedtest_app.speedtest_service import SpeedTestBusy
+
+SUCCESS = {"download": 100.0, "upload": 20.0, "ping": 10.0}
+FAILURE = {"error": "No network"}
+PARTIAL = {"download": 100.0, "upload": 2.0, "ping": 10.0, "partial": True,
+           "timed_out": ["upload"]}
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class TestSpeedTestScheduler(unittest.TestCase):
+    """Tests for SpeedTestScheduler."""
+
+    def setUp(self):
+        """Set up a fake service, clock and state file."""
+        self.test_dir = tempfile.mkdtemp()
+        self.state_path = os.path.join(self.test_dir, "scheduler_state.json")
+        self.clock = FakeClock()
+        self.usage = 0.0
+        self.service = MagicMock()
+        self.service.is_busy.return_value = False
+        self.results = [SUCCESS]
+        self.service.run_speedtest.side_effect = self._run_speedtest
+        self.settings = {"scheduler_interval": 600, "scheduler_jitter": 60,
+                         "scheduler_max_backoff": 3000, "scheduler_saturation_mbps": 5.0}
+        patcher = patch.object(history_cache, "ensure_user_data_dir",
+                               return_value=os.path.join(self.test_dir, "cache"))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        """Clean up after tests."""
+        shutil.rmtree(self.test_dir)
+
+    def _run_speedtest(self, events=None):
+        future = Future()
+        result = self.results.pop(0) if len(self.results) > 1 else self.results[0]
+        future.set_result(SpeedTestResult(timestamp=1711972800, **result))
+        return future
+
+    def _scheduler(self, **kwargs):
+        kwargs.setdefault("state_path", self.state_path)
+        return SpeedTestScheduler(self.service, self.settings, clock=self.clock,
+                                  link_usage=lambda window, interface: self.usage,
+                                  rng=random.Random(1), **kwargs)
+
+    def test_first_tick_runs_and_schedules_with_jitter(self):
+        """Test that a due run happens and the next one is interval plus jitter away."""
+        on_result = MagicMock()
+        scheduler = self._scheduler(on_result=on_result)
+
+        delay = scheduler.tick()
+
+        self.service.run_speedtest.assert_called_once()
+        on_result.assert_called_once_with(SUCCESS)
+        self.assertGreaterEqual(delay, 600)
+        self.assertLessEqual(delay, 660)
+        self.assertEqual(scheduler.state["last_status"], "ok")
+
+    def test_not_due_does_not_run(self):
+        """Test that ticks before next_run only report the remaining time."""
+        scheduler = self._scheduler()
+        scheduler.tick()
+        self.clock.now += 100
+
+        delay = scheduler.tick()
+
+        self.assertEqual(self.service.run_speedtest.call_count, 1)
+        self.assertAlmostEqual(delay, scheduler.state["next_run"] - self.clock.now)
+
+    def test_failures_back_off_exponentially_up_to_the_cap(self):
+        """Test that consecutive failures double the delay until max_backoff."""
+        self.results = [FAILURE]
+        scheduler = self._scheduler()
+
+        delays = []
+        for _ in range(4):
+            delays.append(scheduler.tick())
+            self.clock.now = scheduler.state["next_run"]
+
+        self.assertEqual(delays, [1200, 2400, 3000, 3000])
+        self.assertEqual(scheduler.state["failures"], 4)
+
+    def test_success_resets_backoff(self):
+        """Test that a successful run after failures returns to the normal interval."""
+        self.results = [FAILURE, FAILURE, SUCCESS]
+        scheduler = self._scheduler()
+        for _ in range(3):
+            scheduler.tick()
+            self.clock.now = scheduler.state["next_run"]
+
+        self.assertEqual(scheduler.state["failures"], 0)
+        self.assertEqual(scheduler.state["failed_runs"], 2)
+
+    def test_saturated_link_defers_run(self):
+        """Test that heavy traffic on the link skips the run."""
+        self.usage = 50.0
+        scheduler = self._scheduler()
+
+        delay = scheduler.tick()
+
+        self.service.run_speedtest.assert_not_called()
+        self.assertEqual(delay, SATURATED_RETRY_SECONDS)
+        self.assertEqual(scheduler.state["last_status"], "saturated")
+
+    def test_busy_service_defers_run(self):
+        """Test that a test already in progress is not overlapped."""
+        self.service.is_busy.return_value = True
+        scheduler = self._scheduler()
+
+        delay = scheduler.tick()
+
+        self.service.run_speedtest.assert_not_called()
+        self.assertEqual(delay, BUSY_RETRY_SECONDS)
+
+    def test_refused_run_defers(self):
+        """Test that a test started elsewhere after the busy check defers the run."""
+        self.service.run_speedtest.side_effect = SpeedTestBusy()
+        scheduler = self._scheduler()
+
+        delay = scheduler.tick()
+
+        self.assertEqual(delay, BUSY_RETRY_SECONDS)
+        self.assertEqual(scheduler.state["last_status"], "busy")
+        self.assertEqual(scheduler.state["runs"], 0)
+
+    def test_link_usage_counts_the_active_adapter_only(self):
+        """Test that traffic tunnelled through another interface is not counted twice."""
+        reads = iter([
+            {"en0": SimpleNamespace(bytes_recv=0, bytes_sent=0),
+             "utun0": SimpleNamespace(bytes_recv=0, bytes_sent=0)},
+            {"en0": SimpleNamespace(bytes_recv=1_000_000, bytes_sent=250_000),
+             "utun0": SimpleNamespace(bytes_recv=1_000_000, bytes_sent=250_000)},
+        ])
+        with patch.object(scheduler_module, "read_counters", lambda: next(reads)):
+            usage = scheduler_module.link_usage_mbps(0.01, "en0")
+
+        self.assertAlmostEqual(usage, 1000.0)
+
+    def test_stop_without_wait_does_not_block(self):
+        """Test that stop(wait=False) cancels the running test without joining the thread."""
+        started, finished = threading.Event(), Future()
+
+        def run_speedtest(events=None):
+            started.set()
+            return finished
+
+        self.service.run_speedtest.side_effect = run_speedtest
+        self.service.cancel.side_effect = lambda: finished.set_result(
+            {"error": "Test cancelled", "cancelled": True})
+        self.settings["scheduler_saturation_mbps"] = 0
+        scheduler = self._scheduler()
+        scheduler.start()
+        self.assertTrue(started.wait(5))
+        thread = scheduler._thread
+
+        scheduler.stop(wait=False)
+
+        self.service.cancel.assert_called_once()
+        self.assertFalse(scheduler.is_running())
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(scheduler.state["last_status"], "cancelled")
+
+    def test_cancelled_run_does_not_back_off(self):
+        """Test that a cancelled test is not counted as a failure."""
+        self.results = [{"error": "Test cancelled", "cancelled": True}]
+        scheduler = self._scheduler()
+
+        scheduler.tick()
+
+        self.assertEqual(scheduler.state["failures"], 0)
+        self.assertEqual(scheduler.state["last_status"], "cancelled")
+
+    def test_state_survives_restart(self):
+        """Test that a new scheduler continues the persisted schedule."""
+        scheduler = self._scheduler()
+        scheduler.tick()
+        with open(self.state_path, "r", encoding="utf-8") as file:
+            saved = json.load(file)
+
+        restarted = self._scheduler()
+        restarted.tick()
+
+        self.assertEqual(restarted.state["next_run"], saved["next_run"])
+        self.assertEqual(self.service.run_speedtest.call_count, 1)
+
+    def test_successful_results_are_saved_to_history(self):
+        """Test that complete runs are appended to the store, failed and partial ones are not."""
+        store = JsonlHistoryStore(os.path.join(self.test_dir, "history.jsonl"))
+        self.results = [FAILURE, PARTIAL, SUCCESS]
+        scheduler = self._scheduler(store=store)
+        for _ in range(3):
+            scheduler.tick()
+            self.clock.now = scheduler.state["next_run"]
+
+        records = list(store.iter_records())
+        self.assertEqual(len(records), 1)
+        self.assertEqual(records[0]["download_speed"], 100.0)
+        self.assertEqual(records[0]["timestamp"],
+                         SpeedTestResult(timestamp=1711972800).history_record()["timestamp"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import unittest
+import asyncio
+from speedtest_app import server_selection
+
+
+async def _start_latency_server(delay, body=b"test=test"):
+    """Starts a local keep-alive HTTP server answering every request after delay."""
+
+    async def handle(reader, writer):
+        try:
+            while True:
+                request = await reader.readuntil(b"\r\n\r\n")
+                if not request:
+                    break
+                await asyncio.sleep(delay)
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Length: " + str(len(body)).encode()
+                    + b"\r\n\r\n" + body
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    return server, {"id": str(port), "url": f"http://127.0.0.1:{port}/speedtest/upload.php"}
+
+
+class TestServerSelection(unittest.TestCase):
+    """Tests for the server_selection module."""
+
+    def _probe(self, delays, **kwargs):
+        async def scenario():
+            started = [await _start_latency_server(delay) for delay in delays]
+            try:
+                return await server_selection.probe_servers(
+                    [server for _, server in started], **kwargs
+                ), [server for _, server in started]
+            finally:
+                for server, _ in started:
+                    server.close()
+                    await server.wait_closed()
+
+        return asyncio.run(scenario())
+
+    def test_latency_target(self):
+        """Test that latency.txt sits next to the server's upload URL."""
+        target = server_selection.latency_target(
+            {"url": "https://host.example:8080/speedtest/upload.php"}
+        )
+        self.assertEqual(target, ("https", "host.example", 8080, "/speedtest/latency.txt"))
+
+    def test_jitter(self):
+        """Test jitter as the mean difference of consecutive samples."""
+        self.assertEqual(server_selection.jitter([10.0, 12.0, 11.0]), 1.5)
+        self.assertEqual(server_selection.jitter([10.0]), 0.0)
+
+    def test_ranks_by_median_latency(self):
+        """Test that servers are ranked fastest first."""
+        ranked, servers = self._probe([0.05, 0.0, 0.02], samples=3, deadline=2.0)
+
+        self.assertEqual([r["server"]["id"] for r in ranked],
+                         [servers[1]["id"], servers[2]["id"], servers[0]["id"]])
+        self.assertTrue(all(len(r["samples"]) == 3 and r["lost"] == 0 for r in ranked))
+        self.assertGreaterEqual(ranked[-1]["median"], 50)
+
+    def test_deadline_drops_slow_servers(self):
+        """Test that servers still probing at the deadline are left out."""
+        ranked, servers = self._probe([0.0, 1.0], samples=2, deadline=0.3)
+
+        self.assertEqual([r["server"]["id"] for r in ranked], [servers[0]["id"]])
+
+    def test_unreachable_server_is_skipped(self):
+        """Test that a refused connection does not break the ranking."""
+        dead = {"id": "dead", "url": "http://127.0.0.1:1/upload.php"}
+        ranked = server_selection.rank_servers([dead], samples=1, deadline=0.5)
+        self.assertEqual(ranked, [])
+
+    def test_tcp_method(self):
+        """Test probing by TCP connect time."""
+        ranked, servers = self._probe([0.0], samples=2, method="tcp")
+        self.assertEqual(ranked[0]["server"], servers[0])
+        self.assertEqual(ranked[0]["lost"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
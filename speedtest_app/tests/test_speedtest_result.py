@@ -0,0 +1,61 @@
+import unittest
+import copy
+import pickle
+from speedtest_app.speedtest_result import SpeedTestResult
+
+
+class TestSpeedTestResult(unittest.TestCase):
+    """Tests for the speedtest_result module."""
+
+    def setUp(self):
+        """Set up a result with latency fields."""
+        self.result = SpeedTestResult(
+            timestamp=1_711_972_800, download=100.5, upload=50.25, ping=12.0,
+            download_streams=8, upload_streams=4, latency_median=11.5, jitter=0.8
+        )
+
+    def test_reads_like_a_result_dict(self):
+        """Test mapping access, with unmeasured fields left out."""
+        self.assertEqual(self.result["download"], 100.5)
+        self.assertEqual(self.result.get("jitter"), 0.8)
+        self.assertIsNone(self.result.get("error"))
+        self.assertNotIn("partial", self.result)
+        self.assertEqual(list(self.result)[:3], ["download", "upload", "ping"])
+        self.assertEqual(len(self.result), 7)
+        self.assertEqual(SpeedTestResult(error="offline"), {"error": "offline"})
+        with self.assertRaises(KeyError):
+            self.result["packet_loss"]
+
+    def test_is_slotted_and_read_only(self):
+        """Test that results have no instance dict and cannot be changed."""
+        self.assertFalse(hasattr(self.result, "__dict__"))
+        with self.assertRaises(AttributeError):
+            self.result.download = 1.0
+
+    def test_rejects_unknown_fields(self):
+        """Test that misspelled fields are caught; from_dict skips foreign keys."""
+        with self.assertRaises(TypeError):
+            SpeedTestResult(downlaod=1.0)
+
+        result = SpeedTestResult.from_dict({"download": 1.0, "server": "x"}, cancelled=True)
+        self.assertEqual(result.to_dict(), {"download": 1.0, "cancelled": True})
+        self.assertFalse(result.succeeded)
+
+    def test_history_record(self):
+        """Test the history record carries the finish time and latency fields."""
+        record = self.result.history_record()
+
+        self.assertEqual(record["download_speed"], 100.5)
+        self.assertEqual(record["latency_median"], 11.5)
+        self.assertNotIn("download_streams", record)
+        self.assertEqual(len(record["timestamp"]), len("2024-04-01 12:00:00"))
+
+    def test_copy_and_pickle(self):
+        """Test that results survive copying and pickling, timestamp included."""
+        for restored in (copy.deepcopy(self.result), pickle.loads(pickle.dumps(self.result))):
+            self.assertEqual(restored, self.result)
+            self.assertEqual(restored.timestamp, self.result.timestamp)
+
+
+if __name__ == '__main__':
+    unittest.main()
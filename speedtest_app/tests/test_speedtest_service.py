@@ -0,0 +1,444 @@
+import unittest
+import os
+import sys
+import time
+import queue
+import tempfile
+import shutil
+from unittest.mock import patch, MagicMock
+from speedtest_app import latency, progress_events, speedtest_service
+from speedtest_app.server_cache import ServerCache
+
+
+def setUpModule():
+    # The service imports numpy on first use. Doing that here keeps the first
+    # import outside patch.dict(sys.modules), which would unload it again.
+    latency.latency_statistics([1.0], 1)
+
+
+def _fake_config():
+    return {
+        "sizes": {"download": [350, 500], "upload": [32768, 65536, 131072]},
+        "counts": {"download": 4, "upload": 17},
+        "threads": {"download": 8, "upload": 4},
+        "length": {"download": 10, "upload": 10},
+        "upload_max": 51,
+    }
+
+
+SERVERS = [
+    {"id": "1", "d": 5.0, "url": "http://near.example/upload.php"},
+    {"id": "2", "d": 50.0, "url": "http://far.example/upload.php"},
+]
+
+LATENCY = {"latency_min": 10.0, "latency_median": 12.0, "latency_p95": 20.0,
+           "latency_p99": 30.0, "jitter": 1.5, "packet_loss": 5.0}
+
+
+class FakeSpeedtest:
+    """Speedtest stand-in whose throughput saturates at 16 streams."""
+
+    network_calls = []
+
+    def __init__(self, **kwargs):
+        self.config = {}
+        self.servers = {}
+        self.results = MagicMock(ping=12.5)
+        self._best = {}
+        self._opener = MagicMock()
+        self._shutdown_event = kwargs.get("shutdown_event")
+        self.calls = []
+        self.get_config()
+
+    def get_config(self):
+        FakeSpeedtest.network_calls.append("config")
+        self.config.update(_fake_config())
+        self.lat_lon = (52.0, 13.0)
+        return self.config
+
+    def get_servers(self, servers=None):
+        FakeSpeedtest.network_calls.append("servers")
+        self.servers = {s["d"]: [dict(s)] for s in SERVERS
+                        if not servers or int(s["id"]) in servers}
+        return self.servers
+
+    def get_closest_servers(self, limit=5):
+        return [s for d in sorted(self.servers) for s in self.servers[d]][:limit]
+
+    def get_best_server(self, servers=None):
+        FakeSpeedtest.network_calls.append("ping")
+        if not servers:
+            servers = [s for d in sorted(self.servers) for s in self.servers[d]]
+        best = dict(servers[0], latency=12.5)
+        self.results.server = best
+        return best
+
+    def _rate(self, threads):
+        self.calls.append((threads, dict(self.config["length"])))
+        return min(threads or 8, 16) * 100_000_000
+
+    def download(self, callback=None, threads=None):
+        if callback:
+            callback(0, 1, end=True)
+        return self._rate(threads)
+
+    def upload(self, callback=None, threads=None):
+        if callback:
+            callback(0, 1, end=True)
+        return self._rate(threads) / 2
+
+
+class StalledSpeedtest(FakeSpeedtest):
+    """Download hangs until the shutdown event is set, then reports what it got."""
+
+    def download(self, callback=None, threads=None):
+        self._shutdown_event.wait(5)
+        return 50_000_000
+
+
+class SlowTuningSpeedtest(FakeSpeedtest):
+    """Auto-scale download probes hang until the shutdown event is set, which zeroes a download."""
+
+    def download(self, callback=None, threads=None):
+        if self.config["length"]["download"] == speedtest_service.AUTO_SCALE_PROBE_SECONDS:
+            self._shutdown_event.wait(5)
+        if self._shutdown_event.is_set():
+            return 0
+        return super().download(callback, threads)
+
+
+class SlowDiscoverySpeedtest(FakeSpeedtest):
+    """Server list download that takes longer than the discovery timeout."""
+
+    def get_servers(self, servers=None):
+        time.sleep(0.5)
+        # The run has abandoned this thread by now; going on would record
+        # network calls in the next test
+        raise ConnectionError("server list arrived too late")
+
+
+class FakeLoadedSampler:
+    """Loaded latency sampler stand-in with one lost probe."""
+
+    instances = []
+
+    def __init__(self, server, interval):
+        self.samples = [(0.2, 40.0), (0.7, 60.0), (1.5, None), (2.1, 80.0)]
+        FakeLoadedSampler.instances.append((server["id"], interval))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+class TestSpeedTestService(unittest.TestCase):
+    """Tests for the speedtest_service module."""
+
+    def test_apply_engine_settings(self):
+        """Test that sizes, counts and duration override the server config."""
+        config = _fake_config()
+        engine = speedtest_service.engine_settings({
+            "engine_upload_sizes": [1048576, 7340032],
+            "engine_requests_per_size": 10,
+            "engine_test_duration": 15,
+        })
+
+        speedtest_service.apply_engine_settings(config, engine)
+
+        self.assertEqual(config["sizes"]["download"], [350, 500])
+        self.assertEqual(config["sizes"]["upload"], [1048576, 7340032])
+        self.assertEqual(config["counts"], {"download": 10, "upload": 10})
+        self.assertEqual(config["length"], {"download": 15, "upload": 15})
+        self.assertEqual(config["upload_max"], 20)
+
+    def test_auto_scale_stops_at_plateau(self):
+        """Test that streams are doubled until throughput stops increasing."""
+        speedtest = FakeSpeedtest()
+
+        streams = speedtest_service.auto_scale_streams(speedtest, "download", 64)
+
+        self.assertEqual(streams, 16)
+        self.assertEqual([threads for threads, _ in speedtest.calls], [8, 16, 32])
+        self.assertTrue(all(length["download"] == speedtest_service.AUTO_SCALE_PROBE_SECONDS
+                            for _, length in speedtest.calls))
+        self.assertEqual(speedtest.config["length"]["download"], 10)
+
+    def setUp(self):
+        """Set up a private server cache."""
+        self.test_dir = tempfile.mkdtemp()
+        self.fingerprint = "network-a"
+        self.cache = ServerCache(os.path.join(self.test_dir, "server_cache.json"),
+                                 fingerprint=lambda: self.fingerprint)
+        FakeSpeedtest.network_calls = []
+        # No candidate answers the concurrent probe unless a test says so
+        patcher = patch.object(speedtest_service, "rank_servers", return_value=[])
+        self.mock_rank = patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = patch.object(speedtest_service, "measure_latency", return_value=LATENCY)
+        self.mock_latency = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        """Clean up after tests."""
+        shutil.rmtree(self.test_dir)
+
+    def _run(self, settings=None, events=None, speedtest_class=FakeSpeedtest, network_info=None):
+        service = speedtest_service.SpeedTestService(settings, server_cache=self.cache,
+                                                     network_info=network_info)
+        fake_module = MagicMock(Speedtest=speedtest_class)
+        with patch.dict(sys.modules, {"speedtest": fake_module}):
+            return service.run_speedtest(events).result(timeout=10)
+
+    def test_run_uses_configured_streams(self):
+        """Test a full run with fixed stream counts from the settings."""
+        result = self._run({
+            "engine_download_streams": 4,
+            "engine_upload_streams": 2,
+        })
+
+        self.assertEqual(result["download"], 400.0)
+        self.assertEqual(result["upload"], 100.0)
+        self.assertEqual(result["ping"], 12.5)
+        self.assertEqual((result["download_streams"], result["upload_streams"]), (4, 2))
+
+    def test_run_publishes_events(self):
+        """Test the phase, progress and finish events of a run."""
+        events = queue.Queue()
+        result = self._run(events=events)
+
+        received = progress_events.drain_events(events)
+        phases = [e.phase for e in received if isinstance(e, progress_events.PhaseChanged)]
+        self.assertEqual(phases, ["server", "latency", "download", "upload"])
+        progress = [e for e in received if isinstance(e, progress_events.TransferProgress)]
+        self.assertEqual([(e.phase, e.fraction) for e in progress],
+                         [("download", 1.0), ("upload", 1.0)])
+        self.assertEqual(received[-1], progress_events.SpeedTestFinished(result))
+
+    def test_run_includes_latency_distribution(self):
+        """Test that the latency probes of the chosen server end up in the result."""
+        result = self._run({"latency_probes": 50, "latency_mode": "concurrent"})
+
+        server, count, mode, _ = self.mock_latency.call_args[0]
+        self.assertEqual((server["id"], count, mode), ("1", 50, "concurrent"))
+        self.assertEqual(result["latency_p99"], 30.0)
+        self.assertEqual(result["packet_loss"], 5.0)
+
+    def test_latency_under_load(self):
+        """Test loaded latency fields against the idle median for both directions."""
+        FakeLoadedSampler.instances = []
+        with patch.object(speedtest_service, "LoadedLatencySampler", FakeLoadedSampler):
+            result = self._run({"latency_under_load": True, "latency_under_load_interval": 0.2})
+
+        self.assertEqual(FakeLoadedSampler.instances, [("1", 0.2), ("1", 0.2)])
+        self.assertEqual(result["download_latency_median"], 60.0)
+        self.assertEqual(result["download_latency_delta"], 48.0)
+        self.assertEqual(result["upload_latency_series"], [50.0, None, 80.0])
+
+    def test_latency_under_load_without_idle_probes(self):
+        """Test that the delta falls back to the ping when every idle probe was lost."""
+        self.mock_latency.return_value = dict(dict.fromkeys(LATENCY, None), packet_loss=100.0)
+        with patch.object(speedtest_service, "LoadedLatencySampler", FakeLoadedSampler):
+            result = self._run({"latency_under_load": True})
+
+        self.assertNotIn("latency_median", result)
+        self.assertEqual(result["download_latency_delta"], 47.5)
+        self.assertEqual(result["upload_latency_delta"], 47.5)
+
+    def test_latency_under_load_is_off_by_default(self):
+        """Test that no loaded latency fields are reported unless enabled."""
+        result = self._run()
+
+        self.assertNotIn("download_latency_median", result)
+
+    def test_interface_counters_sampled_per_phase(self):
+        """Test that each direction reports the bytes the interfaces counted."""
+
+        class FakeNicSampler:
+            intervals = []
+
+            def __init__(self, interval, active=None):
+                FakeNicSampler.intervals.append((interval, active))
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, exc_type, exc, tb):
+                return False
+
+            def totals(self):
+                return {"eth0": (1000, 10)}
+
+            def summary(self, direction):
+                return {f"{direction}_nic_mbps": 1.5, f"{direction}_nic_bytes": 1000,
+                        f"{direction}_nic_series": [1.5]}
+
+        network_info = MagicMock()
+        network_info.active_adapter.return_value = {"Adapter": "en0"}
+        with patch.object(speedtest_service, "NicCounterSampler", FakeNicSampler):
+            result = self._run({"nic_sampling_interval": 0.02}, network_info=network_info)
+
+        self.assertEqual(FakeNicSampler.intervals, [(0.02, "en0"), (0.02, "en0")])
+        self.assertEqual(result["download_nic_bytes"], 1000)
+        self.assertEqual(result["upload_nic_series"], [1.5])
+
+    def test_interface_counter_sampling_can_be_disabled(self):
+        """Test that nic_sampling False leaves the interface fields out."""
+        with patch.object(speedtest_service, "NicCounterSampler") as sampler:
+            result = self._run({"nic_sampling": False})
+
+        sampler.assert_not_called()
+        self.assertNotIn("download_nic_mbps", result)
+
+    def test_latency_probing_can_be_disabled(self):
+        """Test that latency_probes 0 skips the latency phase."""
+        result = self._run({"latency_probes": 0})
+
+        self.mock_latency.assert_not_called()
+        self.assertNotIn("latency_median", result)
+        self.assertEqual(result["download"], 800.0)
+
+    def test_failed_latency_probe_keeps_the_test(self):
+        """Test that a failing latency phase does not fail the throughput test."""
+        self.mock_latency.side_effect = OSError("unreachable")
+
+        result = self._run()
+
+        self.assertNotIn("error", result)
+        self.assertNotIn("latency_median", result)
+
+    def test_listeners_receive_events_of_every_run(self):
+        """Test that service-wide listeners see runs started with or without a queue."""
+        listener = queue.Queue()
+        service = speedtest_service.SpeedTestService(server_cache=self.cache)
+        service.add_listener(listener)
+        events = queue.Queue()
+        with patch.dict(sys.modules, {"speedtest": MagicMock(Speedtest=FakeSpeedtest)}):
+            first = service.run_speedtest(events).result(timeout=10)
+            second = service.run_speedtest().result(timeout=10)
+
+        finished = [e for e in progress_events.drain_events(listener)
+                    if isinstance(e, progress_events.SpeedTestFinished)]
+        self.assertEqual(finished, [progress_events.SpeedTestFinished(first),
+                                    progress_events.SpeedTestFinished(second)])
+        self.assertEqual(progress_events.drain_events(events)[-1],
+                         progress_events.SpeedTestFinished(first))
+
+    def test_repeat_run_skips_server_discovery(self):
+        """Test that a second run reuses the cached config, servers and best server."""
+        self._run()
+        self.assertEqual(FakeSpeedtest.network_calls, ["config", "servers", "ping"])
+
+        FakeSpeedtest.network_calls = []
+        result = self._run({"engine_download_streams": 32})
+
+        self.assertEqual(FakeSpeedtest.network_calls, ["ping"])
+        self.assertEqual(result["download"], 1600.0)
+        # Engine settings of one run must not end up in the cache
+        self.assertEqual(self.cache.load()["config"]["threads"]["download"], 8)
+
+    def test_network_change_invalidates_cache(self):
+        """Test that the cache is ignored after a network change."""
+        self._run()
+        self.fingerprint = "network-b"
+        FakeSpeedtest.network_calls = []
+
+        self._run()
+
+        self.assertEqual(FakeSpeedtest.network_calls, ["config", "servers", "ping"])
+
+    def test_concurrent_probe_picks_server(self):
+        """Test that the fastest concurrently probed server is used without re-pinging."""
+        self.mock_rank.side_effect = lambda servers: [
+            {"server": servers[1], "median": 7.25, "jitter": 0.5, "lost": 0},
+            {"server": servers[0], "median": 20.0, "jitter": 1.0, "lost": 0},
+        ]
+
+        result = self._run({"server_top_k": 2})
+
+        self.assertEqual(FakeSpeedtest.network_calls, ["config", "servers"])
+        self.assertEqual(len(self.mock_rank.call_args[0][0]), 2)
+        self.assertEqual(result["ping"], 7.25)
+        self.assertEqual(self.cache.load()["best"]["id"], "2")
+
+    def test_preferred_server_is_used(self):
+        """Test the preferred_server_id fast path."""
+        with patch.object(FakeSpeedtest, "get_best_server", autospec=True,
+                          side_effect=lambda self, servers=None: dict(servers[0], latency=9.0)
+                          ) as mock_best:
+            self._run({"preferred_server_id": 2})
+
+        self.assertEqual(mock_best.call_args[0][1][0]["id"], "2")
+
+    def test_download_timeout_keeps_partial_result(self):
+        """Test that a stalled download is cut off and the upload still runs."""
+        start = time.monotonic()
+        result = self._run({"timeout_download": 0.2}, speedtest_class=StalledSpeedtest)
+
+        self.assertLess(time.monotonic() - start, 3)
+        self.assertEqual(result["download"], 50.0)
+        self.assertEqual(result["upload"], 400.0)
+        self.assertTrue(result["partial"])
+        self.assertEqual(result["timed_out"], ["download"])
+
+    def test_tuning_timeout_still_measures(self):
+        """Test that a phase timing out while tuning streams still gets a measurement."""
+        result = self._run({"timeout_download": 0.2, "engine_auto_scale": True},
+                           speedtest_class=SlowTuningSpeedtest)
+
+        self.assertEqual(result["download"], 800.0)
+        self.assertEqual(result["download_streams"], 8)
+        self.assertEqual(result["timed_out"], ["download"])
+
+    def test_cancel_running_test(self):
+        """Test that a second run is refused and cancel stops the running one."""
+        service = speedtest_service.SpeedTestService(server_cache=self.cache)
+        events = queue.Queue()
+        with patch.dict(sys.modules, {"speedtest": MagicMock(Speedtest=StalledSpeedtest)}):
+            future = service.run_speedtest(events)
+            while True:
+                event = events.get(timeout=5)
+                if isinstance(event, progress_events.PhaseChanged) and event.phase == "download":
+                    break
+            self.assertTrue(service.is_busy())
+            with self.assertRaises(speedtest_service.SpeedTestBusy):
+                service.run_speedtest()
+            service.cancel()
+            result = future.result(timeout=2)
+
+            self.assertFalse(service.is_busy())
+            self.assertTrue(result["cancelled"])
+            self.assertEqual(result["ping"], 12.5)
+            self.assertNotIn("upload", result)
+
+        with patch.dict(sys.modules, {"speedtest": MagicMock(Speedtest=FakeSpeedtest)}):
+            self.assertNotIn("error", service.run_speedtest().result(timeout=5))
+
+    def test_discovery_timeout(self):
+        """Test that a slow server discovery gives up after its timeout."""
+        start = time.monotonic()
+        result = self._run({"timeout_server_discovery": 0.1},
+                           speedtest_class=SlowDiscoverySpeedtest)
+
+        self.assertLess(time.monotonic() - start, 0.5)
+        self.assertIn("timed out", result["error"])
+        self.assertEqual(result["timed_out"], ["server"])
+
+    def test_run_reports_errors(self):
+        """Test that exceptions become an error result."""
+        class OfflineSpeedtest(FakeSpeedtest):
+            def get_config(self):
+                raise RuntimeError("offline")
+
+        fake_module = MagicMock(Speedtest=OfflineSpeedtest)
+        service = speedtest_service.SpeedTestService(server_cache=self.cache)
+
+        with patch.dict(sys.modules, {"speedtest": fake_module}):
+            result = service.run_speedtest().result(timeout=10)
+
+        self.assertEqual(result, {"error": "offline"})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+import os
+import sys
+import json
+import subprocess
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Budget for a cold `import speedtest_app` in a fresh interpreter, in seconds.
+# Eagerly importing matplotlib alone takes several times this long.
+IMPORT_TIME_BUDGET = 0.15
+
+HEAVY_MODULES = ("matplotlib", "ttkbootstrap", "tkinter", "numpy", "psutil", "speedtest")
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import speedtest_app
+elapsed = time.perf_counter() - start
+print(json.dumps({"elapsed": elapsed, "modules": sorted(sys.modules)}))
+"""
+
+
+# Loaded on first use by the app and the CLI, never when they are imported
+DEFERRED_MODULES = ("matplotlib", "numpy", "psutil")
+
+ENTRY_POINT_PROBE = """
+import json, sys
+import speedtest_app.alexs_speedtest, speedtest_app.cli
+print(json.dumps(sorted(sys.modules)))
+"""
+
+
+def _probe_import(probe=PROBE):
+    output = subprocess.check_output([sys.executable, "-c", probe], cwd=PROJECT_ROOT, text=True)
+    return json.loads(output)
+
+
+class TestStartup(unittest.TestCase):
+    """Startup benchmark: importing the package must stay cheap."""
+
+    def test_package_import_is_lazy(self):
+        """Test that no heavy dependency is loaded by importing the package."""
+        modules = set(_probe_import()["modules"])
+        for name in HEAVY_MODULES:
+            self.assertNotIn(name, modules, f"{name} imported eagerly")
+
+    def test_entry_point_imports_are_lazy(self):
+        """Test that importing the app and CLI modules defers NumPy, psutil and matplotlib."""
+        modules = set(_probe_import(ENTRY_POINT_PROBE))
+        for name in DEFERRED_MODULES:
+            self.assertNotIn(name, modules, f"{name} imported eagerly")
+
+    def test_package_import_time_budget(self):
+        """Test the cold import time of speedtest_app against the budget."""
+        # Best of three runs to smooth out scheduler noise
+        elapsed = min(_probe_import()["elapsed"] for _ in range(3))
+        self.assertLess(elapsed, IMPORT_TIME_BUDGET,
+                        f"import speedtest_app took {elapsed * 1000:.1f} ms")
+
+    def test_lazy_attributes_resolve(self):
+        """Test that public functions are still reachable from the package."""
+        import speedtest_app
+        self.assertTrue(callable(speedtest_app.get_active_adapter_info))
+        self.assertIn("plot_history", dir(speedtest_app))
+        with self.assertRaises(AttributeError):
+            getattr(speedtest_app, "no_such_function")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,6 +5,8 @@ import tempfile
 import shutil
 from unittest.mock import patch, MagicMock
 from speedtest_app import test_history
+from speedtest_app.history_store import JsonlHistoryStore
+from speedtest_app.speedtest_result import SpeedTestResult
 
 
 class TestHistory(unittest.TestCase):
@@ -13,7 +15,7 @@ class TestHistory(unittest.TestCase):
     def setUp(self):
         """Set up a temporary directory for test files."""
         self.test_dir = tempfile.mkdtemp()
-        self.history_path = os.path.join(self.test_dir, "test_history.json")
+        self.history_path = os.path.join(self.test_dir, "test_history.jsonl")
 
     def tearDown(self):
         """Clean up after tests."""
@@ -23,14 +25,13 @@ class TestHistory(unittest.TestCase):
         """Test saving test results to a new file."""
         # Call function with test data
         test_history.save_test_results(
-            100.5, 50.2, 20.1, self.history_path
+            SpeedTestResult(download=100.5, upload=50.2, ping=20.1), file_path=self.history_path
         )
 
         # Verify file was created and contains correct data
         self.assertTrue(os.path.exists(self.history_path))
 
-        with open(self.history_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        data = list(JsonlHistoryStore(self.history_path))
 
         self.assertEqual(len(data), 1)
         self.assertEqual(data[0]["download_speed"], 100.5)
@@ -38,8 +39,8 @@ class TestHistory(unittest.TestCase):
         self.assertEqual(data[0]["ping"], 20.1)
         self.assertIn("timestamp", data[0])
 
-    def test_save_test_results_existing_file(self):
-        """Test appending test results to an existing file."""
+    def test_save_test_results_legacy_file(self):
+        """Test appending test results to a legacy JSON array file."""
         # Create initial file with data
         initial_data = [{"timestamp": "2024-04-01 12:00:00",
                          "download_speed": 80.0,
@@ -54,9 +55,11 @@ class TestHistory(unittest.TestCase):
             100.5, 50.2, 20.1, self.history_path
         )
 
-        # Verify file contains both entries
+        # Verify file was migrated to JSON lines and contains both entries
         with open(self.history_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+            lines = f.read().splitlines()
+        self.assertEqual(len(lines), 2)
+        data = [json.loads(line) for line in lines]
 
         self.assertEqual(len(data), 2)
         self.assertEqual(data[0]["download_speed"], 80.0)
@@ -68,18 +71,29 @@ class TestHistory(unittest.TestCase):
         with open(self.history_path, 'w', encoding='utf-8') as f:
             f.write("This is not valid JSON")
 
-        # Call function (should handle the error and create a new file)
+        # Call function (should skip the corrupted line and keep appending)
         test_history.save_test_results(
             100.5, 50.2, 20.1, self.history_path
         )
 
-        # Verify file contains valid data now
-        with open(self.history_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        # Verify only the valid record is read back
+        data = list(JsonlHistoryStore(self.history_path))
 
         self.assertEqual(len(data), 1)
         self.assertEqual(data[0]["download_speed"], 100.5)
 
+    @patch('speedtest_app.test_history.messagebox')
+    def test_save_test_results_bad_arguments(self, mock_messagebox):
+        """Test that unusable arguments are reported instead of raised."""
+        result = SpeedTestResult(download=100.5, upload=50.2, ping=20.1)
+
+        test_history.save_test_results(result, self.history_path)
+        test_history.save_test_results("fast", file_path=self.history_path)
+
+        self.assertEqual(mock_messagebox.showerror.call_count, 2)
+        self.assertIn("file_path", mock_messagebox.showerror.call_args_list[0][0][1])
+        self.assertFalse(os.path.exists(self.history_path))
+
     @patch('speedtest_app.test_history.messagebox')
     def test_view_history_no_file(self, mock_messagebox):
         """Test view_history when no history file exists."""
@@ -9,6 +9,29 @@ from datetime import datetime
 
 logger = logging.getLogger("SpeedTest")
 
+# Measurement engine settings used by SpeedTestService. A value of 0 or an
+# empty list keeps what the speedtest.net server configuration dictates.
+ENGINE_DEFAULTS = {
+    "engine_download_streams": 0,
+    "engine_upload_streams": 0,
+    "engine_download_sizes": [],
+    "engine_upload_sizes": [],
+    "engine_requests_per_size": 0,
+    "engine_test_duration": 0,
+    "engine_auto_scale": False,
+    "engine_max_streams": 64,
+}
+
+# Periodic unattended tests (see speedtest_app.scheduler); times in seconds
+SCHEDULER_DEFAULTS = {
+    "scheduler_enabled": False,
+    "scheduler_interval": 60 * 60,
+    "scheduler_jitter": 5 * 60,
+    "scheduler_max_backoff": 6 * 60 * 60,
+    "scheduler_saturation_mbps": 5.0,
+    "scheduler_saturation_window": 2.0,
+}
+
 
 def get_app_version():
     """Returns the current version of the application."""
@@ -61,7 +84,43 @@ def load_settings():
         "show_network_info": True,
         "preferred_server_id": None,
         "dark_mode": False,
-        "last_used": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        "history_backend": "jsonl",
+        "server_cache_ttl": 6 * 60 * 60,
+        "server_selection": "concurrent",
+        "server_top_k": 5,
+        "speedtest_server_url": None,
+        "timeout_server_discovery": 30,
+        "timeout_download": 60,
+        "timeout_upload": 60,
+        "timeout_latency": 15,
+        "latency_probes": 20,
+        "latency_mode": "paced",
+        "latency_interval": 0.05,
+        "latency_under_load": False,
+        "latency_under_load_interval": 0.1,
+        "nic_sampling": True,
+        "nic_sampling_interval": 0.05,
+        "bandwidth_monitor_interval": 1.0,
+        "bandwidth_monitor_window": 60,
+        "anomaly_method": "mad",
+        "anomaly_threshold": 3.5,
+        "anomaly_window": 7 * 24 * 60 * 60,
+        "anomaly_halflife": 24 * 60 * 60,
+        "anomaly_max_runs": 200,
+        "anomaly_percentiles": [10, 50, 90],
+        "metrics_enabled": False,
+        "metrics_host": "127.0.0.1",
+        "metrics_port": 9469,
+        "metrics_window": 100,
+        "log_level": "INFO",
+        "log_format": "text",
+        "log_max_bytes": 5 * 1024 * 1024,
+        "log_rotation_interval": 24 * 60 * 60,
+        "log_backup_count": 7,
+        "log_compress": True,
+        "last_used": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        **ENGINE_DEFAULTS,
+        **SCHEDULER_DEFAULTS
     }
 
     if not os.path.exists(settings_file):
@@ -80,4 +139,4 @@ def load_settings():
         return settings
     except Exception as e:
         logger.error(f"Error loading settings: {e}", exc_info=True)
-        return default_settings
\ No newline at end of file
+        return default_settings